@@ -0,0 +1,32 @@
+import os.path as op
+import time
+
+from scriptutils import print_md
+from pyrevit.extensions import cachestats
+
+
+__doc__ = 'Lists the extension cache and assembly files with their size, age, last hit, and last decision made '\
+          'about them, and the cache decisions of the last sessions.'
+
+
+def _format_time(event_time):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event_time)) if event_time else '-'
+
+
+history = cachestats.read_history()
+
+print_md('### Cache entries')
+for entry in sorted(history[cachestats.ENTRIES_KEY].values(), key=lambda x: x['file']):
+    if op.exists(entry['file']):
+        entry_age = (time.time() - op.getmtime(entry['file'])) / 3600.0
+        print_md('**{}** {}  \nsize: {} bytes | age: {:.1f} hours | last hit: {} | last event: {} at {}'
+                 .format(entry['extension'], entry['file'],
+                         op.getsize(entry['file']), entry_age,
+                         _format_time(entry['last_hit']),
+                         entry['last_event'], _format_time(entry['last_event_time'])))
+
+print_md('### Recent sessions')
+for session in reversed(history[cachestats.SESSIONS_KEY][-10:]):
+    counters = ', '.join('{}: {}'.format(k, v) for k, v in sorted(session['counters'].items()))
+    session_time = sum(x[4] for x in session['events'] if x[4])
+    print_md('**{}** {} | {:.2f} seconds'.format(_format_time(session['started']), counters, session_time))
@@ -0,0 +1,22 @@
+from scriptutils.userinput import pick_folder
+from pyrevit.coreutils.logger import get_logger
+from pyrevit.extensions.components import Extension
+from pyrevit.extensions.parser import parse_comp_dir, get_parsed_extension
+from pyrevit.extensions.manifest import save_manifest
+
+# noinspection PyUnresolvedReferences
+logger = get_logger(__commandname__)
+
+__doc__ = 'Parses the selected extension folder and saves all its bundles into a manifest file inside the extension. '\
+          'pyRevit loads the extension from its manifest instead of parsing the bundles, as long as the bundles '\
+          'have not changed.'
+
+
+ext_dir = pick_folder()
+if ext_dir:
+    ext_info_list = parse_comp_dir(ext_dir, Extension)
+    if ext_info_list:
+        manifest_file = save_manifest(get_parsed_extension(ext_info_list[0], use_manifest=False))
+        logger.info('Manifest saved to: {}'.format(manifest_file))
+    else:
+        logger.error('Selected folder is not a ui extension: {}'.format(ext_dir))
@@ -0,0 +1,66 @@
+import os
+import os.path as op
+
+from pyrevit import EXTENSIONS_DEFAULT_DIR, PyRevitException
+from pyrevit.coreutils import ScriptFileParser, ScriptMetadataParser
+from pyrevit.coreutils.logger import get_logger
+from pyrevit.extensions import PYTHON_SCRIPT_FILE_FORMAT
+from pyrevit.extensions import UI_TITLE_PARAM, DOCSTRING_PARAM, AUTHOR_PARAM, COMMAND_OPTIONS_PARAM
+from pyrevit.extensions import COMMAND_CONTEXT_PARAM, MIN_REVIT_VERSION_PARAM, MIN_PYREVIT_VERSION_PARAM
+from pyrevit.extensions import LINK_BUTTON_ASSEMBLY_PARAM, LINK_BUTTON_COMMAND_CLASS_PARAM
+
+# noinspection PyUnresolvedReferences
+logger = get_logger(__commandname__)
+
+__doc__ = 'Parses all python scripts under the default extensions folder with both the syntax tree parser and the '\
+          'token stream metadata parser and reports the scripts that they do not agree on.'
+
+
+METADATA_PARAMS = [UI_TITLE_PARAM, DOCSTRING_PARAM, AUTHOR_PARAM, COMMAND_OPTIONS_PARAM, COMMAND_CONTEXT_PARAM,
+                   MIN_REVIT_VERSION_PARAM, MIN_PYREVIT_VERSION_PARAM,
+                   LINK_BUTTON_ASSEMBLY_PARAM, LINK_BUTTON_COMMAND_CLASS_PARAM]
+
+
+def _extract(parser, param_name):
+    try:
+        return parser.extract_param(param_name)
+    except PyRevitException as param_err:
+        return param_err.__class__.__name__
+
+
+def compare_parsers(script_file):
+    """Returns the list of (metadata, syntax tree parser value, metadata parser value) that do not match."""
+    try:
+        ast_parser = ScriptFileParser(script_file)
+    except PyRevitException:
+        # scripts with syntax errors are not loaded anyway
+        return []
+
+    mismatches = []
+    # metadata parser is tested with the requested params (stops early) and without (reads the full header)
+    for param_names in (METADATA_PARAMS, None):
+        token_parser = ScriptMetadataParser(script_file, param_names)
+        if ast_parser.get_docstring() != token_parser.get_docstring():
+            mismatches.append(('docstring', ast_parser.get_docstring(), token_parser.get_docstring()))
+        for param_name in METADATA_PARAMS:
+            ast_value = _extract(ast_parser, param_name)
+            token_value = _extract(token_parser, param_name)
+            if ast_value != token_value:
+                mismatches.append((param_name, ast_value, token_value))
+    return mismatches
+
+
+script_count = failed_count = 0
+for root_dir, _, file_names in os.walk(EXTENSIONS_DEFAULT_DIR):
+    for file_name in file_names:
+        if file_name.endswith(PYTHON_SCRIPT_FILE_FORMAT):
+            script_file = op.join(root_dir, file_name)
+            script_count += 1
+            mismatches = compare_parsers(script_file)
+            if mismatches:
+                failed_count += 1
+                logger.error('Parsers do not match for: {}'.format(script_file))
+                for mismatch in mismatches:
+                    print('    {} | ast: {!r} | tokens: {!r}'.format(*mismatch))
+
+print('Tested {} scripts. {} failed.'.format(script_count, failed_count))
@@ -2,6 +2,8 @@ import os
 import os.path as op
 import re
 import ast
+import tokenize
+import codecs
 import hashlib
 import time
 import clr
@@ -67,6 +69,137 @@ class ScriptFileParser:
         return None
 
 
+class ScriptMetadataParser:
+    """Extracts the module docstring and module-level parameters (e.g. __title__) from a python script.
+    Unlike ScriptFileParser, this parser does not build the syntax tree of the script. It reads the token stream
+    of the script header: the docstring, imports and assignments at the top of the script, and stops as soon as
+    all the requested parameters are found. If the header ends (at the first module-level statement of any other
+    kind) before all the requested parameters are found, the parameters might be assigned later in the script so
+    the script is parsed by ScriptFileParser instead. Parameter values are evaluated only when they are extracted.
+
+    Args:
+        file_address (str): full path of the script file
+        param_names (list): names of parameters to look for. script is parsed by ScriptFileParser if not provided
+                            and the header does not cover the full script.
+    """
+    def __init__(self, file_address, param_names=None):
+        self.file_addr = file_address
+        self._docstring_src = None
+        self._params_src = {}
+        # full syntax tree parser for scripts that assign their parameters after the header
+        self._script_parser = None
+        try:
+            with open(file_address, 'r') as script_file:
+                self._source_lines = script_file.readlines()
+            # tokenizer does not expect the utf-8 byte order mark
+            if self._source_lines and self._source_lines[0].startswith(codecs.BOM_UTF8):
+                self._source_lines[0] = self._source_lines[0][len(codecs.BOM_UTF8):]
+            header_complete = self._read_metadata(set(param_names) if param_names else None)
+        except Exception as err:
+            raise PyRevitException('Error parsing script file: {} | {}'.format(self.file_addr, err))
+
+        if not header_complete:
+            self._script_parser = ScriptFileParser(file_address)
+
+    def _get_source(self, start, end):
+        (start_row, start_col), (end_row, end_col) = start, end
+        if start_row == end_row:
+            return self._source_lines[start_row - 1][start_col:end_col]
+
+        source = [self._source_lines[start_row - 1][start_col:]]
+        source.extend(self._source_lines[start_row:end_row - 1])
+        source.append(self._source_lines[end_row - 1][:end_col])
+        return ''.join(source)
+
+    def _read_statement(self, statement, first_statement):
+        """Reads the docstring or parameters from the given module-level statement.
+
+        Returns:
+            bool: False if statement is not part of the script header
+        """
+        # module docstring is the first statement if it only consists of string literals
+        if first_statement and all(token[0] == tokenize.STRING for token in statement):
+            self._docstring_src = self._get_source(statement[0][2], statement[-1][3])
+            return True
+
+        if statement[0][0] == tokenize.NAME and statement[0][1] in ('import', 'from'):
+            return True
+
+        # collect assignment targets e.g. __title__ = __doc__ = 'value'
+        targets = []
+        token_index = 0
+        while token_index + 1 < len(statement) \
+                and statement[token_index][0] == tokenize.NAME \
+                and statement[token_index + 1][1] == '=':
+            targets.append(statement[token_index][1])
+            token_index += 2
+
+        if targets and token_index < len(statement):
+            value_src = self._get_source(statement[token_index][2], statement[-1][3])
+            for target in targets:
+                # first assignment wins, same as ScriptFileParser.extract_param()
+                self._params_src.setdefault(target, value_src)
+            return True
+
+        return False
+
+    def _read_metadata(self, param_names):
+        """Reads the docstring and parameters from the script header.
+
+        Returns:
+            bool: False if the header has ended before all the requested parameters are found
+        """
+        source_lines = iter(self._source_lines)
+        indent_level = 0
+        first_statement = True
+        statement = []
+        for token in tokenize.generate_tokens(lambda: next(source_lines, '')):
+            token_type = token[0]
+            if token_type == tokenize.INDENT:
+                indent_level += 1
+            elif token_type == tokenize.DEDENT:
+                indent_level -= 1
+            elif indent_level > 0 or token_type in (tokenize.NL, tokenize.COMMENT):
+                # body of functions, classes, and other blocks are not module-level statements
+                continue
+            elif token_type in (tokenize.NEWLINE, tokenize.ENDMARKER) \
+                    or (token_type == tokenize.OP and token[1] == ';'):
+                if statement:
+                    # metadata is only read from the script header
+                    if not self._read_statement(statement, first_statement):
+                        return False
+                    first_statement = False
+                    statement = []
+                    # all requested params are found. no need to read the rest of the script
+                    if param_names and param_names.issubset(self._params_src):
+                        return True
+            else:
+                statement.append(token)
+        # full script is read
+        return True
+
+    def get_docstring(self):
+        if self._script_parser:
+            return self._script_parser.get_docstring()
+        if self._docstring_src:
+            import inspect
+            return inspect.cleandoc(ast.literal_eval(self._docstring_src))
+        return None
+
+    def extract_param(self, param_name):
+        if self._script_parser:
+            return self._script_parser.extract_param(param_name)
+        try:
+            if param_name in self._params_src:
+                return ast.literal_eval(self._params_src[param_name])
+        except Exception as err:
+            raise PyRevitException('Error parsing parameter: {} in script file for : {} | {}'.format(param_name,
+                                                                                                     self.file_addr,
+                                                                                                     err))
+
+        return None
+
+
 def get_all_subclasses(parent_classes):
     sub_classes = []
     # if super-class, get a list of sub-classes. Otherwise use component_class to create objects.
@@ -146,6 +279,15 @@ def get_revit_instance_count():
     return len(list(Process.GetProcessesByName(HOST_APP.proc_name)))
 
 
+def is_process_alive(proc_id):
+    """Checks if a process with the given id is running."""
+    try:
+        return not Process.GetProcessById(proc_id).HasExited
+    except Exception:
+        # GetProcessById raises an exception if process is not running
+        return False
+
+
 def run_process(proc, cwd=''):
     import subprocess
     return subprocess.Popen(proc, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd, shell=True)
@@ -196,21 +338,15 @@ def find_loaded_asm(asm_info, by_partial_name=False, by_location=False):
               If only one assembly has been found, it returns the assembly.
               None will be returned if assembly is not loaded.
     """
-    loaded_asm_list = []
-    for loaded_assembly in AppDomain.CurrentDomain.GetAssemblies():
-        if by_partial_name:
-            if asm_info.lower() in str(loaded_assembly.GetName().Name).lower():
-                loaded_asm_list.append(loaded_assembly)
-        elif by_location:
-            try:
-                if op.normpath(loaded_assembly.Location) == op.normpath(asm_info):
-                    loaded_asm_list.append(loaded_assembly)
-            except:
-                continue
-        elif asm_info.lower() == str(loaded_assembly.GetName().Name).lower():
-            loaded_asm_list.append(loaded_assembly)
-
-    return loaded_asm_list
+    # loaded assemblies are indexed as they are loaded. see asmregistry
+    from pyrevit.coreutils.asmregistry import get_asm_registry
+    asm_registry = get_asm_registry()
+    if by_partial_name:
+        return asm_registry.find_by_partial_name(asm_info)
+    elif by_location:
+        return asm_registry.find_by_location(asm_info)
+    else:
+        return asm_registry.find_by_name(asm_info)
 
 
 def load_asm(asm_name):
@@ -241,19 +377,6 @@ def get_str_hash(source_str):
     return hashlib.md5(source_str.encode('utf-8')).hexdigest()
 
 
-def calculate_dir_hash(dir_path, dir_filter, file_filter):
-    """Creates a unique hash # to represent state of directory."""
-    mtime_sum = 0
-    for root, dirs, files in os.walk(dir_path):
-        if re.search(dir_filter, op.basename(root), flags=re.IGNORECASE):
-            mtime_sum += op.getmtime(root)
-            for filename in files:
-                if re.search(file_filter, filename, flags=re.IGNORECASE):
-                    modtime = op.getmtime(op.join(root, filename))
-                    mtime_sum += modtime
-    return get_str_hash(str(mtime_sum))
-
-
 def prepare_html_str(input_string):
     return input_string.replace('<', '&clt;').replace('>', '&cgt;')
 
@@ -1,10 +1,11 @@
 import os
 import os.path as op
-import re
+import json
 
-from pyrevit import PYREVIT_APP_DIR, PYREVIT_VERSION_APP_DIR, FIRST_LOAD
+from pyrevit import HOST_APP, PYREVIT_APP_DIR, PYREVIT_VERSION_APP_DIR
 from pyrevit import PYREVIT_FILE_PREFIX_UNIVERSAL, PYREVIT_FILE_PREFIX, PYREVIT_FILE_PREFIX_STAMPED
 from pyrevit.coreutils import make_canonical_name
+from pyrevit.coreutils.filelock import write_file_atomic
 from pyrevit.coreutils.logger import get_logger
 
 # noinspection PyUnresolvedReferences
@@ -16,6 +17,14 @@ logger = get_logger(__name__)
 
 TEMP_FILE_EXT = 'tmp'
 
+SESSION_MANIFEST_FILE_ID = 'session'
+SESSION_MANIFEST_FILE_EXT = 'manifest'
+SESSION_MANIFEST_PID_KEY = 'pid'
+SESSION_MANIFEST_FILES_KEY = 'files'
+
+# full paths of appdata files that are used by this session. see save_session_manifest()
+_session_files = set()
+
 
 def _remove_app_file(file_path):
     try:
@@ -54,7 +63,9 @@ def _get_app_file(file_id, file_ext, filename_only=False, stamped=False, univers
     if filename_only:
         return full_filename
     else:
-        return op.join(appdata_folder, full_filename)
+        full_file_path = op.join(appdata_folder, full_filename)
+        _session_files.add(full_file_path)
+        return full_file_path
 
 
 def get_universal_data_file(file_id, file_ext, name_only=False):
@@ -107,6 +118,53 @@ def get_instance_data_file(file_id, file_ext=TEMP_FILE_EXT, name_only=False):
     return _get_app_file(file_id, file_ext, filename_only=name_only, stamped=True)
 
 
+def get_session_manifest_file():
+    """Get full file path to the manifest of appdata files used by current host instance."""
+    return get_instance_data_file(SESSION_MANIFEST_FILE_ID, SESSION_MANIFEST_FILE_EXT)
+
+
+def read_session_manifest(manifest_file):
+    """
+    Reads a session manifest. see save_session_manifest()
+
+    Args:
+        manifest_file (str): full path of the manifest file
+
+    Returns:
+        tuple: (process id of the host instance, list of full paths of the files used by the host instance)
+    """
+    with open(manifest_file, 'r') as mfile:
+        manifest_dict = json.load(mfile)
+    return manifest_dict[SESSION_MANIFEST_PID_KEY], manifest_dict[SESSION_MANIFEST_FILES_KEY]
+
+
+def save_session_manifest():
+    """
+    Saves the list of appdata files that are used by current host instance so they are not collected while the
+    host instance is running. see pyrevit.coreutils.appdatagc
+    Files requested from this module (e.g. get_data_file) are listed automatically.
+    """
+    manifest_file = get_session_manifest_file()
+    session_files = set(_session_files)
+    # keeping the files listed by earlier sessions of this host instance (before reloading)
+    if op.exists(manifest_file):
+        try:
+            session_files.update(read_session_manifest(manifest_file)[1])
+        except Exception as read_err:
+            logger.debug('Error reading session manifest: {} | {}'.format(manifest_file, read_err))
+
+    def _write_manifest(temp_file):
+        with open(temp_file, 'w') as mfile:
+            json.dump({SESSION_MANIFEST_PID_KEY: HOST_APP.proc_id,
+                       SESSION_MANIFEST_FILES_KEY: sorted(session_files)}, mfile)
+
+    try:
+        # other host instances might be reading the manifest
+        write_file_atomic(manifest_file, _write_manifest)
+    except Exception as save_err:
+        logger.error('Error saving session manifest: {} | {}'.format(manifest_file, save_err))
+
+
 def is_pyrevit_data_file(file_name):
     return PYREVIT_FILE_PREFIX in file_name
 
@@ -140,15 +198,3 @@ def list_session_data_files(file_ext):
 
 def garbage_data_file(file_path):
     _remove_app_file(file_path)
-
-
-def cleanup_appdata_folder():
-    if FIRST_LOAD:
-        finder = re.compile('(.+)_(.+)_(.+)_(\d+).+')
-        for appdata_file in os.listdir(PYREVIT_VERSION_APP_DIR):
-            file_name_pieces = finder.findall(appdata_file)
-            if file_name_pieces \
-            and len(file_name_pieces[0]) == 4 \
-            and int(file_name_pieces[0][3]) > 0 \
-            and appdata_file.endswith(TEMP_FILE_EXT):
-                _remove_app_file(op.join(PYREVIT_VERSION_APP_DIR, appdata_file))
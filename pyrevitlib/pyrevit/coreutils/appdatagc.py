@@ -0,0 +1,201 @@
+"""
+Garbage collector for the appdata folder of the current host version.
+Collector runs on a background thread after the session is loaded (see start_collector) so session load does not wait
+for it. Files in appdata folder are owned by host instances:
+
+    - files listed in the session manifest of a host instance (see appdata.save_session_manifest)
+    - files that are named by the process id of a host instance (instance data files, log files, temporary files)
+    - lock files that are held by a host instance (see pyrevit.coreutils.filelock)
+
+Files owned by a running host instance are never removed. Temporary files, lock files, and session manifests of host
+instances that are not running anymore are removed. All other files are removed when they are older than the age
+quota, and the oldest are removed while the appdata folder is larger than the size quota. Cache and assembly files
+that are removed this way are rebuilt when needed again.
+
+Quotas are set by 'appdatamaxsize' (megabytes) and 'appdatamaxage' (days) in user config.
+
+Example:
+    >>> from pyrevit.coreutils import appdatagc
+    >>> appdatagc.collect(max_size=100 * 1024 * 1024, max_age=7 * 24 * 3600, is_alive=lambda pid: pid == 1234)
+"""
+
+import os
+import os.path as op
+import re
+import time
+import shutil
+import threading
+
+from pyrevit import PYREVIT_VERSION_APP_DIR, PYREVIT_FILE_PREFIX
+from pyrevit.coreutils import is_process_alive
+import pyrevit.coreutils.appdata as appdata
+from pyrevit.coreutils.filelock import get_lock_owner, LOCK_FILE_EXT, TEMP_FILE_EXT
+from pyrevit.coreutils.logger import get_logger
+from pyrevit.userconfig import user_config
+
+
+logger = get_logger(__name__)
+
+
+DEFAULT_MAX_SIZE = 500      # megabytes
+DEFAULT_MAX_AGE = 30        # days
+
+# files named by the process id of the host instance e.g. pyrevit_2016_eirannejad_2353_file_id.file_ext
+STAMPED_FILE_FINDER = re.compile(re.escape(PYREVIT_FILE_PREFIX) + r'_(\d+)[_.]')
+# temporary files named by the process id of the host instance e.g. file_name.2353.tmp
+TEMP_FILE_FINDER = re.compile(r'\.(\d+)\.' + TEMP_FILE_EXT + '$')
+
+
+class _AppDataEntry(object):
+    def __init__(self, entry_path):
+        self.path = entry_path
+        self.name = op.basename(entry_path)
+        self.is_dir = op.isdir(entry_path)
+        self.mtime = op.getmtime(entry_path)
+        if self.is_dir:
+            self.size = sum(op.getsize(op.join(root, x)) for root, _, files in os.walk(entry_path) for x in files)
+        else:
+            self.size = op.getsize(entry_path)
+
+        self.owner_id = None
+        # session-scoped entries are only useful while their owner is running
+        self.session_scoped = False
+
+        temp_match = TEMP_FILE_FINDER.search(self.name)
+        stamped_match = STAMPED_FILE_FINDER.match(self.name)
+        if temp_match:
+            self.owner_id = int(temp_match.group(1))
+            self.session_scoped = True
+        elif self.name.endswith('.' + LOCK_FILE_EXT):
+            self.owner_id = get_lock_owner(entry_path)
+            self.session_scoped = self.owner_id is not None
+        elif stamped_match:
+            self.owner_id = int(stamped_match.group(1))
+            self.session_scoped = self.name.endswith(('.' + appdata.TEMP_FILE_EXT,
+                                                      '.' + appdata.SESSION_MANIFEST_FILE_EXT))
+
+    @property
+    def is_manifest(self):
+        return self.owner_id is not None and self.name.endswith('.' + appdata.SESSION_MANIFEST_FILE_EXT)
+
+    def remove(self):
+        try:
+            if self.is_dir:
+                shutil.rmtree(self.path)
+            else:
+                os.remove(self.path)
+            logger.debug('Removed appdata file: {}'.format(self.path))
+            return True
+        except Exception as remove_err:
+            # file might be in use
+            logger.debug('Can not remove appdata file: {} | {}'.format(self.path, remove_err))
+            return False
+
+
+def _list_entries(app_dir):
+    entries = []
+    for entry_name in os.listdir(app_dir):
+        try:
+            entries.append(_AppDataEntry(op.join(app_dir, entry_name)))
+        except OSError:
+            # entry is removed in the meantime
+            continue
+    return entries
+
+
+def collect(max_size, max_age, is_alive=is_process_alive, now=None, app_dir=PYREVIT_VERSION_APP_DIR):
+    """Removes garbage files from appdata folder. See module documentation for the rules.
+
+    Args:
+        max_size (int): size quota in bytes
+        max_age (float): age quota in seconds
+        is_alive (function): function that checks if a process id is running. see coreutils.is_process_alive()
+        now (float): current time. defaults to time.time()
+        app_dir (str): appdata folder. defaults to appdata folder of current host version
+
+    Returns:
+        list: full paths of removed files
+    """
+    now = now or time.time()
+    alive_ids = {}
+
+    def _is_owner_alive(owner_id):
+        if owner_id not in alive_ids:
+            alive_ids[owner_id] = is_alive(owner_id)
+        return alive_ids[owner_id]
+
+    entries = _list_entries(app_dir)
+    total_size = sum(x.size for x in entries)
+    removed_files = []
+
+    # files listed by running host instances are in use
+    used_files = set()
+    all_manifests_read = True
+    for entry in entries:
+        if entry.is_manifest and _is_owner_alive(entry.owner_id):
+            try:
+                used_files.update(op.normcase(x) for x in appdata.read_session_manifest(entry.path)[1])
+            except Exception as read_err:
+                logger.debug('Error reading session manifest: {} | {}'.format(entry.path, read_err))
+                all_manifests_read = False
+
+    collectable_entries = []
+    for entry in entries:
+        if entry.owner_id is not None and _is_owner_alive(entry.owner_id):
+            continue
+        elif entry.session_scoped:
+            if entry.remove():
+                removed_files.append(entry.path)
+                total_size -= entry.size
+        elif op.normcase(entry.path) not in used_files:
+            collectable_entries.append(entry)
+
+    # quotas can only be applied if all files in use are known
+    if not all_manifests_read:
+        logger.debug('Skipping appdata quotas since not all files in use are known.')
+        return removed_files
+
+    for entry in sorted(collectable_entries, key=lambda x: x.mtime):
+        if now - entry.mtime > max_age or total_size > max_size:
+            if entry.remove():
+                removed_files.append(entry.path)
+                total_size -= entry.size
+
+    logger.debug('Removed {} files from appdata. Remaining size: {} bytes'.format(len(removed_files), total_size))
+    return removed_files
+
+
+def _get_quotas():
+    try:
+        max_size = user_config.core.appdatamaxsize
+    except AttributeError:
+        user_config.core.appdatamaxsize = max_size = DEFAULT_MAX_SIZE
+        user_config.save_changes()
+
+    try:
+        max_age = user_config.core.appdatamaxage
+    except AttributeError:
+        user_config.core.appdatamaxage = max_age = DEFAULT_MAX_AGE
+        user_config.save_changes()
+
+    return max_size * 1024 * 1024, max_age * 24 * 3600
+
+
+def _collect_garbage(max_size, max_age):
+    try:
+        collect(max_size, max_age)
+    except Exception as collect_err:
+        logger.debug('Error collecting appdata garbage: {}'.format(collect_err))
+
+
+def start_collector():
+    """Saves the session manifest and collects appdata garbage on a background thread.
+
+    Returns:
+        threading.Thread: collector thread
+    """
+    appdata.save_session_manifest()
+    collector = threading.Thread(target=_collect_garbage, args=_get_quotas(), name='AppDataCollector')
+    collector.daemon = True
+    collector.start()
+    return collector
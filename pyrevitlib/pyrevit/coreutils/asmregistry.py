@@ -0,0 +1,110 @@
+"""
+Registry of the assemblies loaded in the current AppDomain.
+Registry listens to the AssemblyLoad event of the AppDomain and indexes the loaded assemblies by their simple name
+and location, so finding a loaded assembly does not need to walk all the loaded assemblies (see
+pyrevit.coreutils.find_loaded_asm). Registry is created once per AppDomain and is shared between script engines
+through the pyRevit environment variables so the event is only subscribed once.
+
+Example:
+    >>> from pyrevit.coreutils import asmregistry
+    >>> asmregistry.get_asm_registry().find_by_name('RevitAPI')
+    [<Assembly RevitAPI, Version=...>]
+"""
+
+import os.path as op
+import threading
+
+from pyrevit import PYREVIT_ADDON_NAME
+from pyrevit.coreutils.envvars import get_pyrevit_env_var, set_pyrevit_env_var
+from pyrevit.coreutils.logger import get_logger
+
+# noinspection PyUnresolvedReferences
+from System import AppDomain
+
+
+logger = get_logger(__name__)
+
+
+# assembly registry of the current AppDomain is shared between script engines
+ASM_REGISTRY_ISC_NAME = PYREVIT_ADDON_NAME + '_asmregistryISC'
+
+
+def _make_location_key(asm_location):
+    return op.normcase(op.normpath(asm_location))
+
+
+class LoadedAssemblyRegistry(object):
+    """Index of the loaded assemblies by simple name and location.
+    Registry is kept up to date by the AssemblyLoad event of the given event source. see start()
+    """
+    def __init__(self):
+        self._by_name = {}
+        self._by_location = {}
+        self._registered = set()
+        self._lock = threading.Lock()
+
+    def add(self, loaded_asm):
+        """Adds the given assembly to the registry."""
+        asm_name = str(loaded_asm.GetName().Name).lower()
+        try:
+            # dynamic assemblies do not have a location
+            asm_location = loaded_asm.Location
+        except Exception:
+            asm_location = None
+
+        # assemblies are loaded on multiple threads
+        with self._lock:
+            if loaded_asm in self._registered:
+                return
+            self._registered.add(loaded_asm)
+            self._by_name.setdefault(asm_name, []).append(loaded_asm)
+            if asm_location:
+                self._by_location.setdefault(_make_location_key(asm_location), []).append(loaded_asm)
+
+    def _on_assembly_load(self, sender, args):
+        # event is raised on the loading thread for every assembly loaded in the AppDomain. errors must not reach
+        # the loads of the host or other add-ins
+        try:
+            self.add(args.LoadedAssembly)
+        except Exception as add_err:
+            logger.debug('Error registering loaded assembly: {} | {}'.format(args.LoadedAssembly, add_err))
+
+    def start(self, app_domain):
+        """Starts listening to the assembly loads of the given AppDomain and adds the already loaded assemblies.
+
+        Args:
+            app_domain (System.AppDomain): AppDomain, or any event source with AssemblyLoad event and
+                                           GetAssemblies() method
+        """
+        # subscribing first so no assembly is missed. assemblies are only added once
+        app_domain.AssemblyLoad += self._on_assembly_load
+        for loaded_asm in app_domain.GetAssemblies():
+            self.add(loaded_asm)
+
+    def find_by_name(self, asm_name):
+        """Returns the list of loaded assemblies with the given simple name (case-insensitive)."""
+        with self._lock:
+            return list(self._by_name.get(asm_name.lower(), []))
+
+    def find_by_partial_name(self, partial_name):
+        """Returns the list of loaded assemblies that include the given string in their simple name."""
+        partial_name = partial_name.lower()
+        with self._lock:
+            return [asm for asm_name, asm_list in self._by_name.items() if partial_name in asm_name
+                    for asm in asm_list]
+
+    def find_by_location(self, asm_location):
+        """Returns the list of loaded assemblies loaded from the given file."""
+        with self._lock:
+            return list(self._by_location.get(_make_location_key(asm_location), []))
+
+
+def get_asm_registry():
+    """Returns the assembly registry of the current AppDomain. Registry is created on first call."""
+    asm_registry = get_pyrevit_env_var(ASM_REGISTRY_ISC_NAME)
+    if not asm_registry:
+        logger.debug('Starting loaded assembly registry.')
+        asm_registry = LoadedAssemblyRegistry()
+        asm_registry.start(AppDomain.CurrentDomain)
+        set_pyrevit_env_var(ASM_REGISTRY_ISC_NAME, asm_registry)
+    return asm_registry
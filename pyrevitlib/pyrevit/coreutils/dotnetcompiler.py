@@ -14,6 +14,18 @@ from System.CodeDom import Compiler
 logger = get_logger(__name__)
 
 
+class PyRevitCompileError(PyRevitException):
+    """Compile error with the list of errors reported by the compiler.
+
+    Attributes:
+        errors (list): list of (source file name, line number, error text) for each error.
+                       source file name is set by #line directives in the source code.
+    """
+    def __init__(self, message, errors):
+        PyRevitException.__init__(self, message)
+        self.errors = errors
+
+
 def _compile_dotnet(code_provider,
                     sourcecode_list,
                     full_output_file_addr=None,
@@ -49,7 +61,9 @@ def _compile_dotnet(code_provider,
 
     if compiler.Errors.HasErrors:
         error_list = [str(err) for err in compiler.Errors.GetEnumerator()]
-        raise PyRevitException("Compile error: {}".format(error_list))
+        errors = [(err.FileName, err.Line, err.ErrorText) for err in compiler.Errors.GetEnumerator()
+                  if not err.IsWarning]
+        raise PyRevitCompileError("Compile error: {}".format(error_list), errors)
 
     if full_output_file_addr is None:
         logger.debug('Compile to memory successful: {}'.format(compiler.CompiledAssembly))
@@ -0,0 +1,195 @@
+"""
+Lock files for building files that are shared between host instances (e.g. cache files and extension assemblies).
+The first instance that takes the lock of a file builds the file and the other instances wait on the lock and then
+reuse the result. A lock is recovered when its holder process is not running anymore or has held the lock for too
+long. Files are written under a temporary name and renamed into place (see write_file_atomic) so other instances
+never read a partially written file.
+
+Example:
+    >>> with FileLock(get_lock_file(cache_file)):
+    ...     if not is_cache_valid():
+    ...         write_file_atomic(cache_file, write_cache)
+"""
+
+import os
+import os.path as op
+import time
+import shutil
+import tempfile
+
+from pyrevit import HOST_APP
+from pyrevit.coreutils import is_process_alive
+from pyrevit.coreutils.logger import get_logger
+
+# noinspection PyUnresolvedReferences
+from System.IO import File
+
+
+logger = get_logger(__name__)
+
+
+LOCK_FILE_EXT = 'lock'
+TEMP_FILE_EXT = 'tmp'
+
+# seconds to wait for a lock before giving up
+LOCK_TIMEOUT = 60
+# seconds between checking the lock
+LOCK_POLL_INTERVAL = 0.1
+# locks held longer than this many seconds are recovered even if their holder is running
+STALE_LOCK_AGE = 300
+
+
+def get_lock_file(file_path):
+    """Returns full path of the lock file for the given file. Lock file is next to the given file."""
+    return '{}.{}'.format(file_path, LOCK_FILE_EXT)
+
+
+def get_lock_owner(lock_file):
+    """Returns the process id of the holder of the given lock file or None if not known."""
+    try:
+        with open(lock_file, 'r') as lfile:
+            return int(lfile.read().strip())
+    except (IOError, OSError, ValueError):
+        return None
+
+
+class FileLock(object):
+    """Lock on the given lock file. Lock is taken by creating the lock file and released by removing it.
+
+    Args:
+        lock_file (str): full path of the lock file. see get_lock_file()
+        timeout (float): seconds to wait for the lock. see acquire()
+    """
+    def __init__(self, lock_file, timeout=LOCK_TIMEOUT):
+        self.lock_file = lock_file
+        self.timeout = timeout
+        self.is_locked = False
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exception, exception_value, traceback):
+        self.release()
+
+    def _is_stale(self):
+        try:
+            lock_age = time.time() - op.getmtime(self.lock_file)
+        except OSError:
+            # lock is just released
+            return False
+
+        owner_id = get_lock_owner(self.lock_file)
+        # lock file is created before the owner id is written. a lock without owner is only stale if it's old
+        if owner_id is not None and owner_id != HOST_APP.proc_id and not is_process_alive(owner_id):
+            logger.debug('Lock holder is not running: {} | {}'.format(self.lock_file, owner_id))
+            return True
+        elif lock_age > STALE_LOCK_AGE:
+            logger.debug('Lock is held for too long: {} | {}'.format(self.lock_file, lock_age))
+            return True
+        return False
+
+    def _try_lock(self):
+        try:
+            lock_fd = os.open(self.lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError:
+            if not op.exists(self.lock_file):
+                raise
+            return False
+
+        try:
+            os.write(lock_fd, str(HOST_APP.proc_id))
+        finally:
+            os.close(lock_fd)
+        return True
+
+    def acquire(self):
+        """Waits for the lock and takes it.
+
+        Returns:
+            bool: True if the lock is taken. False if the lock could not be taken in time and the caller has to
+                  continue without the lock.
+        """
+        start_time = time.time()
+        while True:
+            try:
+                if self._try_lock():
+                    self.is_locked = True
+                    return True
+            except Exception as lock_err:
+                logger.debug('Can not create lock file: {} | {}'.format(self.lock_file, lock_err))
+                return False
+
+            if self._is_stale():
+                # two waiters might recover the same lock at the same time and both take the lock. this only causes
+                # duplicate work since the locked files are written atomically.
+                logger.debug('Recovering stale lock: {}'.format(self.lock_file))
+                try:
+                    os.remove(self.lock_file)
+                except OSError:
+                    # another instance might have recovered the lock already
+                    pass
+                continue
+
+            if time.time() - start_time > self.timeout:
+                logger.warning('Timed out waiting for lock: {}'.format(self.lock_file))
+                return False
+
+            time.sleep(LOCK_POLL_INTERVAL)
+
+    def release(self):
+        if self.is_locked:
+            self.is_locked = False
+            try:
+                os.remove(self.lock_file)
+            except OSError as release_err:
+                logger.debug('Error removing lock file: {} | {}'.format(self.lock_file, release_err))
+
+
+def replace_file(source_file, target_file):
+    """Moves source_file into place of target_file.
+    Existing target_file is replaced in a single step so other host instances never find it missing.
+    """
+    try:
+        os.rename(source_file, target_file)
+    except OSError:
+        # rename does not replace existing files on windows
+        if not op.exists(target_file):
+            raise
+        File.Replace(source_file, target_file, None)
+
+
+def write_file_atomic(file_path, write_func):
+    """Writes a file under a temporary name and moves it into place when complete.
+
+    Args:
+        file_path (str): full path of the file
+        write_func (function): function that writes the file. It gets the full path of the temporary file.
+    """
+    temp_file = '{}.{}.{}'.format(file_path, HOST_APP.proc_id, TEMP_FILE_EXT)
+    try:
+        write_func(temp_file)
+        replace_file(temp_file, file_path)
+    finally:
+        if op.exists(temp_file):
+            os.remove(temp_file)
+
+
+def write_file_staged(file_path, write_func):
+    """Writes a file into a staging folder under its final name and moves it into place when complete.
+    This is used instead of write_file_atomic() when the file name matters to the writer, e.g. the compiler names
+    an assembly after its output file. Staging folder is named by process id so it can be collected if this host
+    instance crashes. see pyrevit.coreutils.appdatagc
+
+    Args:
+        file_path (str): full path of the file
+        write_func (function): function that writes the file. It gets the full path of the staged file.
+    """
+    staging_dir = tempfile.mkdtemp(suffix='.{}.{}'.format(HOST_APP.proc_id, TEMP_FILE_EXT),
+                                   dir=op.dirname(file_path))
+    try:
+        staged_file = op.join(staging_dir, op.basename(file_path))
+        write_func(staged_file)
+        replace_file(staged_file, file_path)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
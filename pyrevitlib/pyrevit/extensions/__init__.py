@@ -84,3 +84,6 @@ LINK_BUTTON_COMMAND_CLASS_PARAM = '__commandclass__'
 
 COMMAND_AVAILABILITY_NAME_POSTFIX = 'Availab'
 COMP_LIBRARY_DIR_NAME = 'lib'
+
+# Pre-parsed extension manifest. see pyrevit.extensions.manifest
+EXT_MANIFEST_FILE = '_manifest.json'
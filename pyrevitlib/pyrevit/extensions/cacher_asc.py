@@ -1,78 +1,126 @@
+"""
+Human-readable cache for parsed extensions.
+Cache file is made of compact json lines:
+
+    header          first line. cache format version and the values that are needed to validate the cache.
+                    see is_cache_valid()
+    extension       second line. cached attributes of the extension itself
+    components      one line per component (tabs, panels, buttons, ...) in depth-first order. Each line is tagged with
+                    the component type_id and its depth under the extension so the component tree can be rebuilt
+                    while the file is read line by line.
+"""
+
+import os.path as op
 import json
 
 from pyrevit import PyRevitException
 import pyrevit.coreutils.appdata as appdata
 from pyrevit.coreutils import get_all_subclasses
+from pyrevit.coreutils.filelock import write_file_atomic
 from pyrevit.coreutils.logger import get_logger
+from pyrevit.extensions.cachestats import compare_cache_header, CACHE_HIT, CACHE_MISS, CACHE_INVALID_FORMAT
 
 
 logger = get_logger(__name__)
 
 
+# cache files of other format versions are not valid
+CACHE_FORMAT_VERSION = 3
+
+CACHE_FORMAT_KEY = 'cache_format'
 EXT_HASH_VALUE_KEY = 'dir_hash_value'
 EXT_HASH_VERSION_KEY = 'pyrvt_version'
 EXT_DIR_KEY = 'directory'
 SUB_CMP_KEY = '_sub_components'
 TYPE_ID_KEY = 'type_id'
-NAME_KEY = 'name'
+DEPTH_KEY = '_cache_depth'
+
+# {component class: {type_id: sub component class}}
+_sub_cmp_classes = {}
 
 
-def _get_cache_file(cached_ext):
+def get_cache_file(cached_ext):
+    """Returns full path of the cache file of the given extension."""
     return appdata.get_data_file(file_id='cache_{}'.format(cached_ext.name), file_ext='json')
 
 
-def _make_cache_from_cmp(obj):
-    return json.dumps(obj, default=lambda o: o.get_cache_data(), sort_keys=True, indent=4)
+def _get_sub_cmp_classes(cmp_class):
+    if cmp_class not in _sub_cmp_classes:
+        _sub_cmp_classes[cmp_class] = dict((x.type_id, x) for x in get_all_subclasses(cmp_class.allowed_sub_cmps))
+    return _sub_cmp_classes[cmp_class]
+
+
+def _make_cache_header(obj):
+    # json.dumps does not add line breaks when indent is not set so each json object is a single line
+    return json.dumps({CACHE_FORMAT_KEY: CACHE_FORMAT_VERSION,
+                       EXT_DIR_KEY: obj.directory,
+                       EXT_HASH_VERSION_KEY: obj.pyrvt_version,
+                       EXT_HASH_VALUE_KEY: obj.dir_hash_value}, sort_keys=True)
+
 
+def _make_cache_line(component, depth):
+    cache_dict = component.get_cache_data()
+    cache_dict.pop(SUB_CMP_KEY, None)
+    cache_dict[DEPTH_KEY] = depth
+    return json.dumps(cache_dict, sort_keys=True)
 
-def _make_sub_cmp_from_cache(parent_cmp, cached_sub_cmps):
-    logger.debug('Processing cache for: {}'.format(parent_cmp))
-    # get allowed classes under this component
-    allowed_sub_cmps = get_all_subclasses(parent_cmp.allowed_sub_cmps)
-    logger.debug('Allowed sub components are: {}'.format(allowed_sub_cmps))
-    # iterate through list of cached sub components
-    for cached_cmp in cached_sub_cmps:  # type: dict
-        for sub_class in allowed_sub_cmps:
-            if sub_class.type_id == cached_cmp[TYPE_ID_KEY]:
-                logger.debug('Creating sub component from cache: {}, {}'.format(cached_cmp[NAME_KEY], sub_class))
 
-                # cached_cmp might contain SUB_CMP_KEY. This needs to be removed since this function will make
-                # all the children recursively. So if this component has SUB_CMP_KEY means it has sub components:
-                sub_cmp_cache = None
-                if SUB_CMP_KEY in cached_cmp.keys():
-                    # drop subcomponents dict from cached_cmp since we don't want the loaded_cmp to include this
-                    sub_cmp_cache = cached_cmp.pop(SUB_CMP_KEY)
+def _make_cache_lines(parent_cmp, depth=1):
+    for component in parent_cmp.get_components():
+        yield _make_cache_line(component, depth)
+        if component.is_container:
+            for cache_line in _make_cache_lines(component, depth + 1):
+                yield cache_line
 
-                # create sub component from cleaned cached_cmp
-                loaded_cmp = sub_class()
-                loaded_cmp.load_cache_data(cached_cmp)
 
-                # now process sub components for loaded_cmp if any
-                if sub_cmp_cache:
-                    _make_sub_cmp_from_cache(loaded_cmp, sub_cmp_cache)
+def _make_sub_cmps_from_cache(installed_ext, cache_lines):
+    # containers from the extension down to the parent of the current line
+    parent_cmps = [installed_ext]
+    for cache_line in cache_lines:
+        cached_cmp = json.loads(cache_line)
+        depth = cached_cmp.pop(DEPTH_KEY)
+        if not depth:
+            installed_ext.load_cache_data(cached_cmp)
+            continue
 
-                parent_cmp.add_component(loaded_cmp)
+        del parent_cmps[depth:]
+        parent_cmp = parent_cmps[-1]
 
+        try:
+            loaded_cmp = _get_sub_cmp_classes(type(parent_cmp))[cached_cmp[TYPE_ID_KEY]]()
+        except KeyError:
+            raise PyRevitException('Unknown component type in cache: {}'.format(cached_cmp[TYPE_ID_KEY]))
 
-def _read_cache_for(cached_ext):
+        loaded_cmp.load_cache_data(cached_cmp)
+        parent_cmp.add_component(loaded_cmp)
+        if loaded_cmp.is_container:
+            parent_cmps.append(loaded_cmp)
+
+
+def _read_cache_header_for(cached_ext):
     try:
-        logger.debug('Reading cache for: {}'.format(cached_ext))
-        cache_file = _get_cache_file(cached_ext)
-        logger.debug('Cache file is: {}'.format(cache_file))
-        with open(_get_cache_file(cached_ext), 'r') as cache_file:
-            cached_tab_dict = json.load(cache_file)
-        return cached_tab_dict
+        logger.debug('Reading cache header for: {}'.format(cached_ext))
+        with open(get_cache_file(cached_ext), 'r') as cache_file:
+            return json.loads(cache_file.readline())
     except Exception as err:
-        raise PyRevitException('Error reading cache for: {} | {}'.format(cached_ext, err))
+        raise PyRevitException('Error reading cache header for: {} | {}'.format(cached_ext, err))
+
+
+def _write_cache_file(parsed_ext, cache_file):
+    with open(cache_file, 'w') as cache_file:
+        cache_file.write(_make_cache_header(parsed_ext) + '\n')
+        cache_file.write(_make_cache_line(parsed_ext, 0) + '\n')
+        for cache_line in _make_cache_lines(parsed_ext):
+            cache_file.write(cache_line + '\n')
 
 
 def _write_cache_for(parsed_ext):
     try:
         logger.debug('Writing cache for: {}'.format(parsed_ext))
-        cache_file = _get_cache_file(parsed_ext)
+        cache_file = get_cache_file(parsed_ext)
         logger.debug('Cache file is: {}'.format(cache_file))
-        with open(cache_file, 'w') as cache_file:
-            cache_file.write(_make_cache_from_cmp(parsed_ext))
+        # other host instances might be reading the cache file
+        write_file_atomic(cache_file, lambda temp_file: _write_cache_file(parsed_ext, temp_file))
     except Exception as err:
         raise PyRevitException('Error writing cache for: {} | {}'.format(parsed_ext, err))
 
@@ -84,39 +132,47 @@ def update_cache(parsed_ext):
 
 
 def get_cached_extension(installed_ext):
-    cached_ext_dict = _read_cache_for(installed_ext)
     try:
-        logger.debug('Constructing components from cache for: {}'.format(installed_ext))
-        # get cached sub component dictionary and call recursive maker function
-        _make_sub_cmp_from_cache(installed_ext, cached_ext_dict.pop(SUB_CMP_KEY))
+        logger.debug('Reading cache for: {}'.format(installed_ext))
+        cache_file = get_cache_file(installed_ext)
+        logger.debug('Cache file is: {}'.format(cache_file))
+        with open(cache_file, 'r') as cache_file:
+            # skip the header line
+            cache_file.readline()
+            # components are created while the cache file is read
+            _make_sub_cmps_from_cache(installed_ext, cache_file)
         logger.debug('Load successful...')
     except Exception as err:
-        logger.debug('Error reading cache...')
-        raise PyRevitException(err)
+        raise PyRevitException('Error reading cache for: {} | {}'.format(installed_ext, err))
 
     return installed_ext
 
 
-def is_cache_valid(extension):
-    try:
-        cached_ext_dict = _read_cache_for(extension)  # type: dict
-        logger.debug('Extension cache directory is: {} for: {}'.format(extension.directory, extension))
-        cache_dir_valid = cached_ext_dict[EXT_DIR_KEY] == extension.directory
+def get_cache_state(extension):
+    """Validates the cache of the extension.
 
-        logger.debug('Extension cache version is: {} for: {}'.format(extension.pyrvt_version, extension))
-        cache_version_valid = cached_ext_dict[EXT_HASH_VERSION_KEY] == extension.pyrvt_version
+    Returns:
+        str: cachestats.CACHE_HIT if cache is valid, otherwise the reason it's not valid
+    """
+    if not op.exists(get_cache_file(extension)):
+        logger.debug('Cache file is not available for: {}'.format(extension))
+        return CACHE_MISS
 
-        logger.debug('Extension hash value is: {} for: {}'.format(extension.dir_hash_value, extension))
-        cache_hash_valid = cached_ext_dict[EXT_HASH_VALUE_KEY] == extension.dir_hash_value
+    try:
+        cached_ext_dict = _read_cache_header_for(extension)  # type: dict
+    except PyRevitException as err:
+        logger.debug(err)
+        return CACHE_INVALID_FORMAT
 
-        cache_valid = cache_dir_valid and cache_version_valid and cache_hash_valid
+    if cached_ext_dict.get(CACHE_FORMAT_KEY, None) != CACHE_FORMAT_VERSION:
+        logger.debug('Cache file is made in another format for: {}'.format(extension))
+        return CACHE_INVALID_FORMAT
 
-        # cache is valid if both version and hash value match
-        return cache_valid
+    return compare_cache_header(extension,
+                                cached_ext_dict.get(EXT_DIR_KEY, None),
+                                cached_ext_dict.get(EXT_HASH_VERSION_KEY, None),
+                                cached_ext_dict.get(EXT_HASH_VALUE_KEY, None))
 
-    except PyRevitException as err:
-        logger.debug(err)
-        return False
 
-    except Exception as err:
-        logger.debug('Error determining cache validity: {} | {}'.format(extension, err))
+def is_cache_valid(extension):
+    return get_cache_state(extension) == CACHE_HIT
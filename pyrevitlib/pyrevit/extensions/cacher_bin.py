@@ -1,71 +1,395 @@
-import pickle
+"""
+Compact binary cache for parsed extensions.
+Cache file is made of a string table, fixed-size node records (one per component) and a data section that holds the
+attributes of the components. All strings (names, paths, docstrings, ...) are stored once in the string table and are
+referenced by index. Children of a component are stored next to each other so each node only keeps the index of
+its first child and the number of children.
+
+Components are decoded lazily: loading a cached extension only decodes the extension node. Sub-components of a
+container are decoded when the container is first visited (see _LazyComponentList) so the loader can walk the
+tree without building the full object graph first.
+
+File layout (little-endian):
+    header          magic, format version, string count, string data size, node count, data size
+    validation      utf-8 encoded size of directory, pyRevit version, and directory hash of the extension,
+                    followed by the encoded values. see is_cache_valid()
+    string table    uint32 length of each string, followed by utf-8 encoded strings
+    node records    (type_id string index, attributes offset, first child index, child count) per node
+    data            attributes of each node: uint16 count, then (name string index, tagged value) pairs
+"""
+
+import os.path as op
+import struct
 
 from pyrevit import PyRevitException
 import pyrevit.coreutils.appdata as appdata
+from pyrevit.coreutils import get_all_subclasses
+from pyrevit.coreutils.filelock import write_file_atomic
 from pyrevit.coreutils.logger import get_logger
+from pyrevit.extensions.cachestats import compare_cache_header, CACHE_HIT, CACHE_MISS, CACHE_INVALID_FORMAT
 
 logger = get_logger(__name__)
 
 
-loaded_extensions = []
+CACHE_FILE_EXT = 'bincache'
+# extension of the pickle cache files that were used before the binary format
+LEGACY_CACHE_FILE_EXT = 'pickle'
+
+CACHE_MAGIC = 'PYRVTBC\x00'
+CACHE_FORMAT_VERSION = 4
+
+HEADER_STRUCT = struct.Struct('<8sHIIII')
+VALIDATION_STRUCT = struct.Struct('<HHH')
+NODE_STRUCT = struct.Struct('<IIII')
+UINT16_STRUCT = struct.Struct('<H')
+UINT32_STRUCT = struct.Struct('<I')
+INT64_STRUCT = struct.Struct('<q')
+FLOAT_STRUCT = struct.Struct('<d')
+
+# value tags
+NONE_TAG = 'N'
+TRUE_TAG = 'T'
+FALSE_TAG = 'F'
+INT_TAG = 'i'
+FLOAT_TAG = 'f'
+STR_TAG = 's'
+LIST_TAG = 'l'
+TUPLE_TAG = 't'
+DICT_TAG = 'd'
+
+# these attributes are not stored as values. sub-components are stored as nodes
+TYPE_ID_KEY = 'type_id'
+SUB_CMP_KEY = '_sub_components'
+
+# extension attributes in the validation header
+EXT_DIR_KEY = 'directory'
+EXT_HASH_VERSION_KEY = 'pyrvt_version'
+EXT_HASH_VALUE_KEY = 'dir_hash_value'
+
+# {component class: {type_id: sub component class}}
+_sub_cmp_classes = {}
+
+
+def get_cache_file(cached_ext):
+    """Returns full path of the cache file of the given extension."""
+    return appdata.get_data_file(file_id='cache_{}'.format(cached_ext.name), file_ext=CACHE_FILE_EXT)
+
+
+def _encode(value):
+    return value.encode('utf-8') if isinstance(value, unicode) else value
+
+
+def _get_sub_cmp_classes(cmp_class):
+    if cmp_class not in _sub_cmp_classes:
+        _sub_cmp_classes[cmp_class] = dict((x.type_id, x) for x in get_all_subclasses(cmp_class.allowed_sub_cmps))
+    return _sub_cmp_classes[cmp_class]
+
+
+class _CacheWriter(object):
+    def __init__(self):
+        self._strings = []
+        self._string_ids = {}
+        self._nodes = []
+        self._data = []
+        self._data_size = 0
+
+    def _add_data(self, data):
+        self._data.append(data)
+        self._data_size += len(data)
+
+    def _get_string_id(self, value):
+        if value not in self._string_ids:
+            self._string_ids[value] = len(self._strings)
+            self._strings.append(_encode(value))
+        return self._string_ids[value]
+
+    def _write_value(self, value):
+        if value is None:
+            self._add_data(NONE_TAG)
+        elif value is True:
+            self._add_data(TRUE_TAG)
+        elif value is False:
+            self._add_data(FALSE_TAG)
+        elif isinstance(value, (int, long)) and -2 ** 63 <= value < 2 ** 63:
+            self._add_data(INT_TAG + INT64_STRUCT.pack(value))
+        elif isinstance(value, float):
+            self._add_data(FLOAT_TAG + FLOAT_STRUCT.pack(value))
+        elif isinstance(value, basestring):
+            self._add_data(STR_TAG + UINT32_STRUCT.pack(self._get_string_id(value)))
+        elif isinstance(value, (list, tuple)):
+            self._add_data((TUPLE_TAG if isinstance(value, tuple) else LIST_TAG) + UINT32_STRUCT.pack(len(value)))
+            for item in value:
+                self._write_value(item)
+        elif isinstance(value, dict):
+            self._add_data(DICT_TAG + UINT32_STRUCT.pack(len(value)))
+            for k, v in value.items():
+                self._write_value(k)
+                self._write_value(v)
+        else:
+            raise PyRevitException('Can not cache value of unsupported type: {}'.format(type(value)))
+
+    def _write_attrs(self, component):
+        attrs_offset = self._data_size
+        cache_dict = component.get_cache_data()
+        cache_dict.pop(TYPE_ID_KEY, None)
+        cache_dict.pop(SUB_CMP_KEY, None)
+        self._add_data(UINT16_STRUCT.pack(len(cache_dict)))
+        for k, v in cache_dict.items():
+            self._add_data(UINT32_STRUCT.pack(self._get_string_id(k)))
+            self._write_value(v)
+        return attrs_offset
+
+    @staticmethod
+    def _make_validation_header(extension):
+        validation_values = [_encode(getattr(extension, x) or '')
+                             for x in (EXT_DIR_KEY, EXT_HASH_VERSION_KEY, EXT_HASH_VALUE_KEY)]
+        return VALIDATION_STRUCT.pack(*[len(x) for x in validation_values]) + ''.join(validation_values)
+
+    def write(self, extension):
+        # nodes are written breadth first so the children of each node are next to each other
+        pending_cmps = [extension]
+        next_child_index = 1
+        for component in pending_cmps:
+            sub_cmps = list(component.get_components()) if component.is_container else []
+            self._nodes.append(NODE_STRUCT.pack(self._get_string_id(component.type_id),
+                                                self._write_attrs(component),
+                                                next_child_index,
+                                                len(sub_cmps)))
+            pending_cmps.extend(sub_cmps)
+            next_child_index += len(sub_cmps)
+
+        header = HEADER_STRUCT.pack(CACHE_MAGIC, CACHE_FORMAT_VERSION,
+                                    len(self._strings), sum(len(x) for x in self._strings),
+                                    len(self._nodes), self._data_size)
+        string_lengths = struct.pack('<{}I'.format(len(self._strings)), *[len(x) for x in self._strings])
+        return ''.join([header, self._make_validation_header(extension), string_lengths]
+                       + self._strings + self._nodes + self._data)
+
+
+def _read_header(cache_data):
+    magic, version, string_count, strings_size, node_count, data_size = HEADER_STRUCT.unpack_from(cache_data, 0)
+    if magic != CACHE_MAGIC or version != CACHE_FORMAT_VERSION:
+        raise PyRevitException('Unknown cache format.')
+    return string_count, node_count, VALIDATION_STRUCT.unpack_from(cache_data, HEADER_STRUCT.size)
+
+
+class _CacheReader(object):
+    def __init__(self, cache_data):
+        string_count, self._node_count, validation_sizes = _read_header(cache_data)
+
+        self._cache_data = cache_data
+        offset = HEADER_STRUCT.size + VALIDATION_STRUCT.size + sum(validation_sizes)
+        string_lengths = struct.unpack_from('<{}I'.format(string_count), cache_data, offset)
+        offset += UINT32_STRUCT.size * string_count
+        self._strings = []
+        for string_length in string_lengths:
+            self._strings.append(cache_data[offset:offset + string_length].decode('utf-8'))
+            offset += string_length
+
+        self._nodes_offset = offset
+        self._data_offset = offset + NODE_STRUCT.size * self._node_count
+
+    def _read_value(self, offset):
+        cache_data = self._cache_data
+        tag = cache_data[offset]
+        offset += 1
+        if tag == NONE_TAG:
+            return None, offset
+        elif tag == TRUE_TAG:
+            return True, offset
+        elif tag == FALSE_TAG:
+            return False, offset
+        elif tag == INT_TAG:
+            return INT64_STRUCT.unpack_from(cache_data, offset)[0], offset + INT64_STRUCT.size
+        elif tag == FLOAT_TAG:
+            return FLOAT_STRUCT.unpack_from(cache_data, offset)[0], offset + FLOAT_STRUCT.size
+        elif tag == STR_TAG:
+            return self._strings[UINT32_STRUCT.unpack_from(cache_data, offset)[0]], offset + UINT32_STRUCT.size
+        elif tag in (LIST_TAG, TUPLE_TAG):
+            item_count = UINT32_STRUCT.unpack_from(cache_data, offset)[0]
+            offset += UINT32_STRUCT.size
+            items = []
+            for _ in range(item_count):
+                item, offset = self._read_value(offset)
+                items.append(item)
+            return (tuple(items) if tag == TUPLE_TAG else items), offset
+        elif tag == DICT_TAG:
+            item_count = UINT32_STRUCT.unpack_from(cache_data, offset)[0]
+            offset += UINT32_STRUCT.size
+            items = {}
+            for _ in range(item_count):
+                k, offset = self._read_value(offset)
+                items[k], offset = self._read_value(offset)
+            return items, offset
+        raise PyRevitException('Unknown value tag in cache: {}'.format(tag))
 
+    def _read_attrs(self, attrs_offset):
+        offset = self._data_offset + attrs_offset
+        attr_count = UINT16_STRUCT.unpack_from(self._cache_data, offset)[0]
+        offset += UINT16_STRUCT.size
+        cache_dict = {}
+        for _ in range(attr_count):
+            attr_name = self._strings[UINT32_STRUCT.unpack_from(self._cache_data, offset)[0]]
+            cache_dict[attr_name], offset = self._read_value(offset + UINT32_STRUCT.size)
+        return cache_dict
 
-def _get_cache_file(cached_ext):
-    return appdata.get_data_file(file_id='cache_{}'.format(cached_ext.name), file_ext='pickle')
+    def read_node(self, node_index, cmp_class):
+        type_id_index, attrs_offset, first_child, child_count = \
+            NODE_STRUCT.unpack_from(self._cache_data, self._nodes_offset + NODE_STRUCT.size * node_index)
+        if self._strings[type_id_index] != cmp_class.type_id:
+            raise PyRevitException('Cached component type does not match: {}'.format(cmp_class))
+
+        component = cmp_class()
+        component.load_cache_data(self._read_attrs(attrs_offset))
+        if component.is_container:
+            component._sub_components = _LazyComponentList(self, component, first_child, child_count)
+        return component
+
+    def read_sub_cmps(self, parent_cmp, first_child, child_count):
+        sub_cmp_classes = _get_sub_cmp_classes(type(parent_cmp))
+        sub_cmps = []
+        for node_index in range(first_child, first_child + child_count):
+            type_id_index = NODE_STRUCT.unpack_from(self._cache_data, self._nodes_offset
+                                                    + NODE_STRUCT.size * node_index)[0]
+            sub_cmps.append(self.read_node(node_index, sub_cmp_classes[self._strings[type_id_index]]))
+        return sub_cmps
+
+
+def _decoding(method_name):
+    list_method = getattr(list, method_name)
+
+    def decoding_method(self, *args):
+        self._decode()
+        return list_method(self, *args)
+
+    return decoding_method
+
+
+class _LazyComponentList(list):
+    """List of sub-components of a cached container that are decoded from the cache when the list is first used."""
+    def __init__(self, reader, parent_cmp, first_child, child_count):
+        list.__init__(self)
+        self._reader = reader
+        self._parent_cmp = parent_cmp
+        self._children = (first_child, child_count)
+
+    def _decode(self):
+        if self._reader:
+            reader = self._reader
+            self._reader = None
+            for sub_cmp in reader.read_sub_cmps(self._parent_cmp, *self._children):
+                # links sub-component to parent and appends it to this list
+                self._parent_cmp.add_component(sub_cmp)
+            self._parent_cmp = None
+
+    __iter__ = _decoding('__iter__')
+    __len__ = _decoding('__len__')
+    __getitem__ = _decoding('__getitem__')
+    __getslice__ = _decoding('__getslice__')
+    __contains__ = _decoding('__contains__')
+    __reversed__ = _decoding('__reversed__')
+    __eq__ = _decoding('__eq__')
+    __ne__ = _decoding('__ne__')
+    __repr__ = _decoding('__repr__')
+    append = _decoding('append')
+    extend = _decoding('extend')
+    insert = _decoding('insert')
+    remove = _decoding('remove')
+    pop = _decoding('pop')
+    index = _decoding('index')
+    count = _decoding('count')
+    sort = _decoding('sort')
+    reverse = _decoding('reverse')
+
+
+def write_cache_file(parsed_ext, cache_file):
+    """Writes the binary cache of the parsed extension into the given file."""
+    cache_data = _CacheWriter().write(parsed_ext)
+    with open(cache_file, 'wb') as bin_cache_file:
+        bin_cache_file.write(cache_data)
+
+
+def read_cache_file(installed_ext, cache_file):
+    """Reads the extension from the given binary cache file.
+
+    Returns:
+        pyrevit.extensions.components.Extension: cached extension. sub-components are decoded when visited.
+    """
+    with open(cache_file, 'rb') as bin_cache_file:
+        cache_reader = _CacheReader(bin_cache_file.read())
+    # only the extension node is decoded here. sub-components are decoded when visited.
+    return cache_reader.read_node(0, type(installed_ext))
 
 
 def update_cache(parsed_ext):
     try:
         logger.debug('Writing cache for: {}'.format(parsed_ext))
-        cache_file = _get_cache_file(parsed_ext)
+        cache_file = get_cache_file(parsed_ext)
         logger.debug('Cache file is: {}'.format(cache_file))
-        with open(cache_file, 'wb') as bin_cache_file:
-            pickle.dump(parsed_ext, bin_cache_file, pickle.HIGHEST_PROTOCOL)
+        # other host instances might be reading the cache file
+        write_file_atomic(cache_file, lambda temp_file: write_cache_file(parsed_ext, temp_file))
     except Exception as err:
         raise PyRevitException('Error writing cache for: {} | {}'.format(parsed_ext, err))
 
+    # pickle cache of the extension is replaced by the binary cache
+    legacy_cache_file = appdata.get_data_file(file_id='cache_{}'.format(parsed_ext.name),
+                                              file_ext=LEGACY_CACHE_FILE_EXT)
+    if op.exists(legacy_cache_file):
+        logger.debug('Removing legacy cache file: {}'.format(legacy_cache_file))
+        appdata.garbage_data_file(legacy_cache_file)
 
-def get_cached_extension(installed_ext):
-    for loaded_ext in loaded_extensions:
-        if loaded_ext.name == installed_ext.name:
-            return loaded_ext
 
+def _read_validation_header(extension):
+    # reads the header and validation values only and not the rest of the cache file
     try:
-        logger.debug('Reading cache for: {}'.format(installed_ext))
-        cache_file = _get_cache_file(installed_ext)
-        logger.debug('Cache file is: {}'.format(cache_file))
-        with open(cache_file, 'rb') as bin_cache_file:
-            unpickled_pkg = pickle.load(bin_cache_file)
+        with open(get_cache_file(extension), 'rb') as bin_cache_file:
+            header_data = bin_cache_file.read(HEADER_STRUCT.size + VALIDATION_STRUCT.size)
+            validation_sizes = _read_header(header_data)[2]
+            validation_data = bin_cache_file.read(sum(validation_sizes))
     except Exception as err:
-        raise PyRevitException('Error reading cache for: {} | {}'.format(installed_ext, err))
+        raise PyRevitException('Error reading cache header for: {} | {}'.format(extension, err))
 
-    return unpickled_pkg
+    validation_values = {}
+    offset = 0
+    for key, size in zip((EXT_DIR_KEY, EXT_HASH_VERSION_KEY, EXT_HASH_VALUE_KEY), validation_sizes):
+        validation_values[key] = validation_data[offset:offset + size].decode('utf-8')
+        offset += size
+    return validation_values
 
 
-def is_cache_valid(extension):
+def get_cached_extension(installed_ext):
     try:
-        cached_ext = get_cached_extension(extension)
-        logger.debug('Extension cache directory is: {} for: {}'.format(extension.directory, extension))
-        cache_dir_valid = cached_ext.directory == extension.directory
+        logger.debug('Reading cache for: {}'.format(installed_ext))
+        cache_file = get_cache_file(installed_ext)
+        logger.debug('Cache file is: {}'.format(cache_file))
+        cached_ext = read_cache_file(installed_ext, cache_file)
+    except Exception as err:
+        raise PyRevitException('Error reading cache for: {} | {}'.format(installed_ext, err))
 
-        logger.debug('Extension cache version is: {} for: {}'.format(extension.pyrvt_version, extension))
-        cache_version_valid = cached_ext.pyrvt_version == extension.pyrvt_version
+    return cached_ext
 
-        logger.debug('Extension hash value is: {} for: {}'.format(extension.dir_hash_value, extension))
-        cache_hash_valid = cached_ext.dir_hash_value == extension.dir_hash_value
 
-        cache_valid = cache_dir_valid and cache_version_valid and cache_hash_valid
-        # add loaded package to list so it can be recovered later
-        if cache_valid:
-            loaded_extensions.append(cached_ext)
+def get_cache_state(extension):
+    """Validates the cache of the extension.
 
-        # cache is valid if both version and hash value match
-        return cache_valid
+    Returns:
+        str: cachestats.CACHE_HIT if cache is valid, otherwise the reason it's not valid
+    """
+    if not op.exists(get_cache_file(extension)):
+        logger.debug('Cache file is not available for: {}'.format(extension))
+        return CACHE_MISS
 
+    try:
+        cached_ext_dict = _read_validation_header(extension)
     except PyRevitException as err:
-        logger.debug('Error reading cache file or file is not available: {}'.format(err))
-        return False
+        logger.debug('Error reading cache file: {}'.format(err))
+        return CACHE_INVALID_FORMAT
 
-    except Exception as err:
-        logger.debug('Error determining cache validity: {} | {}'.format(extension, err))
-        return False
+    return compare_cache_header(extension,
+                                cached_ext_dict[EXT_DIR_KEY],
+                                cached_ext_dict[EXT_HASH_VERSION_KEY],
+                                cached_ext_dict[EXT_HASH_VALUE_KEY])
+
+
+def is_cache_valid(extension):
+    return get_cache_state(extension) == CACHE_HIT
@@ -0,0 +1,233 @@
+"""
+Indexed cache store for all extensions.
+Parsed extensions are cached in a single sqlite database per Revit version (see appdata.get_data_file) instead of a
+cache file per extension. The store has three tables:
+
+    extensions      one row per extension: validation values (directory, pyRevit version, directory hash) and the
+                    cached attributes of the extension itself
+    bundles         one row per component (tabs, panels, buttons, ...) with its parent directory, its position under
+                    the parent, and its cached attributes
+    fingerprints    directory fingerprint of each extension. see pyrevit.extensions.fingerprint
+
+Validation only reads the extension row. Updates run in a single transaction and only write the bundle rows that
+have changed so re-parsing a few bundles only rewrites their rows.
+
+Example:
+    >>> from pyrevit.extensions import cacher_db
+    >>> cacher_db.open_cache_db(':memory:')    # use an in-memory store (e.g. for testing)
+    >>> cacher_db.update_cache(parsed_ext)
+"""
+
+import json
+import threading
+
+import sqlite3
+
+from pyrevit import PyRevitException
+import pyrevit.coreutils.appdata as appdata
+from pyrevit.coreutils import get_all_subclasses, get_str_hash
+from pyrevit.coreutils.logger import get_logger
+from pyrevit.extensions.fingerprint import make_fingerprint_from_cache
+from pyrevit.extensions.cachestats import compare_cache_header, CACHE_HIT, CACHE_MISS, CACHE_INVALID_FORMAT
+
+
+logger = get_logger(__name__)
+
+
+CACHE_DB_FILE_ID = 'cache'
+CACHE_DB_FILE_EXT = 'sqlite'
+
+CACHE_DB_SCHEMA = ['CREATE TABLE IF NOT EXISTS extensions ('
+                   'name TEXT PRIMARY KEY, directory TEXT, pyrvt_version TEXT, dir_hash_value TEXT, cache_data TEXT)',
+                   'CREATE TABLE IF NOT EXISTS bundles ('
+                   'ext_name TEXT, directory TEXT, parent_directory TEXT, position INTEGER, type_id TEXT, '
+                   'cache_data TEXT, data_hash TEXT, PRIMARY KEY (ext_name, directory))',
+                   'CREATE TABLE IF NOT EXISTS fingerprints ('
+                   'ext_name TEXT PRIMARY KEY, fingerprint TEXT)']
+
+SUB_CMP_KEY = '_sub_components'
+
+
+# connection is shared between the threads parsing the extensions. all access is serialized by the lock.
+_cache_db = None
+_cache_db_path = None
+_cache_db_lock = threading.RLock()
+
+# {component class: {type_id: sub component class}}
+_sub_cmp_classes = {}
+
+
+def open_cache_db(db_path=None):
+    """Opens the cache store at the given path and uses it for all cache operations.
+
+    Args:
+        db_path (str): full path of the database file, or ':memory:' for an in-memory store.
+                       Defaults to the cache store of the current Revit version in appdata folder.
+    """
+    global _cache_db, _cache_db_path
+    with _cache_db_lock:
+        if _cache_db:
+            _cache_db.close()
+        db_path = db_path or appdata.get_data_file(file_id=CACHE_DB_FILE_ID, file_ext=CACHE_DB_FILE_EXT)
+        _cache_db_path = db_path
+        logger.debug('Opening cache store: {}'.format(db_path))
+        _cache_db = sqlite3.connect(db_path, check_same_thread=False)
+        with _cache_db:
+            for table_schema in CACHE_DB_SCHEMA:
+                _cache_db.execute(table_schema)
+
+
+def get_cache_file(extension):
+    """Returns full path of the cache store. All extensions are cached in the same store."""
+    with _cache_db_lock:
+        _get_cache_db()
+        return _cache_db_path
+
+
+def _get_cache_db():
+    if not _cache_db:
+        open_cache_db()
+    return _cache_db
+
+
+def _get_sub_cmp_classes(cmp_class):
+    if cmp_class not in _sub_cmp_classes:
+        _sub_cmp_classes[cmp_class] = dict((x.type_id, x) for x in get_all_subclasses(cmp_class.allowed_sub_cmps))
+    return _sub_cmp_classes[cmp_class]
+
+
+def _make_cache_data(component):
+    cache_dict = component.get_cache_data()
+    cache_dict.pop(SUB_CMP_KEY, None)
+    return json.dumps(cache_dict, sort_keys=True)
+
+
+def _make_bundle_rows(parent_cmp, bundle_rows):
+    for position, component in enumerate(parent_cmp.get_components()):
+        cache_data = _make_cache_data(component)
+        bundle_rows[component.directory] = (parent_cmp.directory, position, component.type_id,
+                                            cache_data, get_str_hash(cache_data))
+        if component.is_container:
+            _make_bundle_rows(component, bundle_rows)
+    return bundle_rows
+
+
+def update_cache(parsed_ext):
+    try:
+        logger.debug('Writing cache for: {}'.format(parsed_ext))
+        bundle_rows = _make_bundle_rows(parsed_ext, {})
+        with _cache_db_lock:
+            cache_db = _get_cache_db()
+            cached_rows = {}
+            for directory, parent_dir, position, data_hash in \
+                    cache_db.execute('SELECT directory, parent_directory, position, data_hash FROM bundles '
+                                     'WHERE ext_name=?', (parsed_ext.name,)):
+                cached_rows[directory] = (parent_dir, position, data_hash)
+
+            with cache_db:
+                removed_dirs = [(parsed_ext.name, x) for x in cached_rows if x not in bundle_rows]
+                cache_db.executemany('DELETE FROM bundles WHERE ext_name=? AND directory=?', removed_dirs)
+
+                changed_rows = []
+                for directory, (parent_dir, position, type_id, cache_data, data_hash) in bundle_rows.items():
+                    if cached_rows.get(directory) != (parent_dir, position, data_hash):
+                        changed_rows.append((parsed_ext.name, directory, parent_dir, position, type_id,
+                                             cache_data, data_hash))
+                cache_db.executemany('INSERT OR REPLACE INTO bundles VALUES (?, ?, ?, ?, ?, ?, ?)', changed_rows)
+
+                cache_db.execute('INSERT OR REPLACE INTO extensions VALUES (?, ?, ?, ?, ?)',
+                                 (parsed_ext.name, parsed_ext.directory, parsed_ext.pyrvt_version,
+                                  parsed_ext.dir_hash_value, _make_cache_data(parsed_ext)))
+
+            logger.debug('Cache updated for: {} ({} changed, {} removed bundles)'
+                         .format(parsed_ext, len(changed_rows), len(removed_dirs)))
+    except Exception as err:
+        raise PyRevitException('Error writing cache for: {} | {}'.format(parsed_ext, err))
+
+
+def _make_sub_cmps_from_cache(parent_cmp, bundle_rows_by_parent):
+    sub_cmp_classes = _get_sub_cmp_classes(type(parent_cmp))
+    for type_id, cache_data in bundle_rows_by_parent.get(parent_cmp.directory, []):
+        loaded_cmp = sub_cmp_classes[type_id]()
+        loaded_cmp.load_cache_data(json.loads(cache_data))
+        if loaded_cmp.is_container:
+            _make_sub_cmps_from_cache(loaded_cmp, bundle_rows_by_parent)
+        parent_cmp.add_component(loaded_cmp)
+
+
+def get_cached_extension(installed_ext):
+    try:
+        logger.debug('Reading cache for: {}'.format(installed_ext))
+        with _cache_db_lock:
+            cache_db = _get_cache_db()
+            ext_row = cache_db.execute('SELECT cache_data FROM extensions WHERE name=?',
+                                       (installed_ext.name,)).fetchone()
+            if not ext_row:
+                raise PyRevitException('Extension is not cached.')
+
+            bundle_rows_by_parent = {}
+            for parent_dir, type_id, cache_data in \
+                    cache_db.execute('SELECT parent_directory, type_id, cache_data FROM bundles '
+                                     'WHERE ext_name=? ORDER BY position', (installed_ext.name,)):
+                bundle_rows_by_parent.setdefault(parent_dir, []).append((type_id, cache_data))
+
+        cached_ext = type(installed_ext)()
+        cached_ext.load_cache_data(json.loads(ext_row[0]))
+        _make_sub_cmps_from_cache(cached_ext, bundle_rows_by_parent)
+    except Exception as err:
+        raise PyRevitException('Error reading cache for: {} | {}'.format(installed_ext, err))
+
+    return cached_ext
+
+
+def get_cache_state(extension):
+    """Validates the cache of the extension.
+
+    Returns:
+        str: cachestats.CACHE_HIT if cache is valid, otherwise the reason it's not valid
+    """
+    try:
+        with _cache_db_lock:
+            ext_row = _get_cache_db().execute('SELECT directory, pyrvt_version, dir_hash_value FROM extensions '
+                                              'WHERE name=?', (extension.name,)).fetchone()
+    except Exception as err:
+        logger.debug('Error reading cache store: {} | {}'.format(extension, err))
+        return CACHE_INVALID_FORMAT
+
+    if not ext_row:
+        logger.debug('Extension is not cached: {}'.format(extension))
+        return CACHE_MISS
+
+    return compare_cache_header(extension, *ext_row)
+
+
+def is_cache_valid(extension):
+    return get_cache_state(extension) == CACHE_HIT
+
+
+def save_fingerprint(extension, fingerprint):
+    """Saves the directory fingerprint of the extension in the cache store."""
+    try:
+        with _cache_db_lock:
+            cache_db = _get_cache_db()
+            with cache_db:
+                cache_db.execute('INSERT OR REPLACE INTO fingerprints VALUES (?, ?)',
+                                 (extension.name, json.dumps(fingerprint.get_cache_data())))
+    except Exception as err:
+        raise PyRevitException('Error writing fingerprint for: {} | {}'.format(extension, err))
+
+
+def read_fingerprint(extension):
+    """Reads the last saved directory fingerprint of the extension from the cache store.
+
+    Returns:
+        pyrevit.extensions.fingerprint.DirFingerprint: saved fingerprint or None if not available.
+    """
+    try:
+        with _cache_db_lock:
+            fp_row = _get_cache_db().execute('SELECT fingerprint FROM fingerprints WHERE ext_name=?',
+                                             (extension.name,)).fetchone()
+        return make_fingerprint_from_cache(json.loads(fp_row[0])) if fp_row else None
+    except Exception as err:
+        logger.debug('Error reading fingerprint for: {} | {}'.format(extension, err))
+        return None
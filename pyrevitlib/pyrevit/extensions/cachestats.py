@@ -0,0 +1,183 @@
+"""
+Statistics of extension cache and assembly decisions.
+Every decision made while loading the extensions (cache hit, cache miss and its reason, how the miss was resolved,
+assembly reuse or emission) is recorded as an event of the current session (see record_event). At the end of
+session load, the counters and events of the session are added to a rolling history in appdata and the last-hit
+time of each cache entry is updated (see save_session_stats). The history can be inspected later to find out
+why a session load was slow.
+
+Example:
+    >>> from pyrevit.extensions import cachestats
+    >>> cachestats.record_event(cachestats.CACHE_INVALID_HASH, 'pyRevitTools', entry_file=cache_file)
+    >>> cachestats.get_session_stats().counters
+    {'invalid_hash': 1}
+"""
+
+import os.path as op
+import json
+import time
+import threading
+
+from pyrevit import PyRevitException
+import pyrevit.coreutils.appdata as appdata
+from pyrevit.coreutils.filelock import FileLock, get_lock_file, write_file_atomic
+from pyrevit.coreutils.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+CACHE_STATS_FILE_ID = 'cachestats'
+CACHE_STATS_FILE_EXT = 'json'
+
+# number of sessions kept in history
+HISTORY_LENGTH = 50
+
+SESSIONS_KEY = 'sessions'
+ENTRIES_KEY = 'entries'
+
+# cache states. see compare_cache_header()
+CACHE_HIT = 'hit'
+CACHE_MISS = 'miss'
+CACHE_INVALID_FORMAT = 'invalid_format'
+CACHE_INVALID_DIR = 'invalid_dir'
+CACHE_INVALID_VERSION = 'invalid_version'
+CACHE_INVALID_HASH = 'invalid_hash'
+CACHE_LOAD_ERROR = 'load_error'
+
+# how a cache miss was resolved
+CACHE_BUILT_BY_OTHER = 'built_by_other'
+SHARED_CACHE_HIT = 'shared_hit'
+EXT_REPARSED = 'reparsed'
+EXT_PARSED = 'parsed'
+
+# assembly decisions
+ASM_LOADED = 'asm_loaded'
+ASM_REUSED = 'asm_reused'
+ASM_EMITTED = 'asm_emitted'
+
+# events that count as a hit for their cache entry
+HIT_EVENTS = [CACHE_HIT, CACHE_BUILT_BY_OTHER, SHARED_CACHE_HIT, ASM_LOADED, ASM_REUSED]
+
+
+class SessionStats(object):
+    """Counters and events of cache decisions in one session.
+
+    Attributes:
+        started (float): session start time
+        counters (dict): {event: count}
+        events (list): list of (time, event, extension name, entry file, duration) for all events
+    """
+    def __init__(self):
+        self.started = time.time()
+        self.counters = {}
+        self.events = []
+        self._lock = threading.Lock()
+
+    def record(self, event, ext_name, entry_file=None, duration=None):
+        # extensions are parsed on multiple threads
+        with self._lock:
+            self.counters[event] = self.counters.get(event, 0) + 1
+            self.events.append((time.time(), event, ext_name, entry_file, duration))
+
+    def get_cache_data(self):
+        with self._lock:
+            return {'started': self.started, 'counters': dict(self.counters), 'events': list(self.events)}
+
+
+_session_stats = SessionStats()
+
+
+def get_session_stats():
+    """Returns statistics of the current session."""
+    return _session_stats
+
+
+def record_event(event, ext_name, entry_file=None, duration=None):
+    """Records a cache decision in current session.
+
+    Args:
+        event (str): one of the cache states, miss resolutions, or assembly decisions listed in this module
+        ext_name (str): name of the extension
+        entry_file (str): full path of the cache entry (e.g. cache file or assembly file)
+        duration (float): seconds spent on this decision
+    """
+    logger.debug('Cache event: {} for: {} {}'.format(event, ext_name, entry_file or ''))
+    _session_stats.record(event, ext_name, entry_file=entry_file, duration=duration)
+
+
+def compare_cache_header(extension, cached_dir, cached_version, cached_hash):
+    """Compares the validation values of a cache with the extension.
+
+    Returns:
+        str: CACHE_HIT if cache is valid, otherwise the reason it's not valid
+    """
+    logger.debug('Extension cache directory is: {} for: {}'.format(extension.directory, extension))
+    if cached_dir != extension.directory:
+        return CACHE_INVALID_DIR
+
+    logger.debug('Extension cache version is: {} for: {}'.format(extension.pyrvt_version, extension))
+    if cached_version != extension.pyrvt_version:
+        return CACHE_INVALID_VERSION
+
+    logger.debug('Extension hash value is: {} for: {}'.format(extension.dir_hash_value, extension))
+    if cached_hash != extension.dir_hash_value:
+        return CACHE_INVALID_HASH
+
+    return CACHE_HIT
+
+
+def _get_stats_file():
+    return appdata.get_data_file(file_id=CACHE_STATS_FILE_ID, file_ext=CACHE_STATS_FILE_EXT)
+
+
+def read_history():
+    """Reads the history of cache statistics.
+
+    Returns:
+        dict: {'sessions': [session stats of last sessions],
+               'entries': {entry id: {'file': entry file, 'extension': name, 'last_event': event,
+                                      'last_event_time': time, 'last_hit': time or None}}}
+    """
+    try:
+        with open(_get_stats_file(), 'r') as stats_file:
+            return json.load(stats_file)
+    except Exception as read_err:
+        logger.debug('Cache statistics history is not available: {}'.format(read_err))
+        return {SESSIONS_KEY: [], ENTRIES_KEY: {}}
+
+
+def _add_session_stats(history, session_data):
+    history[SESSIONS_KEY] = (history[SESSIONS_KEY] + [session_data])[-HISTORY_LENGTH:]
+
+    # entries that are removed since (e.g. by appdata garbage collector) are dropped
+    entries = dict((k, v) for k, v in history[ENTRIES_KEY].items() if op.exists(v['file']))
+    history[ENTRIES_KEY] = entries
+    for event_time, event, ext_name, entry_file, _ in session_data['events']:
+        if entry_file:
+            # extensions might share the same entry file (e.g. cache store)
+            entry = entries.setdefault('{}|{}'.format(ext_name, entry_file),
+                                       {'file': entry_file, 'extension': ext_name, 'last_hit': None})
+            entry['last_event'] = event
+            entry['last_event_time'] = event_time
+            if event in HIT_EVENTS:
+                entry['last_hit'] = event_time
+
+
+def _write_history(history, history_file):
+    with open(history_file, 'w') as stats_file:
+        json.dump(history, stats_file)
+
+
+def save_session_stats():
+    """Adds the statistics of current session to the history in appdata."""
+    session_data = _session_stats.get_cache_data()
+    stats_file = _get_stats_file()
+    try:
+        # other host instances might be saving their statistics at the same time
+        with FileLock(get_lock_file(stats_file)):
+            history = read_history()
+            _add_session_stats(history, session_data)
+            write_file_atomic(stats_file, lambda temp_file: _write_history(history, temp_file))
+    except Exception as save_err:
+        raise PyRevitException('Error saving cache statistics: {}'.format(save_err))
@@ -0,0 +1,121 @@
+"""
+Registry of the components of the loaded ui extensions.
+Registry is built once while the session is loading (see pyrevit.loader.sessionmgr) and indexes every component by
+its directory, unique name, and type. It is shared between script engines through the pyRevit environment variables
+so scripts can find their components without parsing the bundle directories again.
+
+Example:
+    >>> from pyrevit.extensions import cmpregistry
+    >>> registry = cmpregistry.get_registry()
+    >>> registry.find_by_directory(__commandpath__)
+    <type_id '.pushbutton' name 'Reload' @ '...'>
+"""
+
+import os.path as op
+
+from pyrevit import PYREVIT_ADDON_NAME
+from pyrevit.coreutils.envvars import get_pyrevit_env_var, set_pyrevit_env_var
+from pyrevit.coreutils.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+# component registry of the current session is shared between script engines
+CMP_REGISTRY_ISC_NAME = PYREVIT_ADDON_NAME + '_cmpregistryISC'
+
+
+def _make_dir_key(dir_path):
+    return op.normcase(op.normpath(dir_path))
+
+
+class ComponentRegistry(object):
+    """Index of the components of the loaded ui extensions by directory, unique name, and type."""
+    def __init__(self):
+        self._by_directory = {}
+        self._by_unique_name = {}
+        self._by_type = {}
+        # list of registered components of each extension so extensions can be registered again after a reload
+        self._ext_components = {}
+
+    def _add_component(self, component):
+        if component.directory:
+            self._by_directory[_make_dir_key(component.directory)] = component
+        if component.unique_name:
+            self._by_unique_name[component.unique_name] = component
+        self._by_type.setdefault(type(component), []).append(component)
+
+    def _remove_component(self, component):
+        if component.directory and self._by_directory.get(_make_dir_key(component.directory)) is component:
+            self._by_directory.pop(_make_dir_key(component.directory))
+        if component.unique_name and self._by_unique_name.get(component.unique_name) is component:
+            self._by_unique_name.pop(component.unique_name)
+        type_cmps = self._by_type.get(type(component), [])
+        if component in type_cmps:
+            type_cmps.remove(component)
+
+    def register_extension(self, extension):
+        """Adds the extension and all its components to the registry.
+        Components of an earlier registration of the same extension are replaced.
+
+        Args:
+            extension (pyrevit.extensions.components.Extension): parsed extension
+        """
+        ext_key = _make_dir_key(extension.directory)
+        for old_cmp in self._ext_components.pop(ext_key, []):
+            self._remove_component(old_cmp)
+
+        ext_cmps = [extension]
+        # walking the tree breadth-first. components that are not listed in layouts are registered too
+        for component in ext_cmps:
+            if component.is_container:
+                ext_cmps.extend(component._sub_components)
+
+        for component in ext_cmps:
+            self._add_component(component)
+
+        self._ext_components[ext_key] = ext_cmps
+        logger.debug('Registered {} components of: {}'.format(len(ext_cmps), extension.name))
+
+    def find_by_directory(self, dir_path):
+        """Returns the component of the given bundle directory or None if not registered."""
+        return self._by_directory.get(_make_dir_key(dir_path))
+
+    def find_by_unique_name(self, unique_name):
+        """Returns the component with the given unique name or None if not registered."""
+        return self._by_unique_name.get(unique_name)
+
+    def get_components_of_type(self, cmp_type):
+        """Returns all registered components that are instances of the given component class (or its subclasses).
+
+        Args:
+            cmp_type (type): component class e.g. pyrevit.extensions.genericcomps.GenericUICommand
+        """
+        type_cmps = []
+        for registered_type, registered_cmps in self._by_type.items():
+            # components might be registered by another script engine with its own component classes so the classes
+            # are matched by name and not by issubclass()
+            if cmp_type.__name__ in [x.__name__ for x in registered_type.__mro__]:
+                type_cmps.extend(registered_cmps)
+        return type_cmps
+
+
+def get_registry():
+    """Returns the component registry of the current session or None if the session has not registered any."""
+    return get_pyrevit_env_var(CMP_REGISTRY_ISC_NAME)
+
+
+def set_registry(registry):
+    """Sets the given registry as the component registry of the current session."""
+    set_pyrevit_env_var(CMP_REGISTRY_ISC_NAME, registry)
+
+
+def find_by_directory(dir_path):
+    """Returns the component of the given bundle directory from the registry of the current session.
+
+    Returns:
+        pyrevit.extensions.genericcomps.GenericUIComponent: component or None if not registered
+    """
+    registry = get_registry()
+    if registry:
+        return registry.find_by_directory(dir_path)
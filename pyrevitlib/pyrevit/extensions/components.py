@@ -1,18 +1,17 @@
 import os.path as op
 
 from pyrevit import PyRevitException
-from pyrevit.coreutils import ScriptFileParser, calculate_dir_hash, get_str_hash
+from pyrevit.coreutils import ScriptMetadataParser, get_str_hash
 from pyrevit.coreutils.logger import get_logger
 from pyrevit.extensions import LINK_BUTTON_POSTFIX, LINK_BUTTON_ASSEMBLY_PARAM, LINK_BUTTON_COMMAND_CLASS_PARAM
 from pyrevit.extensions import PANEL_POSTFIX, TAB_POSTFIX
 from pyrevit.extensions import PULLDOWN_BUTTON_POSTFIX, SPLIT_BUTTON_POSTFIX, SPLITPUSH_BUTTON_POSTFIX
 from pyrevit.extensions import PUSH_BUTTON_POSTFIX, SMART_BUTTON_POSTFIX
-from pyrevit.extensions import PYTHON_SCRIPT_FILE_FORMAT, DEFAULT_LAYOUT_FILE_NAME
 from pyrevit.extensions import STACKTWO_BUTTON_POSTFIX, STACKTHREE_BUTTON_POSTFIX
 from pyrevit.extensions import TOGGLE_BUTTON_POSTFIX, DEFAULT_ON_ICON_FILE, DEFAULT_OFF_ICON_FILE
 from pyrevit.extensions import ExtensionTypes
-from pyrevit.extensions import CSHARP_SCRIPT_FILE_FORMAT
 from pyrevit.extensions.genericcomps import GenericComponent, GenericUIContainer, GenericUICommand
+from pyrevit.extensions.fingerprint import make_fingerprint
 from pyrevit.versionmgr import PYREVIT_VERSION
 
 logger = get_logger(__name__)
@@ -33,7 +32,8 @@ class LinkButton(GenericUICommand):
         self.assembly = self.command_class = None
         try:
             # reading script file content to extract parameters
-            script_content = ScriptFileParser(self.get_full_script_address())
+            script_content = ScriptMetadataParser(self.get_full_script_address(),
+                                                  [LINK_BUTTON_ASSEMBLY_PARAM, LINK_BUTTON_COMMAND_CLASS_PARAM])
             self.assembly = script_content.extract_param(LINK_BUTTON_ASSEMBLY_PARAM)  # type: str
             self.command_class = script_content.extract_param(LINK_BUTTON_COMMAND_CLASS_PARAM)  # type: str
         except PyRevitException as err:
@@ -167,33 +167,23 @@ class Extension(GenericUIContainer):
     def __init_from_dir__(self, package_dir):
         GenericUIContainer.__init_from_dir__(self, package_dir)
         self.pyrvt_version = PYREVIT_VERSION.get_formatted()
-        self.dir_hash_value = self._calculate_extension_dir_hash()
+        # directory hash is calculated by update_dir_hash() when extension is being validated against its cache.
+        # this keeps creating extension objects cheap and lets the expensive directory walk run in parallel.
+        self.dir_hash_value = None
 
     @property
     def ext_hash_value(self):
         return get_str_hash(str(self.get_cache_data()))
 
-    def _calculate_extension_dir_hash(self):
-        """Creates a unique hash # to represent state of directory."""
-        # search does not include png files:
-        #   if png files are added the parent folder mtime gets affected
-        #   cache only saves the png address and not the contents so they'll get loaded everytime
-        #       see http://stackoverflow.com/a/5141710/2350244
-        pat = '(\\' + TAB_POSTFIX + ')|(\\' + PANEL_POSTFIX + ')'
-        pat += '|(\\' + PULLDOWN_BUTTON_POSTFIX + ')'
-        pat += '|(\\' + SPLIT_BUTTON_POSTFIX + ')'
-        pat += '|(\\' + SPLITPUSH_BUTTON_POSTFIX + ')'
-        pat += '|(\\' + STACKTWO_BUTTON_POSTFIX + ')'
-        pat += '|(\\' + STACKTHREE_BUTTON_POSTFIX + ')'
-        pat += '|(\\' + PUSH_BUTTON_POSTFIX + ')'
-        pat += '|(\\' + SMART_BUTTON_POSTFIX + ')'
-        pat += '|(\\' + TOGGLE_BUTTON_POSTFIX + ')'
-        pat += '|(\\' + LINK_BUTTON_POSTFIX + ')'
-        # seach for scripts, setting files (future support), and layout files
-        patfile = '(\\' + PYTHON_SCRIPT_FILE_FORMAT + ')'
-        patfile += '|(\\' + CSHARP_SCRIPT_FILE_FORMAT + ')'
-        patfile += '|(' + DEFAULT_LAYOUT_FILE_NAME + ')'
-        return calculate_dir_hash(self.directory, pat, patfile)
+    def update_dir_hash(self):
+        """Updates the directory hash of this extension from a new fingerprint of the extension directory.
+
+        Returns:
+            pyrevit.extensions.fingerprint.DirFingerprint: fingerprint that the hash value was taken from
+        """
+        dir_fingerprint = make_fingerprint(self.directory)
+        self.dir_hash_value = dir_fingerprint.digest
+        return dir_fingerprint
 
     def get_all_commands(self):
         return self.get_components_of_type(GenericUICommand)
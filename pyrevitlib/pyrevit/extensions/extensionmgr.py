@@ -1,20 +1,52 @@
+import os.path as op
+import threading
+
 from pyrevit import PyRevitException
+from pyrevit.coreutils import Timer
+import pyrevit.coreutils.appdata as appdata
+from pyrevit.coreutils.filelock import FileLock, get_lock_file
 from pyrevit.coreutils.logger import get_logger
 from pyrevit.userconfig import user_config
 
 try:
-    if user_config.core.bincache:
-        from pyrevit.extensions.cacher_bin import is_cache_valid, get_cached_extension, update_cache
+    use_db_cache = user_config.core.dbcache
+except AttributeError:
+    user_config.core.dbcache = use_db_cache = False
+    user_config.save_changes()
+
+try:
+    if use_db_cache:
+        from pyrevit.extensions.cacher_db import get_cache_state, get_cache_file, get_cached_extension, update_cache
+    elif user_config.core.bincache:
+        from pyrevit.extensions.cacher_bin import get_cache_state, get_cache_file, get_cached_extension, update_cache
     else:
-        from pyrevit.extensions.cacher_asc import is_cache_valid, get_cached_extension, update_cache
+        from pyrevit.extensions.cacher_asc import get_cache_state, get_cache_file, get_cached_extension, update_cache
 except AttributeError:
     user_config.core.bincache = True
     user_config.save_changes()
-    from pyrevit.extensions.cacher_bin import is_cache_valid, get_cached_extension, update_cache
+    from pyrevit.extensions.cacher_bin import get_cache_state, get_cache_file, get_cached_extension, update_cache
 
-from pyrevit.extensions.parser import parse_dir_for_ext_type, get_parsed_extension, parse_comp_dir
+from pyrevit.extensions.parser import get_parsed_extension, parse_comp_dir, find_ext_dirs
+from pyrevit.extensions.parser import get_reparsed_extension
 from pyrevit.extensions.genericcomps import GenericUICommand
 from pyrevit.extensions.components import Extension, LibraryExtension
+from pyrevit.extensions.fingerprint import get_changed_dirs
+from pyrevit.extensions import cachestats, cmpregistry
+
+try:
+    use_shared_cache = user_config.core.sharedcache
+except AttributeError:
+    user_config.core.sharedcache = use_shared_cache = True
+    user_config.save_changes()
+
+if use_shared_cache:
+    from pyrevit.extensions.sharedcache import get_shared_extension, publish_extension
+
+# cache store keeps the fingerprints too. other cachers save fingerprints next to their cache files
+if use_db_cache:
+    from pyrevit.extensions.cacher_db import save_fingerprint, read_fingerprint
+else:
+    from pyrevit.extensions.fingerprint import save_fingerprint, read_fingerprint
 
 from pyrevit.plugins.extpackages import is_ext_package_enabled
 
@@ -22,6 +54,14 @@ from pyrevit.plugins.extpackages import is_ext_package_enabled
 logger = get_logger(__name__)
 
 
+# maximum number of extensions that are read, validated, and parsed at the same time
+PARSE_WORKER_COUNT = 4
+
+# extension directories under the extension roots. roots are listed once and all callers use this snapshot.
+# see _get_installed_ext_dirs()
+_installed_ext_dirs = None
+
+
 def _update_extension_syspaths(ui_ext, lib_ext_list):
     for lib_ext in lib_ext_list:
         ui_ext.add_syspath(lib_ext.directory)
@@ -43,6 +83,13 @@ def _remove_disabled_extensions(ext_list):
 
 
 def get_command_from_path(comp_path):
+    # commands of the loaded extensions are already parsed. see cmpregistry
+    # registry is shared between script engines and each engine has its own component classes. checking by
+    # attribute since isinstance() fails for components registered by another engine
+    registered_cmp = cmpregistry.find_by_directory(comp_path)
+    if registered_cmp and not registered_cmp.is_container:
+        return registered_cmp
+
     cmds = parse_comp_dir(comp_path, GenericUICommand)
     if len(cmds) > 0:
         return cmds[0]
@@ -50,77 +97,200 @@ def get_command_from_path(comp_path):
     return None
 
 
-def parse_or_cache(ext_info):
-    try:
-        # raise error if ui_extension does not have a valid cache
-        if not is_cache_valid(ext_info):
-            raise PyRevitException('Cache is not valid for: {}'.format(ext_info))
+def _reparse_changed_bundles(ext_info, ext_fingerprint):
+    """Re-parses only the changed bundles of the extension, reusing its last cached tree.
+    The fingerprint saved with the last cache is compared to the current one to find the changed bundles.
 
-        # if cache is valid, load the cached ui_extension
-        logger.debug('Cache is valid for: {}'.format(ext_info))
+    Returns:
+        pyrevit.extensions.components.Extension: parsed extension or None if last parse results are not usable.
+    """
+    last_fingerprint = read_fingerprint(ext_info)
+    if not last_fingerprint:
+        logger.debug('No fingerprint available from last parse of: {}'.format(ext_info))
+        return None
+
+    try:
+        # cacher modules might inject the cache data into the given extension object so giving it a fresh one
+        cached_ext = get_cached_extension(parse_comp_dir(ext_info.directory, type(ext_info))[0])
+    except Exception as cache_err:
+        logger.debug('Can not load last cache of: {} | {}'.format(ext_info, cache_err))
+        return None
+
+    # last cache must be for the same directory and version and must match the last fingerprint
+    if cached_ext.directory != ext_info.directory \
+            or cached_ext.pyrvt_version != ext_info.pyrvt_version \
+            or cached_ext.dir_hash_value != last_fingerprint.digest:
+        logger.debug('Last cache does not match last fingerprint of: {}'.format(ext_info))
+        return None
+
+    changed_dirs = get_changed_dirs(last_fingerprint, ext_fingerprint, ext_info.directory)
+    logger.info('Re-parsing changed bundles: {}'.format(changed_dirs))
+    return get_reparsed_extension(ext_info, cached_ext, changed_dirs)
+
+
+def _load_cached_extension(ext_info):
+    """Loads the extension from its cache.
+
+    Returns:
+        tuple: (cached extension or None if cache is not usable, cache state. see cachestats)
+    """
+    cache_state = get_cache_state(ext_info)
+    if cache_state != cachestats.CACHE_HIT:
+        logger.debug('Cache is not valid for: {} | {}'.format(ext_info, cache_state))
+        return None, cache_state
+
+    # if cache is valid, load the cached ui_extension
+    logger.debug('Cache is valid for: {}'.format(ext_info))
+    try:
         # cacher module takes the ui_extension object and injects cache data into it.
         ui_extension = get_cached_extension(ext_info)
         logger.info('UI Extension successfuly loaded from cache: {}'.format(ui_extension.name))
-
+        return ui_extension, cache_state
     except PyRevitException as cache_err:
         logger.debug(cache_err)
+        return None, cachestats.CACHE_LOAD_ERROR
+
 
-        # Either cache is not available, not valid, or cache load has failed.
-        # parse directory for components and return fully loaded ui_extension
-        logger.debug('Parsing for ui_extension...')
-        ui_extension = get_parsed_extension(ext_info)
+def parse_or_cache(ext_info):
+    # fingerprint the extension directory so the extension can be validated against its cache
+    ext_fingerprint = ext_info.update_dir_hash()
+    cache_file = get_cache_file(ext_info)
+    timer = Timer()
+
+    ui_extension, cache_state = _load_cached_extension(ext_info)
+    cachestats.record_event(cache_state, ext_info.name, entry_file=cache_file, duration=timer.get_time())
+    if ui_extension:
+        return ui_extension
+
+    # Either cache is not available, not valid, or cache load has failed.
+    # other host instances might be starting at the same time. first instance parses the extension and updates the
+    # cache, and the others wait for it and load the updated cache
+    with FileLock(get_lock_file(appdata.get_data_file(file_id='parse_{}'.format(ext_info.name), file_ext='cache'))):
+        timer.restart()
+        ui_extension, cache_state = _load_cached_extension(ext_info)
+        if ui_extension:
+            cachestats.record_event(cachestats.CACHE_BUILT_BY_OTHER, ext_info.name,
+                                    entry_file=cache_file, duration=timer.get_time())
+            return ui_extension
+
+        # another host version might have already parsed the same extension
+        ui_extension = get_shared_extension(ext_info) if use_shared_cache else None
+        miss_resolution = cachestats.SHARED_CACHE_HIT
+        if not ui_extension:
+            # if extension has changed since last parse, only re-parse the changed bundles
+            ui_extension = _reparse_changed_bundles(ext_info, ext_fingerprint)
+            miss_resolution = cachestats.EXT_REPARSED
+        if not ui_extension:
+            # parse directory for components and return fully loaded ui_extension
+            logger.debug('Parsing for ui_extension...')
+            ui_extension = get_parsed_extension(ext_info)
+            miss_resolution = cachestats.EXT_PARSED
 
         # update cache with newly parsed ui_extension
         logger.info('UI Extension successfuly parsed: {}'.format(ui_extension.name))
         logger.info('Updating cache for ui_extension: {}'.format(ui_extension.name))
         update_cache(ui_extension)
+        # save the directory fingerprint next to the cache so changed bundles can be found later
+        save_fingerprint(ui_extension, ext_fingerprint)
+        if use_shared_cache:
+            publish_extension(ui_extension)
+
+        cachestats.record_event(miss_resolution, ext_info.name, entry_file=cache_file, duration=timer.get_time())
 
     return ui_extension
 
 
-def get_installed_extension_data():
-    # fixme: reorganzie this code to use one single method to collect extension data for both lib and ui
-    ext_data_list = []
+def _parse_or_cache_all(ext_info_list):
+    """Runs parse_or_cache() for all given extensions using a bounded pool of worker threads.
+    Extension directory trees and cache files are independent of each other so reading, validating and parsing them
+    concurrently overlaps the disk io. Returned list has the same order as ext_info_list.
+    Extensions that fail to parse are reported and left out of the returned list so they do not stop the others
+    from loading.
+    """
+    ui_ext_list = [None] * len(ext_info_list)
+    pending_exts = list(enumerate(ext_info_list))
+    pending_lock = threading.Lock()
 
-    for root_dir in user_config.get_ext_root_dirs():
-        ext_data_list.extend([ui_ext for ui_ext in parse_dir_for_ext_type(root_dir, Extension)])
-        ext_data_list.extend([lib_ext for lib_ext in parse_dir_for_ext_type(root_dir, LibraryExtension)])
+    def _parse_worker():
+        while True:
+            with pending_lock:
+                if not pending_exts:
+                    return
+                ext_index, ext_info = pending_exts.pop(0)
+            try:
+                ui_ext_list[ext_index] = parse_or_cache(ext_info)
+            except Exception as parse_err:
+                logger.error('Error parsing extension: {} | {}'.format(ext_info.name, parse_err))
 
-    return _remove_disabled_extensions(ext_data_list)
+    workers = [threading.Thread(target=_parse_worker) for _ in range(min(PARSE_WORKER_COUNT, len(ext_info_list)))]
+    logger.debug('Parsing {} extensions using {} workers.'.format(len(ext_info_list), len(workers)))
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
 
+    # extensions that failed to parse do not have a parsed extension
+    return [x for x in ui_ext_list if x]
 
-def get_installed_lib_extensions(root_dir):
-    lib_ext_list = [lib_ext for lib_ext in parse_dir_for_ext_type(root_dir, LibraryExtension)]
-    return _remove_disabled_extensions(lib_ext_list)
 
+def _get_installed_ext_dirs(ext_type, refresh=False):
+    """Returns the directories of installed extensions of the given type.
+    Each root directory in user_config.get_ext_root_dirs() is listed only once and the extension directories are
+    sorted by their type. All callers within a session are served from this snapshot unless refresh is requested.
+    """
+    global _installed_ext_dirs
 
-def get_installed_ui_extensions():
-    ui_ext_list = list()
-    lib_ext_list = list()
+    if refresh or _installed_ext_dirs is None:
+        ext_dirs = {Extension: [], LibraryExtension: []}
+
+        # get a list of all directories that could include extensions
+        ext_search_dirs = user_config.get_ext_root_dirs()
+        logger.debug('Extension Directories: {}'.format(ext_search_dirs))
+
+        for root_dir in ext_search_dirs:
+            for root_ext_type, root_ext_dirs in find_ext_dirs(root_dir, [Extension, LibraryExtension]).items():
+                ext_dirs[root_ext_type].extend(root_ext_dirs)
+
+        _installed_ext_dirs = ext_dirs
+
+    return _installed_ext_dirs[ext_type]
+
+
+def _get_installed_exts(ext_type, refresh=False):
+    ext_list = []
+    for ext_dir in _get_installed_ext_dirs(ext_type, refresh=refresh):
+        ext_list.extend(parse_comp_dir(ext_dir, ext_type))
+    return ext_list
+
+
+def get_installed_extension_data():
+    ext_data_list = []
+    ext_data_list.extend(_get_installed_exts(Extension))
+    ext_data_list.extend(_get_installed_exts(LibraryExtension))
+    return _remove_disabled_extensions(ext_data_list)
 
-    # get a list of all directories that could include extensions
-    ext_search_dirs = user_config.get_ext_root_dirs()
-    logger.debug('Extension Directories: {}'.format(ext_search_dirs))
 
+def get_installed_ui_extensions():
+    ext_info_list = list()
+
+    # a new session starts here so the extension roots are listed again
     # collect all library extensions. Their dir paths need to be added to sys.path for all commands
-    for root_dir in ext_search_dirs:
-        lib_ext_list.extend(get_installed_lib_extensions(root_dir))
-        # Get a list of all installed extensions in this directory
-        # _parser.parse_dir_for_ext_type() returns a list of extensions in given directory
-
-    for root_dir in ext_search_dirs:
-        for ext_info in parse_dir_for_ext_type(root_dir, Extension):
-            # test if cache is valid for this ui_extension
-            # it might seem unusual to create a ui_extension and then re-load it from cache but minimum information
-            # about the ui_extension needs to be passed to the cache module for proper hash calculation and
-            # ui_extension recovery. at this point `ui_extension` does not include any sub-components
-            #  (e.g, tabs, panels, etc) ui_extension object is very small and its creation doesn't add much overhead.
-
-            if _is_extension_enabled(ext_info):
-                ui_extension = parse_or_cache(ext_info)
-                ui_ext_list.append(ui_extension)
-            else:
-                logger.info('Skipping disabled ui extension: {}'.format(ext_info.name))
+    lib_ext_list = _remove_disabled_extensions(_get_installed_exts(LibraryExtension, refresh=True))
+
+    for ext_info in _get_installed_exts(Extension):
+        # test if cache is valid for this ui_extension
+        # it might seem unusual to create a ui_extension and then re-load it from cache but minimum information
+        # about the ui_extension needs to be passed to the cache module for proper hash calculation and
+        # ui_extension recovery. at this point `ui_extension` does not include any sub-components
+        #  (e.g, tabs, panels, etc) ui_extension object is very small and its creation doesn't add much overhead.
+
+        if _is_extension_enabled(ext_info):
+            ext_info_list.append(ext_info)
+        else:
+            logger.info('Skipping disabled ui extension: {}'.format(ext_info.name))
+
+    # extensions are parsed concurrently but returned in the order they were found
+    ui_ext_list = _parse_or_cache_all(ext_info_list)
 
     # update extension master syspaths with lib address of other lib extensions
     # this is to support extensions that provide library only to be used by other extensions
@@ -128,3 +298,22 @@ def get_installed_ui_extensions():
         _update_extension_syspaths(ui_extension, lib_ext_list)
 
     return ui_ext_list
+
+
+def get_updated_ui_extension(ext_dir):
+    """Parses the ui extension at the given directory (re-parsing only its changed bundles) and updates its cache.
+    This is used to update a single extension during a session. see pyrevit.loader.hotreload
+
+    Args:
+        ext_dir (str): full path of the ui extension directory
+
+    Returns:
+        pyrevit.extensions.components.Extension: parsed extension or None if extension is removed or disabled
+    """
+    ext_info_list = parse_comp_dir(ext_dir, Extension) if op.isdir(ext_dir) else []
+    if not ext_info_list or not _is_extension_enabled(ext_info_list[0]):
+        return None
+
+    ui_extension = parse_or_cache(ext_info_list[0])
+    _update_extension_syspaths(ui_extension, _remove_disabled_extensions(_get_installed_exts(LibraryExtension)))
+    return ui_extension
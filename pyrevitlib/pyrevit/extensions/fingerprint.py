@@ -0,0 +1,203 @@
+"""
+Merkle-style fingerprints of extension directories.
+Each directory gets a digest made from the names of its entries, the size and modification time of the files that
+affect the parsed extension (scripts and layout files), and the digests of its component sub-directories. Any change
+inside a bundle changes the digest of the bundle and all its parent directories, so comparing two fingerprints can
+skip unchanged subtrees and report exactly which bundles have changed.
+
+Making a fingerprint still lists every component directory and stats every script and layout file. Modification
+time of a directory does not change when a file inside it is edited in place so it can not be used to skip the
+unchanged subtrees. Only the comparison of the fingerprints skips them (see get_changed_dirs).
+
+Portable fingerprints (e.g. for extension manifests) use the contents of the files instead of their modification time
+so they stay the same when the directory is copied, and still change when a file is edited without changing its size.
+"""
+
+import os
+import os.path as op
+import json
+import hashlib
+
+from pyrevit import PyRevitException
+import pyrevit.coreutils.appdata as appdata
+from pyrevit.coreutils import get_str_hash
+from pyrevit.coreutils.filelock import write_file_atomic
+from pyrevit.coreutils.logger import get_logger
+from pyrevit.extensions import TAB_POSTFIX, PANEL_POSTFIX, LINK_BUTTON_POSTFIX, PUSH_BUTTON_POSTFIX
+from pyrevit.extensions import TOGGLE_BUTTON_POSTFIX, SMART_BUTTON_POSTFIX, PULLDOWN_BUTTON_POSTFIX
+from pyrevit.extensions import STACKTHREE_BUTTON_POSTFIX, STACKTWO_BUTTON_POSTFIX
+from pyrevit.extensions import SPLIT_BUTTON_POSTFIX, SPLITPUSH_BUTTON_POSTFIX
+from pyrevit.extensions import PYTHON_SCRIPT_FILE_FORMAT, CSHARP_SCRIPT_FILE_FORMAT, VB_SCRIPT_FILE_FORMAT
+from pyrevit.extensions import DEFAULT_LAYOUT_FILE_NAME, EXT_MANIFEST_FILE
+
+
+logger = get_logger(__name__)
+
+
+# sub-directories with these postfixes are fingerprinted recursively
+COMPONENT_DIR_POSTFIXES = {TAB_POSTFIX, PANEL_POSTFIX,
+                           STACKTHREE_BUTTON_POSTFIX, STACKTWO_BUTTON_POSTFIX,
+                           PULLDOWN_BUTTON_POSTFIX, SPLIT_BUTTON_POSTFIX, SPLITPUSH_BUTTON_POSTFIX,
+                           PUSH_BUTTON_POSTFIX, TOGGLE_BUTTON_POSTFIX, SMART_BUTTON_POSTFIX, LINK_BUTTON_POSTFIX}
+
+# size and modification time (or contents, for portable fingerprints) of these files are included in the fingerprint.
+# only the names of other files (e.g. icons) are included since cache only stores their path and not the contents.
+FINGERPRINT_FILE_POSTFIXES = (PYTHON_SCRIPT_FILE_FORMAT, CSHARP_SCRIPT_FILE_FORMAT, VB_SCRIPT_FILE_FORMAT,
+                              DEFAULT_LAYOUT_FILE_NAME)
+
+
+class DirFingerprint(object):
+    """Fingerprint of a directory and its component sub-directories.
+
+    Attributes:
+        name (str): directory name
+        digest (str): hash of directory files and digests of all sub-directories
+        files_digest (str): hash of directory files only. Changes when the directory itself has changed.
+        children (dict): {sub-directory name: DirFingerprint}
+    """
+    def __init__(self, name, digest, files_digest, children=None):
+        self.name = name
+        self.digest = digest
+        self.files_digest = files_digest
+        self.children = children or {}
+
+    def __repr__(self):
+        return '<DirFingerprint name \'{}\' digest \'{}\'>'.format(self.name, self.digest)
+
+    def get_cache_data(self):
+        return {'name': self.name,
+                'digest': self.digest,
+                'files_digest': self.files_digest,
+                'children': [child.get_cache_data() for child in self.children.values()]}
+
+
+def make_fingerprint_from_cache(cache_dict):
+    children = {}
+    for child_dict in cache_dict['children']:
+        child = make_fingerprint_from_cache(child_dict)
+        children[child.name] = child
+    return DirFingerprint(cache_dict['name'], cache_dict['digest'], cache_dict['files_digest'], children)
+
+
+def _get_file_digest(file_path):
+    file_hash = hashlib.md5()
+    with open(file_path, 'rb') as digest_file:
+        for chunk in iter(lambda: digest_file.read(64 * 1024), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def make_fingerprint(dir_path, portable=False):
+    """Creates the fingerprint of the given directory by listing and stat-ing its contents.
+    All component sub-directories are listed and all their scripts and layout files are stat'ed on every call.
+
+    Args:
+        dir_path (str): full path of the directory
+        portable (bool): include the size and contents and not the modification time of the files so the
+                         fingerprint stays the same when the directory is copied to another location or machine.
+                         This reads all scripts and layout files so it's slower than the default fingerprint.
+
+    Returns:
+        DirFingerprint: fingerprint of the directory
+    """
+    file_items = []
+    children = {}
+    for entry in sorted(os.listdir(dir_path)):
+        # hidden files (e.g. editor swap files) do not affect the extension
+        # extension manifest is generated from the directory and carries its own fingerprint
+        if entry.startswith('.') or entry == EXT_MANIFEST_FILE:
+            continue
+
+        entry_path = op.join(dir_path, entry)
+        if op.splitext(entry)[1] in COMPONENT_DIR_POSTFIXES and op.isdir(entry_path):
+            children[entry] = make_fingerprint(entry_path, portable=portable)
+        elif entry.lower().endswith(FINGERPRINT_FILE_POSTFIXES):
+            entry_stat = os.stat(entry_path)
+            if portable:
+                file_items.append('{}|{}|{}'.format(entry, entry_stat.st_size, _get_file_digest(entry_path)))
+            else:
+                file_items.append('{}|{}|{!r}'.format(entry, entry_stat.st_size, entry_stat.st_mtime))
+        else:
+            file_items.append(entry)
+
+    files_digest = get_str_hash('\n'.join(file_items))
+    dir_items = [files_digest]
+    dir_items.extend('{}|{}'.format(child_name, children[child_name].digest) for child_name in sorted(children))
+    return DirFingerprint(op.basename(dir_path), get_str_hash('\n'.join(dir_items)), files_digest, children)
+
+
+def get_changed_dirs(old_fingerprint, new_fingerprint, dir_path):
+    """Compares two fingerprints of the same directory and returns the directories that have changed.
+    Unchanged subtrees are skipped. A directory is reported if its own files have changed, or if it has been
+    added or removed. Parent directories of a changed directory are not reported unless they have changed too.
+
+    Args:
+        old_fingerprint (DirFingerprint): previous fingerprint of the directory (or None if it did not exist)
+        new_fingerprint (DirFingerprint): current fingerprint of the directory (or None if it has been removed)
+        dir_path (str): full path of the directory
+
+    Returns:
+        list: full paths of the changed directories
+    """
+    if old_fingerprint is None or new_fingerprint is None:
+        return [dir_path]
+
+    if old_fingerprint.digest == new_fingerprint.digest:
+        return []
+
+    changed_dirs = []
+    if old_fingerprint.files_digest != new_fingerprint.files_digest:
+        changed_dirs.append(dir_path)
+
+    for child_name in sorted(set(old_fingerprint.children) | set(new_fingerprint.children)):
+        changed_dirs.extend(get_changed_dirs(old_fingerprint.children.get(child_name),
+                                             new_fingerprint.children.get(child_name),
+                                             op.join(dir_path, child_name)))
+    return changed_dirs
+
+
+def get_dir_digests(fingerprint, dir_path):
+    """Returns a dictionary of {full directory path: digest} for the directory and all its sub-directories."""
+    dir_digests = {dir_path: fingerprint.digest}
+    for child_name, child in fingerprint.children.items():
+        dir_digests.update(get_dir_digests(child, op.join(dir_path, child_name)))
+    return dir_digests
+
+
+def _get_fingerprint_file(extension):
+    return appdata.get_data_file(file_id='fingerprint_{}'.format(extension.name), file_ext='json')
+
+
+def _write_fingerprint_file(fingerprint, fingerprint_file):
+    with open(fingerprint_file, 'w') as fp_file:
+        json.dump(fingerprint.get_cache_data(), fp_file)
+
+
+def save_fingerprint(extension, fingerprint):
+    """Saves the directory fingerprint of the extension next to its cache."""
+    try:
+        fingerprint_file = _get_fingerprint_file(extension)
+        logger.debug('Writing fingerprint for: {} to: {}'.format(extension, fingerprint_file))
+        write_file_atomic(fingerprint_file,
+                          lambda temp_file: _write_fingerprint_file(fingerprint, temp_file))
+    except Exception as err:
+        raise PyRevitException('Error writing fingerprint for: {} | {}'.format(extension, err))
+
+
+def read_fingerprint(extension):
+    """Reads the last saved directory fingerprint of the extension.
+
+    Returns:
+        DirFingerprint: saved fingerprint or None if extension does not have a saved fingerprint.
+    """
+    fingerprint_file = _get_fingerprint_file(extension)
+    if not op.exists(fingerprint_file):
+        return None
+
+    try:
+        logger.debug('Reading fingerprint for: {} from: {}'.format(extension, fingerprint_file))
+        with open(fingerprint_file, 'r') as fp_file:
+            return make_fingerprint_from_cache(json.load(fp_file))
+    except Exception as err:
+        logger.debug('Error reading fingerprint for: {} | {}'.format(extension, err))
+        return None
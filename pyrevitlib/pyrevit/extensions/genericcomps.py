@@ -2,7 +2,7 @@ import os
 import os.path as op
 
 from pyrevit import MAIN_LIB_DIR, PYTHON_LIB_DIR, MISC_LIB_DIR, PyRevitException
-from pyrevit.coreutils import ScriptFileParser, cleanup_string
+from pyrevit.coreutils import ScriptMetadataParser, cleanup_string
 from pyrevit.coreutils.logger import get_logger
 from pyrevit.extensions import AUTHOR_PARAM, DOCSTRING_PARAM, UI_TITLE_PARAM
 from pyrevit.extensions import COMMAND_AVAILABILITY_NAME_POSTFIX
@@ -51,7 +51,10 @@ class GenericUIComponent(GenericComponent):
         self.original_name = self.name = None
         self.unique_name = None
         self.library_path = None
-        self.syspath_search_paths = [MAIN_LIB_DIR, PYTHON_LIB_DIR, MISC_LIB_DIR]
+        # search paths are chained: each component only keeps its own search paths (e.g. its /Lib directory)
+        # and links to its parent component. see get_search_paths()
+        self._own_search_paths = []
+        self._syspath_parent = None
         self.icon_file = None
 
     def __init_from_dir__(self, ext_dir):
@@ -81,26 +84,46 @@ class GenericUIComponent(GenericComponent):
                 continue
         return cleanup_string(uname)
 
+    def get_cache_data(self):
+        cache_dict = GenericComponent.get_cache_data(self)
+        # parent link is recreated when the component is added to its parent
+        cache_dict.pop('_syspath_parent', None)
+        return cache_dict
+
+    @property
+    def syspath_search_paths(self):
+        return self.get_search_paths()
+
     def get_search_paths(self):
-        return self.syspath_search_paths
+        """Returns the full list of search paths for this component: default pyRevit library paths, search paths of
+        this component, and then the search paths of its parents up to the extension.
+        """
+        search_paths = [MAIN_LIB_DIR, PYTHON_LIB_DIR, MISC_LIB_DIR]
+        component = self
+        while component:
+            for path in component._own_search_paths:
+                if path not in search_paths:
+                    search_paths.append(path)
+            component = getattr(component, '_syspath_parent', None)
+        return search_paths
 
     def get_lib_path(self):
         return self.library_path
 
     def has_syspath(self, path):
-        return path in self.syspath_search_paths
+        return path in self.get_search_paths()
 
     def add_syspath(self, path):
         if path and not self.has_syspath(path):
             logger.debug('Appending syspath: {} to {}'.format(path, self))
-            return self.syspath_search_paths.append(path)
+            return self._own_search_paths.append(path)
         else:
             return None
 
     def remove_syspath(self, path):
-        if path and self.has_syspath(path):
+        if path and path in self._own_search_paths:
             logger.debug('Removing syspath: {} from {}'.format(path, self))
-            return self.syspath_search_paths.remove(path)
+            return self._own_search_paths.remove(path)
         else:
             return None
 
@@ -117,11 +140,14 @@ class GenericUIContainer(GenericUIComponent):
         GenericUIComponent.__init__(self)
         self._sub_components = []
         self.layout_list = None
+        # (layout_list, components ordered per layout_list). see _get_ordered_components()
+        self._ordered_cmps = None
 
     def __init_from_dir__(self, ext_dir):
         GenericUIComponent.__init_from_dir__(self, ext_dir)
 
         self._sub_components = []
+        self._ordered_cmps = None
 
         self.original_name = op.splitext(op.basename(self.directory))[0]
 
@@ -140,7 +166,7 @@ class GenericUIContainer(GenericUIComponent):
 
         # setting up search paths. These paths will be added to all sub-components of this component.
         if self.library_path:
-            self.syspath_search_paths.append(self.library_path)
+            self._own_search_paths.append(self.library_path)
 
         self.layout_list = self._read_layout_file()
         logger.debug('Layout is: {}'.format(self.layout_list))
@@ -151,7 +177,22 @@ class GenericUIContainer(GenericUIComponent):
             logger.debug('Icon file is: {}'.format(self.original_name, self.icon_file))
 
     def __iter__(self):
-        return iter(self._get_components_per_layout())
+        return iter(self._get_ordered_components())
+
+    def __getstate__(self):
+        # ordered components are not cached. they're recreated on first iteration.
+        state = self.__dict__.copy()
+        state.pop('_ordered_cmps', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._ordered_cmps = None
+
+    def get_cache_data(self):
+        cache_dict = GenericUIComponent.get_cache_data(self)
+        cache_dict.pop('_ordered_cmps', None)
+        return cache_dict
 
     def _read_layout_file(self):
         full_file_path = op.join(self.directory, DEFAULT_LAYOUT_FILE_NAME)
@@ -166,14 +207,12 @@ class GenericUIContainer(GenericUIComponent):
         # if item is not listed in layout, it will not be created
         if self.layout_list and self._sub_components:
             logger.debug('Reordering components per layout file...')
-            layout_index = 0
-            _processed_cmps = []
-            for layout_item in self.layout_list:
-                for cmp_index, component in enumerate(self._sub_components):
-                    if component.original_name == layout_item:
-                        _processed_cmps.append(component)
-                        layout_index += 1
-                        break
+            # first component with a matching name is used for each layout item
+            components_by_name = {}
+            for component in self._sub_components:
+                components_by_name.setdefault(component.original_name, component)
+            _processed_cmps = [components_by_name[layout_item] for layout_item in self.layout_list
+                               if layout_item in components_by_name]
 
             # insert separators and slideouts per layout definition
             logger.debug('Adding separators and slide outs per layout...')
@@ -193,33 +232,27 @@ class GenericUIContainer(GenericUIComponent):
         else:
             return self._sub_components
 
+    def _get_ordered_components(self):
+        # components are ordered once and reused until a component is added or the layout is changed
+        if self._ordered_cmps is None or self._ordered_cmps[0] is not self.layout_list:
+            self._ordered_cmps = (self.layout_list, self._get_components_per_layout())
+        return self._ordered_cmps[1]
+
     def contains(self, item_name):
         for component in self._sub_components:
             if item_name == component.name:
                 return True
 
-    def add_syspath(self, path):
-        if path and not self.has_syspath(path):
-            logger.debug('Appending syspath: {} to {}'.format(path, self))
-            for component in self._sub_components:
-                component.add_syspath(path)
-            return self.syspath_search_paths.append(path)
-        else:
-            return None
-
     def remove_syspath(self, path):
-        if path and self.has_syspath(path):
-            logger.debug('Removing syspath: {} from {}'.format(path, self))
-            for component in self._sub_components:
-                component.remove_syspath(path)
-            return self.syspath_search_paths.remove(path)
-        else:
-            return None
+        for component in self._sub_components:
+            component.remove_syspath(path)
+        return GenericUIComponent.remove_syspath(self, path)
 
     def add_component(self, comp):
-        for path in self.syspath_search_paths:
-            comp.add_syspath(path)
+        # sub-components find the search paths of this component through the link to their parent
+        comp._syspath_parent = self
         self._sub_components.append(comp)
+        self._ordered_cmps = None
 
     def get_components(self):
         return self._sub_components
@@ -296,7 +329,7 @@ class GenericUICommand(GenericUIComponent):
 
         # setting up search paths. These paths will be added to sys.path by the command loader for easy imports.
         if self.library_path:
-            self.syspath_search_paths.append(self.library_path)
+            self._own_search_paths.append(self.library_path)
 
     def _find_script_file(self, script_postfixes):
         for bundle_file in os.listdir(self.directory):
@@ -308,7 +341,10 @@ class GenericUICommand(GenericUIComponent):
     def _analyse_python_script(self):
         try:
             # reading script file content to extract parameters
-            script_content = ScriptFileParser(self.get_full_script_address())
+            script_content = ScriptMetadataParser(self.get_full_script_address(),
+                                                  [UI_TITLE_PARAM, DOCSTRING_PARAM, AUTHOR_PARAM,
+                                                   MIN_PYREVIT_VERSION_PARAM, MIN_REVIT_VERSION_PARAM,
+                                                   COMMAND_OPTIONS_PARAM, COMMAND_CONTEXT_PARAM])
             # extracting min requried Revit and pyRevit versions
             extracted_ui_title = script_content.extract_param(UI_TITLE_PARAM)  # type: str
             if extracted_ui_title:
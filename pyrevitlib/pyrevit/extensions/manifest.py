@@ -0,0 +1,168 @@
+"""
+Pre-parsed extension manifests.
+A manifest stores the parsed component tree of an extension in a single file inside the extension directory
+(see EXT_MANIFEST_FILE). Extensions can ship with a manifest so they don't need to be parsed bundle by bundle when
+their cache is not valid. The manifest carries a portable fingerprint of the extension directory
+(see pyrevit.extensions.fingerprint) and is only used while this fingerprint matches the extension directory.
+
+Paths in the manifest are stored relative to the extension directory so the manifest stays valid when the extension
+is installed at another location. Unique names and aliases are recreated when the manifest is loaded.
+"""
+
+import os.path as op
+import json
+
+from pyrevit import PyRevitException
+from pyrevit.coreutils import get_all_subclasses
+from pyrevit.coreutils.logger import get_logger
+from pyrevit.userconfig import user_config
+from pyrevit.versionmgr import PYREVIT_VERSION
+from pyrevit.extensions import EXT_MANIFEST_FILE, COMMAND_AVAILABILITY_NAME_POSTFIX
+from pyrevit.extensions.genericcomps import GenericUICommand
+from pyrevit.extensions.fingerprint import make_fingerprint
+
+
+logger = get_logger(__name__)
+
+
+# manifests of other format versions are ignored
+MANIFEST_FORMAT_VERSION = 3
+
+MANIFEST_VERSION_KEY = 'manifest_version'
+MANIFEST_PYRVT_VERSION_KEY = 'pyrvt_version'
+MANIFEST_FINGERPRINT_KEY = 'fingerprint'
+MANIFEST_EXT_KEY = 'extension'
+
+SUB_CMP_KEY = '_sub_components'
+TYPE_ID_KEY = 'type_id'
+
+# paths under the extension directory are stored as EXT_DIR_TOKEN/relative/path
+EXT_DIR_TOKEN = '{extension}'
+
+
+def _get_manifest_file(extension):
+    return op.join(extension.directory, EXT_MANIFEST_FILE)
+
+
+def _make_portable(value, ext_dir):
+    if isinstance(value, dict):
+        return dict((k, _make_portable(v, ext_dir)) for k, v in value.items())
+    elif isinstance(value, list):
+        return [_make_portable(x, ext_dir) for x in value]
+    elif isinstance(value, basestring) and (value == ext_dir or value.startswith(ext_dir + op.sep)):
+        return EXT_DIR_TOKEN + value[len(ext_dir):].replace(op.sep, '/')
+    return value
+
+
+def _make_local(value, ext_dir):
+    if isinstance(value, dict):
+        return dict((k, _make_local(v, ext_dir)) for k, v in value.items())
+    elif isinstance(value, list):
+        return [_make_local(x, ext_dir) for x in value]
+    elif isinstance(value, basestring) and value.startswith(EXT_DIR_TOKEN):
+        return ext_dir + value[len(EXT_DIR_TOKEN):].replace('/', op.sep)
+    return value
+
+
+def _update_loaded_cmp(loaded_cmp):
+    # unique names are made from full directory path
+    loaded_cmp.unique_name = loaded_cmp._get_unique_name()
+    if isinstance(loaded_cmp, GenericUICommand):
+        loaded_cmp.unique_avail_name = loaded_cmp.unique_name + COMMAND_AVAILABILITY_NAME_POSTFIX
+
+    # aliases are set by user config on this machine
+    alias = user_config.get_alias(loaded_cmp.original_name)
+    name = alias if alias and alias != loaded_cmp.original_name else loaded_cmp.original_name
+    if loaded_cmp.ui_title == loaded_cmp.name:
+        loaded_cmp.ui_title = name
+    loaded_cmp.name = name
+
+
+def _make_sub_cmps_from_manifest(parent_cmp, manifest_sub_cmps):
+    sub_cmp_classes = {}
+    for sub_class in get_all_subclasses(parent_cmp.allowed_sub_cmps):
+        sub_cmp_classes[sub_class.type_id] = sub_class
+
+    loaded_cmps = []
+    for manifest_cmp in manifest_sub_cmps:  # type: dict
+        manifest_cmp_subs = manifest_cmp.pop(SUB_CMP_KEY, None)
+        try:
+            loaded_cmp = sub_cmp_classes[manifest_cmp[TYPE_ID_KEY]]()
+        except KeyError:
+            raise PyRevitException('Unknown component type in manifest: {}'.format(manifest_cmp[TYPE_ID_KEY]))
+
+        loaded_cmp.load_cache_data(manifest_cmp)
+        _update_loaded_cmp(loaded_cmp)
+        if manifest_cmp_subs:
+            for loaded_sub_cmp in _make_sub_cmps_from_manifest(loaded_cmp, manifest_cmp_subs):
+                loaded_cmp.add_component(loaded_sub_cmp)
+        loaded_cmps.append(loaded_cmp)
+
+    return loaded_cmps
+
+
+def save_manifest(parsed_ext):
+    """Saves the manifest of the given parsed extension into the extension directory.
+
+    Args:
+        parsed_ext (pyrevit.extensions.components.Extension): parsed extension. see parser.get_parsed_extension()
+
+    Returns:
+        str: full path of the manifest file
+    """
+    manifest_file = _get_manifest_file(parsed_ext)
+    try:
+        ext_dict = json.loads(json.dumps(parsed_ext, default=lambda o: o.get_cache_data()))
+        manifest_dict = {MANIFEST_VERSION_KEY: MANIFEST_FORMAT_VERSION,
+                         MANIFEST_PYRVT_VERSION_KEY: PYREVIT_VERSION.get_formatted(),
+                         MANIFEST_FINGERPRINT_KEY: make_fingerprint(parsed_ext.directory, portable=True).digest,
+                         MANIFEST_EXT_KEY: _make_portable(ext_dict, parsed_ext.directory)}
+
+        logger.debug('Writing manifest for: {} to: {}'.format(parsed_ext, manifest_file))
+        with open(manifest_file, 'w') as mfile:
+            json.dump(manifest_dict, mfile, sort_keys=True)
+    except Exception as err:
+        raise PyRevitException('Error writing manifest for: {} | {}'.format(parsed_ext, err))
+
+    return manifest_file
+
+
+def load_manifest(extension):
+    """Loads the components of the extension from its manifest, if extension has an up-to-date manifest.
+
+    Args:
+        extension (pyrevit.extensions.components.Extension): extension with no sub-components
+
+    Returns:
+        pyrevit.extensions.components.Extension: extension with sub-components loaded or None if extension does not
+        have a manifest or the manifest is not valid for the extension directory anymore.
+    """
+    manifest_file = _get_manifest_file(extension)
+    if not op.exists(manifest_file):
+        return None
+
+    try:
+        logger.debug('Reading manifest for: {} from: {}'.format(extension, manifest_file))
+        with open(manifest_file, 'r') as mfile:
+            manifest_dict = json.load(mfile)
+
+        if manifest_dict[MANIFEST_VERSION_KEY] != MANIFEST_FORMAT_VERSION \
+                or manifest_dict[MANIFEST_PYRVT_VERSION_KEY] != extension.pyrvt_version:
+            logger.debug('Manifest is made by another version: {}'.format(manifest_file))
+            return None
+
+        if manifest_dict[MANIFEST_FINGERPRINT_KEY] != make_fingerprint(extension.directory, portable=True).digest:
+            logger.debug('Manifest is out of date: {}'.format(manifest_file))
+            return None
+
+        ext_dict = _make_local(manifest_dict[MANIFEST_EXT_KEY], extension.directory)
+        loaded_cmps = _make_sub_cmps_from_manifest(extension, ext_dict[SUB_CMP_KEY])
+    except Exception as err:
+        logger.warning('Error reading manifest for: {} | {}'.format(extension, err))
+        return None
+
+    for loaded_cmp in loaded_cmps:
+        extension.add_component(loaded_cmp)
+
+    logger.debug('Extension loaded from manifest: {}'.format(extension))
+    return extension
@@ -4,27 +4,50 @@ import os.path as op
 from pyrevit import PyRevitException
 from pyrevit.coreutils import get_all_subclasses
 from pyrevit.coreutils.logger import get_logger
+from pyrevit.extensions.manifest import load_manifest
 
 
 logger = get_logger(__name__)
 
 
-def _get_discovered_comps(comp_path, component_types_list):
+# cache of postfix lookup tables per list of allowed component types
+_postfix_tables = {}
+
+
+def _get_postfix_table(component_types_list):
+    """Returns a dictionary of {type_id: component_class} for the given component types.
+    Component directories are identified by their postfix (e.g. "folder.pushbutton") so each directory entry
+    can be dispatched directly to its one matching class instead of trying every component class on it.
+    """
+    table_key = tuple(component_types_list)
+    if table_key not in _postfix_tables:
+        postfix_table = {}
+        for component_type in component_types_list:
+            if component_type.type_id:
+                postfix_table.setdefault(component_type.type_id, component_type)
+        logger.debug('Postfix table for {} is: {}'.format(component_types_list, postfix_table))
+        _postfix_tables[table_key] = postfix_table
+
+    return _postfix_tables[table_key]
+
+
+def _get_discovered_comps(comp_path, postfix_table):
     discovered_cmps = []
     logger.debug('Testing _get_component(s) on: {} '.format(comp_path))
-    # comp_path might be a file or a dir, but its name should not start with . or _:
-    for component_type in component_types_list:
-        logger.debug('Testing sub_directory {} for {}'.format(comp_path, component_type))
+    # comp_path might be a file or a dir, but only directories with a known postfix can be components
+    component_type = postfix_table.get(op.splitext(comp_path)[1], None)
+    if component_type and op.isdir(comp_path):
+        logger.debug('Creating component of type: {} from: {}'.format(component_type, comp_path))
         try:
-            # if cmp_class can be created for this sub-dir, the add to list
-            # cmp_class will raise error if comp_path is not of cmp_class type.
+            # cmp_class will raise error if comp_path is not a valid directory for cmp_class type.
             component = component_type()
             component.__init_from_dir__(comp_path)
             discovered_cmps.append(component)
             logger.debug('Successfuly created component: {} from: {}'.format(component, comp_path))
-            break
         except PyRevitException:
             logger.debug('Can not create component of type: {} from: {}'.format(component_type, comp_path))
+    else:
+        logger.debug('Directory does not match any component type: {}'.format(comp_path))
 
     return discovered_cmps
 
@@ -43,17 +66,19 @@ def _create_subcomponents(search_dir, component_types_list, create_from_search_d
         list of created classes of types provided in component_types_list
     """
     sub_cmp_list = []
+    postfix_table = _get_postfix_table(component_types_list)
 
     if not create_from_search_dir:
         logger.debug('Searching directory: {} for components of type: {}'.format(search_dir, component_types_list))
+        # each directory is listed only once and every entry is dispatched per its postfix
         for file_or_dir in os.listdir(search_dir):
             full_path = op.join(search_dir, file_or_dir)
             if not file_or_dir.startswith(('.', '_')):
-                sub_cmp_list.extend(_get_discovered_comps(full_path, component_types_list))
+                sub_cmp_list.extend(_get_discovered_comps(full_path, postfix_table))
             else:
                 logger.debug('Skipping _get_component. Name can not start with . or _: {}'.format(full_path))
     else:
-        sub_cmp_list.extend(_get_discovered_comps(search_dir, component_types_list))
+        sub_cmp_list.extend(_get_discovered_comps(search_dir, postfix_table))
 
     return sub_cmp_list
 
@@ -73,35 +98,109 @@ def _parse_for_components(component):
             _parse_for_components(new_cmp)
 
 
+def _is_affected_dir(comp_dir, changed_dirs):
+    """Checks if comp_dir or any directory under it is listed in changed_dirs."""
+    for changed_dir in changed_dirs:
+        if changed_dir == comp_dir or changed_dir.startswith(comp_dir + op.sep):
+            return True
+    return False
+
+
+def _reparse_for_components(component, cached_component, changed_dirs):
+    """Parses component.directory for sub-components like _parse_for_components() but reuses the sub-components of
+    cached_component (previously parsed component for the same directory) that are not affected by changed_dirs.
+    Only the directories on the path to a changed bundle are listed and only the changed bundles are re-created.
+    """
+    cached_sub_cmps = {}
+    for cached_sub_cmp in cached_component.get_components():
+        cached_sub_cmps[cached_sub_cmp.directory] = cached_sub_cmp
+
+    postfix_table = _get_postfix_table(get_all_subclasses(component.allowed_sub_cmps))
+    for file_or_dir in os.listdir(component.directory):
+        full_path = op.join(component.directory, file_or_dir)
+        if file_or_dir.startswith(('.', '_')):
+            continue
+
+        cached_sub_cmp = cached_sub_cmps.get(full_path, None)
+        if cached_sub_cmp and not _is_affected_dir(full_path, changed_dirs):
+            # splice the unchanged sub-tree into the new tree
+            logger.debug('Reusing unchanged component: {}'.format(cached_sub_cmp))
+            component.add_component(cached_sub_cmp)
+            continue
+
+        for new_cmp in _get_discovered_comps(full_path, postfix_table):
+            logger.debug('Re-parsed changed component: {}'.format(new_cmp))
+            component.add_component(new_cmp)
+            if new_cmp.is_container:
+                # sub-components carry the library path of their parents so they can only be reused if it's unchanged
+                if cached_sub_cmp and cached_sub_cmp.is_container \
+                        and cached_sub_cmp.library_path == new_cmp.library_path:
+                    _reparse_for_components(new_cmp, cached_sub_cmp, changed_dirs)
+                else:
+                    _parse_for_components(new_cmp)
+
+
 def parse_comp_dir(comp_path, comp_class):
     return _create_subcomponents(comp_path, get_all_subclasses([comp_class]), create_from_search_dir=True)
 
 
-def get_parsed_extension(extension):
+def get_parsed_extension(extension, use_manifest=True):
     """Parses package directory and creates and adds components to the package object
     Each package object is the root to a tree of components that exists under that package. (e.g. tabs, buttons, ...)
     sub components of package can be accessed by iterating the _get_component. See _basecomponents for types.
+    If the package has an up-to-date manifest, components are loaded from the manifest instead (see .manifest)
     """
+    if use_manifest and load_manifest(extension):
+        logger.debug('Components loaded from manifest for: {}'.format(extension))
+        return extension
+
     _parse_for_components(extension)
     return extension
 
 
-def parse_dir_for_ext_type(root_dir, parent_cmp_type):
-    """Parses root_dir and return a list of objects of type parent_cmp_type for installed extensions.
-    The package objects won't be parsed at this level. This is useful for collecting basic info on an extension type
-    for cache cheching or updating extensions using their directory paths.
+def get_reparsed_extension(extension, cached_extension, changed_dirs):
+    """Parses package directory like get_parsed_extension() but re-parses only the bundles that have changed.
+    Components of cached_extension (previously parsed tree of the same extension) that are not affected by the changed
+    directories are spliced into the new tree as they are. Re-parse time scales with the size of the change and not
+    the size of the extension.
+
+    Args:
+        extension (pyrevit.extensions.components.Extension): extension to be parsed
+        cached_extension (pyrevit.extensions.components.Extension): previously parsed tree of the same extension
+        changed_dirs (list): full paths of changed directories. see pyrevit.extensions.fingerprint.get_changed_dirs()
+
+    Returns:
+        pyrevit.extensions.components.Extension: parsed extension
+    """
+    if extension.library_path != cached_extension.library_path:
+        logger.debug('Extension library path has changed. Parsing all components of: {}'.format(extension))
+        _parse_for_components(extension)
+    else:
+        _reparse_for_components(extension, cached_extension, changed_dirs)
+    return extension
+
+
+def find_ext_dirs(root_dir, ext_types):
+    """Lists root_dir only once and sorts the extension directories under it by their type.
+    The extension objects are not created at this level. This is useful for collecting the extension directories of
+    all types with a single listing of the root directory (e.g. for extension roots on network shares)
+
+    Returns:
+        dict: {extension type: [extension directories]} for all extension types in ext_types
     """
+    ext_dirs = {ext_type: [] for ext_type in ext_types}
+
     # making sure the provided directory exists. This is mainly for the user defined package directories
     if not op.exists(root_dir):
         logger.debug('Extension search directory does not exist: {}'.format(root_dir))
-        return []
-
-    # try creating extensions in given directory
-    ext_data_list = []
+        return ext_dirs
 
-    logger.debug('Parsing directory for extensions of type: {}'.format(parent_cmp_type))
-    for ext_data in _create_subcomponents(root_dir, [parent_cmp_type]):
-        logger.debug('Extension directory found: {}'.format(ext_data))
-        ext_data_list.append(ext_data)
+    postfix_table = _get_postfix_table(ext_types)
+    for file_or_dir in os.listdir(root_dir):
+        ext_type = postfix_table.get(op.splitext(file_or_dir)[1], None)
+        full_path = op.join(root_dir, file_or_dir)
+        if ext_type and not file_or_dir.startswith(('.', '_')) and op.isdir(full_path):
+            logger.debug('Extension directory found: {}'.format(full_path))
+            ext_dirs[ext_type].append(full_path)
 
-    return ext_data_list
+    return ext_dirs
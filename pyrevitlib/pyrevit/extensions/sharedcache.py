@@ -0,0 +1,137 @@
+"""
+Content-addressed cache of parsed extensions that is shared between host versions.
+Appdata cache files are kept per host version (see pyrevit.coreutils.appdata) so the same extension is parsed once for
+every host version. Entries in the shared cache are keyed by the content of the extension instead: its directory,
+directory fingerprint, pyRevit version, and the command aliases of the user (see get_content_key). The first host
+to parse an extension publishes it and the other host versions reuse it.
+
+Shared cache is kept in the roaming pyRevit folder of the user. Cached components point to the scripts that pyRevit
+runs, so the cache is never stored where other users can write to it. Entries are stored in the binary cache format
+which only holds plain values (see pyrevit.extensions.cacher_bin).
+
+A new entry is published whenever an extension changes. Only the most recent entries of each extension are kept
+(see SHARED_CACHE_MAX_ENTRIES) and the older entries are removed when a new entry is published.
+"""
+
+import os
+import os.path as op
+import re
+
+from pyrevit import PYREVIT_APP_DIR
+from pyrevit.coreutils import get_str_hash
+from pyrevit.coreutils.filelock import write_file_atomic
+from pyrevit.coreutils.logger import get_logger
+from pyrevit.userconfig import user_config
+from pyrevit.extensions import cacher_bin
+
+
+logger = get_logger(__name__)
+
+
+# entries made by other format versions are not used
+SHARED_CACHE_FORMAT_VERSION = 3
+
+SHARED_CACHE_DIR = op.join(PYREVIT_APP_DIR, 'SharedCache')
+
+# number of entries that are kept for each extension. e.g. one for each pyRevit version that is in use
+SHARED_CACHE_MAX_ENTRIES = 3
+
+
+def get_content_key(extension):
+    """Returns the key of the shared cache entry for the given extension.
+    Key is made from everything the parsed extension depends on so extensions with equal keys have equal parse
+    results on any host version.
+
+    Args:
+        extension (pyrevit.extensions.components.Extension): extension with updated directory hash.
+                                                             see Extension.update_dir_hash()
+    """
+    aliases = sorted(user_config.get_aliases().items())
+    return get_str_hash('{}|{}|{}|{}|{}'.format(SHARED_CACHE_FORMAT_VERSION,
+                                                extension.pyrvt_version,
+                                                extension.directory,
+                                                extension.dir_hash_value,
+                                                aliases))
+
+
+def get_entry_file(extension):
+    """Returns full path of the shared cache entry of the given extension."""
+    return op.join(SHARED_CACHE_DIR,
+                   '{}_{}.{}'.format(extension.name, get_content_key(extension), cacher_bin.CACHE_FILE_EXT))
+
+
+def _list_entry_files(extension):
+    entry_finder = re.compile(re.escape(extension.name) + r'_[0-9a-f]+\.' + cacher_bin.CACHE_FILE_EXT + '$')
+    return [op.join(SHARED_CACHE_DIR, x) for x in os.listdir(SHARED_CACHE_DIR) if entry_finder.match(x)]
+
+
+def _evict_entries(extension):
+    """Removes the older shared cache entries of the given extension. see SHARED_CACHE_MAX_ENTRIES"""
+    entry_files = []
+    for entry_file in _list_entry_files(extension):
+        try:
+            entry_files.append((op.getmtime(entry_file), entry_file))
+        except OSError:
+            # entry is removed in the meantime
+            continue
+
+    for _, entry_file in sorted(entry_files, reverse=True)[SHARED_CACHE_MAX_ENTRIES:]:
+        try:
+            os.remove(entry_file)
+            logger.debug('Shared cache entry evicted: {}'.format(entry_file))
+        except OSError as remove_err:
+            # entry might be in use by another host
+            logger.debug('Can not evict shared cache entry: {} | {}'.format(entry_file, remove_err))
+
+
+def get_shared_extension(extension):
+    """Loads the parsed extension from its shared cache entry.
+
+    Returns:
+        pyrevit.extensions.components.Extension: cached extension or None if extension is not in shared cache.
+    """
+    entry_file = get_entry_file(extension)
+    if not op.exists(entry_file):
+        logger.debug('Extension is not in shared cache: {}'.format(extension))
+        return None
+
+    try:
+        cached_ext = cacher_bin.read_cache_file(extension, entry_file)
+    except Exception as read_err:
+        logger.debug('Error reading shared cache entry: {} | {}'.format(entry_file, read_err))
+        return None
+
+    # entry key includes the directory and directory hash but making sure the entry is not corrupt
+    if cached_ext.directory != extension.directory or cached_ext.dir_hash_value != extension.dir_hash_value:
+        logger.debug('Shared cache entry does not match extension: {}'.format(entry_file))
+        return None
+
+    # keeping entries in use by any host version from being evicted
+    try:
+        os.utime(entry_file, None)
+    except OSError:
+        pass
+
+    logger.debug('Extension loaded from shared cache: {}'.format(extension))
+    return cached_ext
+
+
+def publish_extension(parsed_ext):
+    """Publishes the parsed extension into the shared cache if it is not already there.
+    Entries are never overwritten since entries with the same key have the same content.
+    """
+    entry_file = get_entry_file(parsed_ext)
+    if op.exists(entry_file):
+        logger.debug('Shared cache entry already exists: {}'.format(entry_file))
+        return
+
+    try:
+        if not op.isdir(SHARED_CACHE_DIR):
+            os.makedirs(SHARED_CACHE_DIR)
+        # other hosts might be reading the entries
+        write_file_atomic(entry_file, lambda temp_file: cacher_bin.write_cache_file(parsed_ext, temp_file))
+        logger.debug('Shared cache entry published: {}'.format(entry_file))
+        _evict_entries(parsed_ext)
+    except Exception as publish_err:
+        # another host might have published the same entry in the meantime
+        logger.debug('Error publishing shared cache entry: {} | {}'.format(entry_file, publish_err))
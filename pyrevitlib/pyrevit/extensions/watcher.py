@@ -0,0 +1,224 @@
+"""
+Watches the extension directories for changes.
+The watcher compares directory fingerprints (see pyrevit.extensions.fingerprint) of the extensions under the given
+root directories and reports the bundles that have changed. Bursts of changes (e.g. an editor saving a few files) are
+debounced and reported once all the changes to an extension have settled.
+
+This module is pure python so it can run (and be tested) outside of Revit. By default the directories are polled for
+changes on an interval. When an external trigger (e.g. a .net FileSystemWatcher) reports the changed paths through
+ExtensionWatcher.notify(), polling can be turned off (see ExtensionWatcher.polling) and only the extensions that
+include the changed paths are fingerprinted again.
+
+Example:
+    >>> def on_change(changes):
+    ...     for ext_dir, changed_dirs in changes.items():
+    ...         print(ext_dir, changed_dirs)
+    >>> watcher = ExtensionWatcher(['/path/to/extensions'], on_change)
+    >>> watcher.start()
+    >>> watcher.stop()
+"""
+
+import os.path as op
+import time
+import threading
+
+from pyrevit.coreutils.logger import get_logger
+from pyrevit.extensions.components import Extension
+from pyrevit.extensions.parser import find_ext_dirs
+from pyrevit.extensions.fingerprint import make_fingerprint, get_changed_dirs
+
+
+logger = get_logger(__name__)
+
+
+# seconds between polls of the extension directories
+DEFAULT_POLL_INTERVAL = 2.0
+
+# seconds an extension directory needs to stay unchanged before its changes are reported
+DEFAULT_DEBOUNCE_DELAY = 0.5
+
+
+class ExtensionWatcher(object):
+    """Watches extension directories under the given root directories.
+
+    Args:
+        root_dirs (list): extension root directories
+        on_change (function): called with {extension directory: [changed directories]} when changes have settled.
+                              Changed directories are full paths. see pyrevit.extensions.fingerprint.get_changed_dirs()
+        interval (float): seconds between polls of the extension directories
+        debounce (float): seconds an extension needs to stay unchanged before its changes are reported
+        polling (bool): poll all extension directories on the interval. Turn off only when all changes are reported
+                        through notify()
+    """
+    def __init__(self, root_dirs, on_change,
+                 interval=DEFAULT_POLL_INTERVAL, debounce=DEFAULT_DEBOUNCE_DELAY, polling=True):
+        self.root_dirs = list(root_dirs)
+        self.interval = interval
+        self.debounce = debounce
+        self.polling = polling
+        self._on_change = on_change
+
+        # extension directories that include the paths reported by notify() since the last poll
+        self._notified_exts = set()
+        self._notified_all = False
+        self._notified_lock = threading.Lock()
+
+        # fingerprints of the extensions as of the last report and as of the last poll
+        self._reported_fps = self._scan()
+        self._polled_fps = dict(self._reported_fps)
+        # time of the last change seen for extensions with unreported changes
+        self._changed_at = {}
+
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _fingerprint_ext(ext_dir, ext_fps):
+        try:
+            ext_fps[ext_dir] = make_fingerprint(ext_dir)
+        except Exception as fp_err:
+            # directory might get removed while being fingerprinted. it'll be picked up on next poll.
+            logger.debug('Error fingerprinting: {} | {}'.format(ext_dir, fp_err))
+
+    @staticmethod
+    def _is_ext_dir(ext_dir):
+        ext_name = op.basename(ext_dir)
+        return op.splitext(ext_name)[1] == Extension.type_id \
+            and not ext_name.startswith(('.', '_')) \
+            and op.isdir(ext_dir)
+
+    def _scan(self, ext_dirs=None):
+        # only the given extensions are fingerprinted again. fingerprints of the others are kept from last poll
+        if ext_dirs is not None:
+            ext_fps = dict(self._polled_fps)
+            for ext_dir in ext_dirs:
+                ext_fps.pop(ext_dir, None)
+                if self._is_ext_dir(ext_dir):
+                    self._fingerprint_ext(ext_dir, ext_fps)
+            return ext_fps
+
+        ext_fps = {}
+        for root_dir in self.root_dirs:
+            if not op.isdir(root_dir):
+                continue
+            for ext_dir in find_ext_dirs(root_dir, [Extension])[Extension]:
+                self._fingerprint_ext(ext_dir, ext_fps)
+        return ext_fps
+
+    def _get_ext_dir(self, changed_path):
+        # changed path is either an extension directory or inside one, directly under one of the root directories
+        changed_path = op.normpath(changed_path)
+        for root_dir in self.root_dirs:
+            root_prefix = op.normpath(root_dir) + op.sep
+            if op.normcase(changed_path).startswith(op.normcase(root_prefix)):
+                # joined the same way as find_ext_dirs() so the directory matches the scanned ones
+                return op.join(root_dir, changed_path[len(root_prefix):].split(op.sep)[0])
+        return None
+
+    @staticmethod
+    def _get_digest(fingerprint):
+        return fingerprint.digest if fingerprint else None
+
+    def poll(self, now=None, ext_dirs=None):
+        """Checks the extension directories for changes once.
+
+        Args:
+            now (float): current time in seconds. Defaults to time.time()
+            ext_dirs (iterable): extension directories to check. All extensions under the root directories are
+                                 checked if not provided.
+
+        Returns:
+            dict: {extension directory: [changed directories]} for extensions whose changes have settled
+        """
+        now = time.time() if now is None else now
+        current_fps = self._scan(ext_dirs)
+
+        settled_changes = {}
+        for ext_dir in sorted(set(self._reported_fps) | set(current_fps) | set(self._changed_at)):
+            current_digest = self._get_digest(current_fps.get(ext_dir))
+            if current_digest != self._get_digest(self._polled_fps.get(ext_dir)):
+                # extension is still changing. wait for changes to settle
+                self._changed_at[ext_dir] = now
+                continue
+
+            if ext_dir in self._changed_at and now - self._changed_at[ext_dir] >= self.debounce:
+                del self._changed_at[ext_dir]
+                reported_fp = self._reported_fps.get(ext_dir)
+                if current_digest != self._get_digest(reported_fp):
+                    settled_changes[ext_dir] = get_changed_dirs(reported_fp, current_fps.get(ext_dir), ext_dir)
+                if ext_dir in current_fps:
+                    self._reported_fps[ext_dir] = current_fps[ext_dir]
+                else:
+                    self._reported_fps.pop(ext_dir, None)
+
+        self._polled_fps = current_fps
+        return settled_changes
+
+    def notify(self, changed_path=None):
+        """Asks the watcher to check for changes now. Safe to be called from any thread.
+
+        Args:
+            changed_path (str): full path of the changed file or directory. Only the extension that includes this
+                                path is checked. All extensions are checked if not provided.
+        """
+        with self._notified_lock:
+            if changed_path is None:
+                self._notified_all = True
+            else:
+                ext_dir = self._get_ext_dir(changed_path)
+                if ext_dir:
+                    self._notified_exts.add(ext_dir)
+        self._wake_event.set()
+
+    def _get_dirs_to_poll(self):
+        with self._notified_lock:
+            notified_exts, notified_all = self._notified_exts, self._notified_all
+            self._notified_exts, self._notified_all = set(), False
+
+        if self.polling or notified_all:
+            return None
+        # extensions with unsettled changes are checked until they settle
+        return notified_exts | set(self._changed_at)
+
+    def _watch(self):
+        while not self._stop_event.is_set():
+            # poll faster while waiting for changes to settle. without polling, wait for a notification.
+            if self._changed_at:
+                self._wake_event.wait(min(self.interval, self.debounce))
+            elif self.polling:
+                self._wake_event.wait(self.interval)
+            else:
+                self._wake_event.wait()
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+
+            try:
+                changes = self.poll(ext_dirs=self._get_dirs_to_poll())
+                if changes:
+                    logger.debug('Extension changes: {}'.format(changes))
+                    self._on_change(changes)
+            except Exception as watch_err:
+                logger.error('Error watching extensions: {}'.format(watch_err))
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Starts watching the extension directories on a background thread."""
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch, name='pyRevitExtensionWatcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops watching the extension directories."""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self.is_running and self._thread is not threading.current_thread():
+            self._thread.join(self.interval)
+        self._thread = None
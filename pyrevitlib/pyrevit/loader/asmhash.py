@@ -0,0 +1,136 @@
+"""
+Shards and hashes of the types that are emitted into the assemblies of an extension.
+Command types of an extension are emitted into one assembly per tab (see get_asm_shards). Tabs with too many commands
+are split into one assembly per panel. Each assembly is named by the hash of its emitted types (see asmmaker) so only
+the assemblies of the changed tabs or panels are emitted and loaded again.
+
+The hash is made from the fields that the type makers pass into the emitted types (see
+pyrevit.loader.basetypes.typemaker): class names, availability context, and script language, plus the pyRevit
+version, base types, and c# scripts. Script paths, search paths, and names of python commands are looked up at run
+time from the dispatch table (see pyrevit.loader.dispatcher). Other metadata (e.g. tooltips, authors, icons) is only
+used for creating the ui and does not change the assembly.
+"""
+
+from pyrevit.coreutils import get_str_hash, read_source_file
+from pyrevit.coreutils.logger import get_logger
+
+from pyrevit.extensions import CSHARP_LANG
+from pyrevit.extensions.genericcomps import GenericUIContainer, GenericUICommand
+
+from pyrevit.loader import HASH_CUTOFF_LENGTH
+from pyrevit.loader.basetypes import BASE_TYPES_DIR_HASH
+
+
+logger = get_logger(__name__)
+
+
+# tabs with more commands than this are split into one shard per panel
+SHARD_MAX_COMMANDS = 250
+
+
+def _get_sub_containers(component):
+    # all sub containers, including the ones that are not listed in layouts
+    return sorted(component.get_components_of_type(GenericUIContainer), key=lambda x: x.unique_name)
+
+
+def get_asm_shards(extension):
+    """Returns the assembly shards of the given extension.
+    Commands of each tab are emitted into one shard. Commands of the tabs with more than SHARD_MAX_COMMANDS commands
+    are emitted into one shard per panel. Shards are keyed by the unique name of their tab or panel so the same
+    commands always end up in the same shard.
+
+    Args:
+        extension (pyrevit.extensions.components.Extension): extension
+
+    Returns:
+        list: list of (shard component, list of commands) sorted by unique name of the shard component.
+              Shard component is the tab or panel of the commands.
+    """
+    shards = []
+    for tab in _get_sub_containers(extension):
+        tab_cmds = tab.get_components_of_type(GenericUICommand)
+        if len(tab_cmds) > SHARD_MAX_COMMANDS:
+            logger.debug('Sharding tab per panel: {} with {} commands'.format(tab, len(tab_cmds)))
+            sharded_cmd_ids = set()
+            for panel in _get_sub_containers(tab):
+                panel_cmds = panel.get_components_of_type(GenericUICommand)
+                if panel_cmds:
+                    shards.append((panel, panel_cmds))
+                    sharded_cmd_ids.update(id(x) for x in panel_cmds)
+            # commands that are directly under the tab stay in the tab shard
+            tab_only_cmds = [x for x in tab_cmds if id(x) not in sharded_cmd_ids]
+            if tab_only_cmds:
+                shards.append((tab, tab_only_cmds))
+        elif tab_cmds:
+            shards.append((tab, tab_cmds))
+
+    return sorted(shards, key=lambda x: x[0].unique_name)
+
+
+def get_cmd_emission_data(cmd_component):
+    """Returns the fields of the given command that affect the types emitted for it.
+
+    Args:
+        cmd_component (pyrevit.extensions.genericcomps.GenericUICommand): command component
+
+    Returns:
+        list: list of str field values in a stable order
+    """
+    # script, config script, search paths, and name of python commands are not emitted. see loader.dispatcher
+    # emitted types of c# commands are derived from the types in the c# batch assembly. see get_emission_hash()
+    emission_data = [cmd_component.unique_name,
+                     cmd_component.unique_avail_name,
+                     cmd_component.cmd_context,
+                     cmd_component.script_language]
+
+    return [str(x) for x in emission_data]
+
+
+def get_csharp_batch_hash(batch):
+    """Returns the hash of a batch of c# scripts that are compiled into one assembly.
+    see pyrevit.loader.basetypes.csharptypemaker.compile_csharp_batch()
+
+    Args:
+        batch (list): list of (command, script source)
+
+    Returns:
+        str: hash value cut to loader.HASH_CUTOFF_LENGTH
+    """
+    batch_lines = sorted('{}|{}'.format(cmd.unique_name, get_str_hash(source)) for cmd, source in batch)
+    return get_str_hash('\n'.join(batch_lines))[:HASH_CUTOFF_LENGTH]
+
+
+def _get_csharp_batch(cmd_components):
+    batch = []
+    for cmd_component in cmd_components:
+        if cmd_component.script_file and cmd_component.script_language == CSHARP_LANG:
+            try:
+                batch.append((cmd_component, read_source_file(cmd_component.get_full_script_address())))
+            except Exception as read_err:
+                logger.debug('Can not read c# script for hashing: {} | {}'.format(cmd_component, read_err))
+    return batch
+
+
+def get_emission_hash(extension, cmd_components=None):
+    """Returns the hash of the types emitted into an assembly of the given extension.
+    Hash is independent of the order of the commands and only changes when the emitted types change.
+
+    Args:
+        extension (pyrevit.extensions.components.Extension): extension
+        cmd_components (list): commands emitted into the assembly (e.g. commands of a shard).
+                               defaults to all commands of the extension
+
+    Returns:
+        str: hash value cut to loader.HASH_CUTOFF_LENGTH
+    """
+    if cmd_components is None:
+        cmd_components = extension.get_all_commands()
+    cmd_lines = sorted('|'.join(get_cmd_emission_data(x)) for x in cmd_components)
+
+    # emitted types of c# commands are derived from the types in the c# batch assembly of the extension
+    if any(x.script_language == CSHARP_LANG for x in cmd_components):
+        cmd_lines.append(get_csharp_batch_hash(_get_csharp_batch(extension.get_all_commands())))
+
+    # base types are emitted into every extension assembly and pyRevit version is the assembly version
+    hash_source = '\n'.join([BASE_TYPES_DIR_HASH, str(extension.pyrvt_version)] + cmd_lines)
+    return get_str_hash(hash_source)[:HASH_CUTOFF_LENGTH]
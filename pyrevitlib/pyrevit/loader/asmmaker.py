@@ -1,17 +1,21 @@
 import clr
 import os.path as op
+import shutil
+import tempfile
 from collections import namedtuple
 
-from pyrevit import PYREVIT_ADDON_NAME
+from pyrevit import HOST_APP, PYREVIT_ADDON_NAME
 import pyrevit.coreutils.appdata as appdata
 from pyrevit.coreutils import load_asm_file, find_loaded_asm, get_file_name, make_canonical_name
-from pyrevit.coreutils import get_str_hash, get_revit_instance_count
+from pyrevit.coreutils import Timer
+from pyrevit.coreutils.filelock import FileLock, get_lock_file, replace_file, TEMP_FILE_EXT
 from pyrevit.coreutils.logger import get_logger
 from pyrevit.versionmgr import PYREVIT_VERSION
+from pyrevit.extensions import cachestats
 
-from pyrevit.loader import ASSEMBLY_FILE_TYPE, HASH_CUTOFF_LENGTH
-from pyrevit.loader.basetypes import BASE_TYPES_DIR_HASH
-from pyrevit.loader.basetypes.typemaker import make_cmd_types, make_shared_types
+from pyrevit.loader import ASSEMBLY_FILE_TYPE
+from pyrevit.loader.asmhash import get_emission_hash, get_asm_shards
+from pyrevit.loader.basetypes.typemaker import make_cmd_types, make_shared_types, prepare_cmd_types
 
 clr.AddReference('PresentationCore')
 clr.AddReference('RevitAPI')
@@ -26,24 +30,25 @@ from System.Reflection import Assembly, AssemblyName
 from System.Reflection.Emit import AssemblyBuilderAccess
 
 # Generic named tuple for passing assembly information to other modules
+# each extension has one assembly per shard. see create_assembly()
 ExtensionAssemblyInfo = namedtuple('ExtensionAssemblyInfo', ['name', 'location', 'reloading'])
 
 
 logger = get_logger(__name__)
 
 
-def _make_extension_hash(extension):
-    # creates a hash based on hash of baseclasses module that the extension is based upon
-    return get_str_hash(BASE_TYPES_DIR_HASH + extension.ext_hash_value)[:HASH_CUTOFF_LENGTH]
+def _make_extension_hash(extension, shard_cmds):
+    # creates a hash based on the types that are emitted into the shard assembly. see asmhash
+    return get_emission_hash(extension, shard_cmds)
 
 
-def _make_ext_asm_fileid(extension):
-    return '{}_{}'.format(_make_extension_hash(extension), extension.name)
+def _make_ext_asm_fileid(extension, shard_cmp, shard_cmds):
+    return '{}_{}'.format(_make_extension_hash(extension, shard_cmds), shard_cmp.unique_name)
 
 
-def _is_pyrevit_ext_asm(asm_name, extension):
-    # if this is a pyRevit package assembly
-    return asm_name.startswith(PYREVIT_ADDON_NAME) and asm_name.endswith(extension.name)
+def _is_pyrevit_ext_asm(asm_name, shard_cmp):
+    # if this is a pyRevit package assembly of the same shard
+    return asm_name.startswith(PYREVIT_ADDON_NAME) and asm_name.endswith('_' + shard_cmp.unique_name)
 
 
 def _is_pyrevit_ext_already_loaded(ext_asm_name):
@@ -51,30 +56,30 @@ def _is_pyrevit_ext_already_loaded(ext_asm_name):
     return len(find_loaded_asm(ext_asm_name))
 
 
-def _is_any_ext_asm_loaded(extension):
-    for loaded_asm in AppDomain.CurrentDomain.GetAssemblies():
-        logger.debug('Checking for loaded extension asm: {} ? {} : {}'.format(extension.name,
+def _is_any_ext_asm_loaded(shard_cmp):
+    for loaded_asm in find_loaded_asm(shard_cmp.unique_name, by_partial_name=True):
+        logger.debug('Checking for loaded extension asm: {} ? {} : {}'.format(shard_cmp.unique_name,
                                                                               loaded_asm.GetName().Name,
                                                                               loaded_asm))
-        if _is_pyrevit_ext_asm(loaded_asm.GetName().Name, extension):
+        if _is_pyrevit_ext_asm(loaded_asm.GetName().Name, shard_cmp):
             return True
     return False
 
 
-def _update_component_cmd_types(extension):
-    for cmd_component in extension.get_all_commands():
+def _update_component_cmd_types(shard_cmds):
+    for cmd_component in shard_cmds:
         make_cmd_types(cmd_component, module_builder=None)
 
 
-def _create_asm_file(extension, ext_asm_file_name, ext_asm_file_path):
+def _create_asm_file(shard_cmp, shard_cmds, ext_asm_file_name, ext_asm_file_path):
     # check to see if any older assemblies have been loaded for this package
     ext_asm_full_file_name = make_canonical_name(ext_asm_file_name, ASSEMBLY_FILE_TYPE)
 
-    # this means that we currently have this package loaded and we're reloading a new version
-    is_reloading_pkg = _is_any_ext_asm_loaded(extension)
+    # this means that we currently have this shard loaded and we're reloading a new version
+    is_reloading_pkg = _is_any_ext_asm_loaded(shard_cmp)
 
     # create assembly
-    logger.debug('Building assembly for package: {}'.format(extension))
+    logger.debug('Building assembly for shard: {}'.format(shard_cmp))
     pyrvt_ver_int_tuple = PYREVIT_VERSION.as_int_tuple()
     win_asm_name = AssemblyName(Name=ext_asm_file_name, Version=Version(pyrvt_ver_int_tuple[0],
                                                                         pyrvt_ver_int_tuple[1],
@@ -84,9 +89,13 @@ def _create_asm_file(extension, ext_asm_file_name, ext_asm_file_path):
     logger.debug('Generated assembly file name for this package: {0}'.format(ext_asm_full_file_name))
 
     # get assembly builder
+    # assembly is saved into a staging folder first so other host instances never load a partially saved assembly
+    # staging folder is named by process id so it can be collected if this host instance crashes. see appdatagc
+    staging_dir = tempfile.mkdtemp(suffix='.{}.{}'.format(HOST_APP.proc_id, TEMP_FILE_EXT),
+                                   dir=op.dirname(ext_asm_file_path))
     asm_builder = AppDomain.CurrentDomain.DefineDynamicAssembly(win_asm_name,
                                                                 AssemblyBuilderAccess.RunAndSave,
-                                                                op.dirname(ext_asm_file_path))
+                                                                staging_dir)
 
     # get module builder
     module_builder = asm_builder.DefineDynamicModule(ext_asm_file_name, ext_asm_full_file_name)
@@ -97,74 +106,97 @@ def _create_asm_file(extension, ext_asm_file_name, ext_asm_file_path):
     make_shared_types(module_builder)
 
     # create command classes
-    for cmd_component in extension.get_all_commands():
+    for cmd_component in shard_cmds:
         # create command executor class for this command
         logger.debug('Creating types for command: {}'.format(cmd_component))
         make_cmd_types(cmd_component, module_builder)
 
-    # save final assembly
-    asm_builder.Save(ext_asm_full_file_name)
+    # save final assembly and move it into place
+    try:
+        asm_builder.Save(ext_asm_full_file_name)
+        replace_file(op.join(staging_dir, ext_asm_full_file_name), ext_asm_file_path)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
     load_asm_file(ext_asm_file_path)
 
     logger.debug('Executer assembly saved.')
     return ExtensionAssemblyInfo(ext_asm_file_name, ext_asm_file_path, is_reloading_pkg)
 
 
-def _produce_asm_file(extension):
-    # unique assembly filename for this package
-    ext_asm_fileid = _make_ext_asm_fileid(extension)
+def _load_asm_file(shard_cmds, ext_asm_file_name, ext_asm_file_path):
+    logger.debug('Extension assembly file already exists: {}'.format(ext_asm_file_path))
+    try:
+        loaded_assm = load_asm_file(ext_asm_file_path)
+        for asm_name in loaded_assm.GetReferencedAssemblies():
+            logger.debug('Checking referenced assembly: {}'.format(asm_name))
+            # base types are in the universal data folder
+            ref_asm_file_path = appdata.is_file_available(file_name=asm_name.Name, file_ext=ASSEMBLY_FILE_TYPE) \
+                or appdata.is_file_available(file_name=asm_name.Name, file_ext=ASSEMBLY_FILE_TYPE, universal=True)
+            if ref_asm_file_path:
+                logger.debug('Loading referenced assembly: {}'.format(ref_asm_file_path))
+                try:
+                    load_asm_file(ref_asm_file_path)
+                except Exception as load_err:
+                    logger.error('Error loading referenced assembly: {} | {}'.format(ref_asm_file_path, load_err))
+
+        _update_component_cmd_types(shard_cmds)
+        return ExtensionAssemblyInfo(ext_asm_file_name, ext_asm_file_path, False)
+    except Exception as ext_asm_load_err:
+        logger.error('Error loading extension assembly: {} | {}'.format(ext_asm_file_path, ext_asm_load_err))
+
+
+def _produce_asm_file(extension, shard_cmp, shard_cmds):
+    # unique assembly filename for this shard
+    ext_asm_fileid = _make_ext_asm_fileid(extension, shard_cmp, shard_cmds)
     ext_asm_file_path = appdata.get_data_file(file_id=ext_asm_fileid,
                                               file_ext=ASSEMBLY_FILE_TYPE)
     # make unique assembly name for this package
     ext_asm_file_name = get_file_name(ext_asm_file_path)
 
+    timer = Timer()
     if _is_pyrevit_ext_already_loaded(ext_asm_file_name):
         logger.debug('Extension assembly is already loaded: {}'.format(ext_asm_file_name))
-        _update_component_cmd_types(extension)
+        _update_component_cmd_types(shard_cmds)
+        cachestats.record_event(cachestats.ASM_LOADED, extension.name,
+                                entry_file=ext_asm_file_path, duration=timer.get_time())
         return ExtensionAssemblyInfo(ext_asm_file_name, ext_asm_file_path, True)
-    elif appdata.is_data_file_available(file_id=ext_asm_fileid, file_ext=ASSEMBLY_FILE_TYPE):
-        logger.debug('Extension assembly file already exists: {}'.format(ext_asm_file_path))
-        try:
-            loaded_assm = load_asm_file(ext_asm_file_path)
-            for asm_name in loaded_assm.GetReferencedAssemblies():
-                logger.debug('Checking referenced assembly: {}'.format(asm_name))
-                ref_asm_file_path = appdata.is_file_available(file_name=asm_name.Name, file_ext=ASSEMBLY_FILE_TYPE)
-                if ref_asm_file_path:
-                    logger.debug('Loading referenced assembly: {}'.format(ref_asm_file_path))
-                    try:
-                        load_asm_file(ref_asm_file_path)
-                    except Exception as load_err:
-                        logger.error('Error loading referenced assembly: {} | {}'.format(ref_asm_file_path, load_err))
-
-            _update_component_cmd_types(extension)
-            return ExtensionAssemblyInfo(ext_asm_file_name, ext_asm_file_path, False)
-        except Exception as ext_asm_load_err:
-            logger.error('Error loading extension assembly: {} | {}'.format(ext_asm_file_path, ext_asm_load_err))
-    else:
-        return _create_asm_file(extension, ext_asm_file_name, ext_asm_file_path)
+
+    # other host instances might be building the same assembly. first instance builds the assembly file and the others
+    # wait for it and load the assembly file
+    with FileLock(get_lock_file(ext_asm_file_path)):
+        if appdata.is_data_file_available(file_id=ext_asm_fileid, file_ext=ASSEMBLY_FILE_TYPE):
+            ext_asm_info = _load_asm_file(shard_cmds, ext_asm_file_name, ext_asm_file_path)
+            asm_event = cachestats.ASM_REUSED
+        else:
+            ext_asm_info = _create_asm_file(shard_cmp, shard_cmds, ext_asm_file_name, ext_asm_file_path)
+            asm_event = cachestats.ASM_EMITTED
+
+    cachestats.record_event(asm_event, extension.name, entry_file=ext_asm_file_path, duration=timer.get_time())
+    return ext_asm_info
 
 
 def create_assembly(extension):
-    """
+    """Creates or loads the assemblies of the given extension, one assembly per shard (see asmhash.get_asm_shards).
+    Assemblies of the unchanged shards are reused.
 
     Args:
         extension (pyrevit.extensions.components.Extension):
 
     Returns:
-
+        dict: {unique name of shard component (tab or panel): ExtensionAssemblyInfo}
+              or None if any of the assemblies can not be created
     """
     logger.debug('Creating assembly for extension: {}'.format(extension.name))
-    # create assembly file and return assembly file path to be used in UI creation
-    # try:
-    ext_asm_info = _produce_asm_file(extension)
-    logger.debug('Assembly created: {}'.format(ext_asm_info))
-    return ext_asm_info
-    # except Exception as asm_err:
-    #     logger.critical('Can not create assembly for: {} | {}'.format(extension, asm_err))
-
-
-def cleanup_assembly_files():
-    if get_revit_instance_count() == 1:
-        for asm_file_path in appdata.list_data_files(file_ext='dll'):
-            if not find_loaded_asm(asm_file_path, by_location=True):
-                appdata.garbage_data_file(asm_file_path)
+    # c# commands of all shards are compiled with one compiler invocation
+    prepare_cmd_types(extension.name, extension.get_all_commands())
+
+    # create assembly files and return assembly file paths to be used in UI creation
+    ext_asm_infos = {}
+    for shard_cmp, shard_cmds in get_asm_shards(extension):
+        ext_asm_info = _produce_asm_file(extension, shard_cmp, shard_cmds)
+        if not ext_asm_info:
+            logger.error('Can not create assembly for: {}'.format(shard_cmp))
+            return None
+        logger.debug('Assembly created: {}'.format(ext_asm_info))
+        ext_asm_infos[shard_cmp.unique_name] = ext_asm_info
+    return ext_asm_infos
@@ -2,9 +2,10 @@ import os
 import os.path as op
 import sys
 
-from pyrevit import PyRevitException
-from pyrevit.coreutils import make_canonical_name, find_loaded_asm, load_asm_file, calculate_dir_hash,\
+from pyrevit import HOST_APP, PyRevitException
+from pyrevit.coreutils import make_canonical_name, find_loaded_asm, load_asm_file, get_str_hash,\
                               find_type_by_name, read_source_file
+from pyrevit.coreutils.filelock import FileLock, get_lock_file, write_file_staged
 from pyrevit.coreutils.logger import get_logger
 from pyrevit.coreutils.dotnetcompiler import compile_csharp
 from pyrevit.versionmgr import PYREVIT_VERSION
@@ -12,6 +13,9 @@ import pyrevit.coreutils.appdata as appdata
 
 from pyrevit.loader import ASSEMBLY_FILE_TYPE, HASH_CUTOFF_LENGTH
 
+# noinspection PyUnresolvedReferences
+from System.Reflection import AssemblyName
+
 
 logger = get_logger(__name__)
 
@@ -41,19 +45,14 @@ LOADER_BASE_NAMESPACE = 'PyRevitBaseClasses'
 # template python command class
 CMD_EXECUTOR_TYPE_NAME = '{}.{}'.format(LOADER_BASE_NAMESPACE, 'PyRevitCommand')
 
+# template python command class that looks up its command data from the dispatch table. see loader.dispatcher
+CMD_DISPATCH_TYPE_NAME = '{}.{}'.format(LOADER_BASE_NAMESPACE, 'PyRevitDispatchCommand')
+
 # template python command availability class
 CMD_AVAIL_TYPE_NAME = make_canonical_name(LOADER_BASE_NAMESPACE, 'PyRevitCommandDefaultAvail')
 CMD_AVAIL_TYPE_NAME_CATEGORY = make_canonical_name(LOADER_BASE_NAMESPACE, 'PyRevitCommandCategoryAvail')
 CMD_AVAIL_TYPE_NAME_SELECTION = make_canonical_name(LOADER_BASE_NAMESPACE, 'PyRevitCommandSelectionAvail')
 
-source_file_filter = '(\.cs)'
-BASE_TYPES_DIR_HASH = calculate_dir_hash(INTERFACE_TYPES_DIR, '', source_file_filter)[:HASH_CUTOFF_LENGTH]
-BASE_TYPES_ASM_FILE_ID = '{}_{}'.format(BASE_TYPES_DIR_HASH, LOADER_BASE_NAMESPACE)
-BASE_TYPES_ASM_FILE = appdata.get_data_file(BASE_TYPES_ASM_FILE_ID, ASSEMBLY_FILE_TYPE)
-# taking the name of the generated data file and use it as assembly name
-BASE_TYPES_ASM_NAME = op.splitext(op.basename(BASE_TYPES_ASM_FILE))[0]
-logger.debug('Interface types assembly file is: {}'.format(BASE_TYPES_ASM_NAME))
-
 
 def _get_asm_attr_source():
     asm_att_source = """
@@ -133,45 +132,94 @@ def _get_references():
     return [_get_reference_file(ref_name) for ref_name in ref_list]
 
 
-def _generate_base_classes_asm():
+def _get_source_list():
     source_list = list()
     source_list.append(_get_asm_attr_source())
     for source_file in _get_source_files():
         source_list.append(read_source_file(source_file))
+    return source_list
+
+
+def _get_reference_version(ref_file):
+    try:
+        return str(AssemblyName.GetAssemblyName(ref_file).Version)
+    except Exception as ref_err:
+        logger.debug('Can not read reference assembly version: {} | {}'.format(ref_file, ref_err))
+        return None
 
+
+def get_base_types_hash(source_list, reference_versions, host_version):
+    """Returns the key of the compiled base types assembly.
+    Base types are compiled again when their source code, the versions of their referenced assemblies, or the host
+    version change. Compiled base types are shared by all sessions and host versions with the same key.
+
+    Args:
+        source_list (list): source code of the base types
+        reference_versions (list): list of (reference file name, assembly version)
+        host_version (str): host version e.g. '2016'
+
+    Returns:
+        str: hash value cut to loader.HASH_CUTOFF_LENGTH
+    """
+    source_hash = get_str_hash('\n'.join(source_list))
+    ref_items = ['{}:{}'.format(ref_name, ref_version) for ref_name, ref_version in reference_versions]
+    return get_str_hash('|'.join([source_hash, str(host_version)] + ref_items))[:HASH_CUTOFF_LENGTH]
+
+
+def _generate_base_classes_asm(source_list, reference_list, asm_file, compile_func=compile_csharp):
     # now try to compile
     try:
-        logger.debug('Compiling base types to: {}'.format(BASE_TYPES_ASM_FILE))
-        # compile_csharp(source_list, BASE_TYPES_ASM_FILE,
+        logger.debug('Compiling base types to: {}'.format(asm_file))
+        # compile_csharp(source_list, asm_file,
         #                reference_list=_get_references(), resource_list=[_get_resource_file('python_27_lib.zip')])
-        compile_csharp(source_list, BASE_TYPES_ASM_FILE,
-                       reference_list=_get_references())
-        return load_asm_file(BASE_TYPES_ASM_FILE)
+        # other sessions might be loading the compiled base types. assembly is moved into place when complete.
+        # compiler names the assembly after its file so it's compiled under its final name.
+        write_file_staged(asm_file, lambda staged_file: compile_func(source_list, staged_file,
+                                                                     reference_list=reference_list))
+        return load_asm_file(asm_file)
 
     except PyRevitException as compile_err:
         logger.critical('Can not compile base types code into assembly. | {}'.format(compile_err))
         raise compile_err
 
 
-def _get_base_classes_asm():
-    if appdata.is_data_file_available(file_id=BASE_TYPES_ASM_FILE_ID, file_ext=ASSEMBLY_FILE_TYPE):
-        return load_asm_file(BASE_TYPES_ASM_FILE)
-    else:
-        return _generate_base_classes_asm()
+def _get_base_classes_asm(source_list, reference_list, asm_file, compile_func=compile_csharp):
+    # other host instances might be compiling the same base types
+    with FileLock(get_lock_file(asm_file)):
+        if op.exists(asm_file):
+            logger.debug('Reusing compiled base types: {}'.format(asm_file))
+            return load_asm_file(asm_file)
+        else:
+            return _generate_base_classes_asm(source_list, reference_list, asm_file, compile_func=compile_func)
 
 
 # compile or load the base types assembly ------------------------------------------------------------------------------
+BASE_TYPES_SOURCE_LIST = _get_source_list()
+BASE_TYPES_REFERENCES = _get_references()
+BASE_TYPES_DIR_HASH = get_base_types_hash(BASE_TYPES_SOURCE_LIST,
+                                          [(op.basename(x), _get_reference_version(x))
+                                           for x in BASE_TYPES_REFERENCES if x],
+                                          HOST_APP.version)
+BASE_TYPES_ASM_FILE_ID = '{}_{}'.format(BASE_TYPES_DIR_HASH, LOADER_BASE_NAMESPACE)
+# compiled base types are shared between host versions, keyed by the host version. see get_base_types_hash()
+# assembly is kept in the roaming folder of the user since it's loaded into the host and must not be writable by others
+BASE_TYPES_ASM_FILE = appdata.get_universal_data_file(BASE_TYPES_ASM_FILE_ID, ASSEMBLY_FILE_TYPE)
+# taking the name of the generated data file and use it as assembly name
+BASE_TYPES_ASM_NAME = op.splitext(op.basename(BASE_TYPES_ASM_FILE))[0]
+logger.debug('Interface types assembly file is: {}'.format(BASE_TYPES_ASM_NAME))
+
 # see it the assembly is already loaded
 BASE_TYPES_ASM = None
 assm_list = find_loaded_asm(BASE_TYPES_ASM_NAME)
 if assm_list:
     BASE_TYPES_ASM = assm_list[0]
 else:
-    # else, let's generate the assembly and load it
-    BASE_TYPES_ASM = _get_base_classes_asm()
+    # else, let's generate the assembly or load the compiled one
+    BASE_TYPES_ASM = _get_base_classes_asm(BASE_TYPES_SOURCE_LIST, BASE_TYPES_REFERENCES, BASE_TYPES_ASM_FILE)
 
 
 CMD_EXECUTOR_TYPE = find_type_by_name(BASE_TYPES_ASM, CMD_EXECUTOR_TYPE_NAME)
+CMD_DISPATCH_TYPE = find_type_by_name(BASE_TYPES_ASM, CMD_DISPATCH_TYPE_NAME)
 CMD_AVAIL_TYPE = find_type_by_name(BASE_TYPES_ASM, CMD_AVAIL_TYPE_NAME)
 CMD_AVAIL_TYPE_CATEGORY = find_type_by_name(BASE_TYPES_ASM, CMD_AVAIL_TYPE_NAME_CATEGORY)
 CMD_AVAIL_TYPE_SELECTION = find_type_by_name(BASE_TYPES_ASM, CMD_AVAIL_TYPE_NAME_SELECTION)
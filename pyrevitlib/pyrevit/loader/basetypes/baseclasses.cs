@@ -84,6 +84,30 @@ namespace PyRevitBaseClasses
     }
 
 
+    [Regeneration(RegenerationOption.Manual)]
+    [Transaction(TransactionMode.Manual)]
+    public abstract class PyRevitDispatchCommand : PyRevitCommand
+    {
+        // name of the dispatch table in AppDomain data. see pyrevit.loader.dispatcher
+        public const string DispatchTableName = "pyRevit_dispatchtable";
+
+        // command types derived from this class are only stubs named by the command unique name.
+        // command data is looked up from the dispatch table by the name of the stub type when the command is run.
+        public PyRevitDispatchCommand() : base("", "", "", "")
+        {
+            var dispatchTable = AppDomain.CurrentDomain.GetData(DispatchTableName) as IDictionary<string, string[]>;
+            string[] cmdData;
+            if (dispatchTable != null && dispatchTable.TryGetValue(GetType().Name, out cmdData))
+            {
+                _scriptSource = cmdData[0];
+                _alternateScriptSource = cmdData[1];
+                _syspaths = cmdData[2];
+                _cmdName = cmdData[3];
+            }
+        }
+    }
+
+
     public abstract class PyRevitCommandCategoryAvail : IExternalCommandAvailability
     {
         public string _categoryName = "";
@@ -1,11 +1,17 @@
+import os.path as op
+import re
+
 from pyrevit import PyRevitException
 from pyrevit.coreutils import find_loaded_asm, read_source_file, get_str_hash
 from pyrevit.coreutils import create_type, load_asm_file, create_ext_command_attrs
+from pyrevit.coreutils.filelock import FileLock, get_lock_file, write_file_staged
 from pyrevit.coreutils.logger import get_logger
-from pyrevit.coreutils.dotnetcompiler import compile_csharp
+from pyrevit.coreutils.dotnetcompiler import compile_csharp, PyRevitCompileError
+from pyrevit.extensions import CSHARP_LANG
 
 from pyrevit.loader import ASSEMBLY_FILE_TYPE, HASH_CUTOFF_LENGTH
 from pyrevit.loader.basetypes import _get_references
+from pyrevit.loader.asmhash import get_csharp_batch_hash
 
 import pyrevit.coreutils.appdata as appdata
 
@@ -16,6 +22,168 @@ from Autodesk.Revit.UI import IExternalCommand, IExternalCommandAvailability
 logger = get_logger(__name__)
 
 
+# c# scripts of a batch are compiled into one assembly. each script is wrapped in its own namespace under this
+CSHARP_BATCH_NAMESPACE = 'PyRevitCSharpBatch'
+CSHARP_BATCH_POSTFIX = 'csharp'
+
+# these can only be declared at the top level of a file and not inside the batch namespace of the script
+CSHARP_TOPLEVEL_FINDER = re.compile(r'^\s*(extern\s+alias\b|global\s+using\b|\[\s*(assembly|module)\s*:)',
+                                    flags=re.MULTILINE)
+CSHARP_NAMESPACE_FINDER = re.compile(r'^\s*namespace\s+[\w.]+\s*(;|{|$)')
+CSHARP_USING_FINDER = re.compile(r'^\s*using\s+(static\s+)?[\w.]+\s*(=\s*[^;]+)?;')
+
+# batch assemblies of compiled commands {command unique name: batch assembly}. see compile_csharp_batch()
+_batch_asms = {}
+
+
+def _get_batch_namespace(cmd_component):
+    # unique names might start with a digit which is not valid for c# identifiers
+    return '{}._{}'.format(CSHARP_BATCH_NAMESPACE, cmd_component.unique_name)
+
+
+def _is_in_namespace(type_namespace, namespace):
+    # types might be in sub namespaces defined by the script
+    return type_namespace == namespace or type_namespace.startswith(namespace + '.')
+
+
+def _can_batch(source):
+    """Returns False if the script has declarations that can not be wrapped in its batch namespace:
+    extern aliases, global usings, assembly or module attributes, file-scoped namespaces, and using directives
+    after a namespace declaration at the top level of the script.
+    """
+    if CSHARP_TOPLEVEL_FINDER.search(source):
+        return False
+
+    depth = 0
+    namespace_declared = False
+    for line in source.splitlines():
+        # braces in comments do not change the depth
+        line = line.split('//')[0]
+        if depth == 0:
+            namespace_match = CSHARP_NAMESPACE_FINDER.match(line)
+            if namespace_match:
+                if namespace_match.group(1) == ';':
+                    return False
+                namespace_declared = True
+            elif namespace_declared and CSHARP_USING_FINDER.match(line):
+                return False
+        depth += line.count('{') - line.count('}')
+    return True
+
+
+def _make_batch_source(cmd_component, source):
+    # line directive makes the compiler report errors by the script file and its own line numbers
+    return 'namespace {} {{\n#line 1 "{}"\n{}\n#line default\n}}\n'.format(_get_batch_namespace(cmd_component),
+                                                                          cmd_component.get_full_script_address(),
+                                                                          source)
+
+
+def _attribute_errors(errors, batch):
+    """Maps the compile errors to the commands of the batch by their script file.
+
+    Args:
+        errors (list): list of (file name, line, error text). see dotnetcompiler.PyRevitCompileError
+        batch (list): list of (command, source) in the batch
+
+    Returns:
+        dict: {command unique name: list of errors} or None if any of the errors can not be mapped to a command
+    """
+    cmds_by_file = dict((op.normcase(cmd.get_full_script_address()), cmd) for cmd, _ in batch)
+    cmd_errors = {}
+    for error in errors:
+        cmd_component = cmds_by_file.get(op.normcase(error[0] or ''))
+        if not cmd_component:
+            return None
+        cmd_errors.setdefault(cmd_component.unique_name, []).append(error)
+    return cmd_errors
+
+
+def _compile_batch(batch, batch_file, compile_func):
+    def _compile_into(staged_file):
+        while True:
+            try:
+                compile_func([_make_batch_source(cmd, source) for cmd, source in batch], staged_file,
+                             reference_list=_get_references())
+                return
+            except PyRevitCompileError as compile_err:
+                cmd_errors = _attribute_errors(compile_err.errors, batch)
+                if not cmd_errors or len(cmd_errors) == len(batch):
+                    raise
+                # commands with errors are compiled on their own later and report their errors there
+                for cmd_name, errors in cmd_errors.items():
+                    logger.debug('Excluding command from c# batch: {} | {}'.format(cmd_name, errors))
+                batch[:] = [x for x in batch if x[0].unique_name not in cmd_errors]
+
+    logger.debug('Compiling c# batch of {} commands to: {}'.format(len(batch), batch_file))
+    # compiler names the assembly after its file so it's compiled under its final name
+    write_file_staged(batch_file, _compile_into)
+    return load_asm_file(batch_file)
+
+
+def compile_csharp_batch(batch_name, cmd_components, compile_func=compile_csharp):
+    """Compiles the c# scripts of the given commands into one assembly with one compiler invocation.
+    Batch assembly is named by the hash of the scripts so it's only compiled again if any of the scripts change.
+    Commands with compile errors are excluded from the batch and are compiled on their own when their types
+    are created (see create_csharp_types).
+
+    Args:
+        batch_name (str): name of the batch e.g. extension name
+        cmd_components (list): list of commands. commands that are not c# are skipped.
+        compile_func (function): compiler function. see dotnetcompiler.compile_csharp()
+
+    Returns:
+        list: unique names of the commands that are compiled into the batch assembly
+    """
+    batch = []
+    for cmd_component in cmd_components:
+        if cmd_component.script_file and cmd_component.script_language == CSHARP_LANG:
+            _batch_asms.pop(cmd_component.unique_name, None)
+            try:
+                source = read_source_file(cmd_component.get_full_script_address())
+            except PyRevitException as read_err:
+                logger.debug('Excluding command from c# batch: {} | {}'.format(cmd_component, read_err))
+                continue
+            # these scripts would fail the batch compile and are compiled on their own instead
+            if _can_batch(source):
+                batch.append((cmd_component, source))
+            else:
+                logger.debug('Excluding command from c# batch: {} | Script has top-level only declarations.'
+                             .format(cmd_component))
+
+    if not batch:
+        return []
+
+    batch_file_id = '{}_{}_{}'.format(get_csharp_batch_hash(batch), batch_name, CSHARP_BATCH_POSTFIX)
+
+    batch_file = appdata.get_data_file(file_id=batch_file_id, file_ext=ASSEMBLY_FILE_TYPE)
+    batch_asm_list = find_loaded_asm(op.splitext(op.basename(batch_file))[0])
+    if batch_asm_list:
+        batch_asm = batch_asm_list[0]
+    else:
+        # other host instances might be compiling the same batch
+        with FileLock(get_lock_file(batch_file)):
+            if op.exists(batch_file):
+                batch_asm = load_asm_file(batch_file)
+            else:
+                try:
+                    batch_asm = _compile_batch(batch, batch_file, compile_func)
+                except PyRevitException as compile_err:
+                    logger.debug('Can not compile c# batch: {} | {}'.format(batch_name, compile_err))
+                    return []
+
+    # commands that were excluded from the batch do not have any types in the batch assembly
+    batch_namespaces = set(str(x.Namespace) for x in batch_asm.GetTypes())
+    batch_cmds = []
+    for cmd_component, _ in batch:
+        cmd_namespace = _get_batch_namespace(cmd_component)
+        if any(_is_in_namespace(x, cmd_namespace) for x in batch_namespaces):
+            _batch_asms[cmd_component.unique_name] = batch_asm
+            batch_cmds.append(cmd_component.unique_name)
+
+    logger.debug('Commands compiled in c# batch: {} | {}'.format(batch_name, batch_cmds))
+    return batch_cmds
+
+
 def _get_csharp_cmd_asm(cmd_component):
     """
 
@@ -25,6 +193,10 @@ def _get_csharp_cmd_asm(cmd_component):
     Returns:
 
     """
+    # commands compiled in a batch. see compile_csharp_batch()
+    if cmd_component.unique_name in _batch_asms:
+        return _batch_asms[cmd_component.unique_name]
+
     source = read_source_file(cmd_component.get_full_script_address())
     script_hash = get_str_hash(source)[:HASH_CUTOFF_LENGTH]
 
@@ -47,10 +219,16 @@ def _get_csharp_cmd_asm(cmd_component):
     return load_asm_file(compiled_assm_path)
 
 
-def _verify_command_interfaces(compiled_assm):
+def _verify_command_interfaces(compiled_assm, cmd_component):
     iextcmd = iextcmd_avail = None
 
-    for compiled_type in compiled_assm.GetTypes():
+    compiled_types = compiled_assm.GetTypes()
+    # batch assemblies include the types of other commands too
+    if cmd_component.unique_name in _batch_asms:
+        cmd_namespace = _get_batch_namespace(cmd_component)
+        compiled_types = [x for x in compiled_types if _is_in_namespace(str(x.Namespace), cmd_namespace)]
+
+    for compiled_type in compiled_types:
         if IExternalCommand in compiled_type.GetInterfaces():
             iextcmd = compiled_type
         elif IExternalCommandAvailability in compiled_type.GetInterfaces():
@@ -63,7 +241,7 @@ def _make_csharp_types(module_builder, cmd_component):
 
     compiled_assm = _get_csharp_cmd_asm(cmd_component)
 
-    iext_cmd, iext_cmd_avail = _verify_command_interfaces(compiled_assm)
+    iext_cmd, iext_cmd_avail = _verify_command_interfaces(compiled_assm, cmd_component)
 
     if iext_cmd:
         create_type(module_builder, iext_cmd, cmd_component.unique_name, create_ext_command_attrs())
@@ -83,7 +261,7 @@ def create_csharp_types(cmd_component, module_builder=None):
         _make_csharp_types(module_builder, cmd_component)
     else:
         compiled_assm = _get_csharp_cmd_asm(cmd_component)
-        iext_cmd, iext_cmd_avail = _verify_command_interfaces(compiled_assm)
+        iext_cmd, iext_cmd_avail = _verify_command_interfaces(compiled_assm, cmd_component)
         if iext_cmd:
             cmd_component.class_name = cmd_component.unique_name
         if iext_cmd_avail:
@@ -1,7 +1,8 @@
-from pyrevit.coreutils import create_type, create_ext_command_attrs, join_strings
+from pyrevit.coreutils import create_type, create_ext_command_attrs
 from pyrevit.coreutils.logger import get_logger
 
-from pyrevit.loader.basetypes import CMD_EXECUTOR_TYPE, CMD_AVAIL_TYPE_SELECTION, CMD_AVAIL_TYPE_CATEGORY
+from pyrevit.loader.basetypes import CMD_DISPATCH_TYPE, CMD_AVAIL_TYPE_SELECTION, CMD_AVAIL_TYPE_CATEGORY
+from pyrevit.loader.dispatcher import register_commands
 
 
 logger = get_logger(__name__)
@@ -39,12 +40,8 @@ def _make_python_types(module_builder, cmd_component):
     """
     logger.debug('Creating executor type for: {}'.format(cmd_component))
 
-    create_type(module_builder, CMD_EXECUTOR_TYPE, cmd_component.unique_name,
-                create_ext_command_attrs(),
-                cmd_component.get_full_script_address(),
-                cmd_component.get_full_config_script_address(),
-                join_strings(cmd_component.get_search_paths()),
-                cmd_component.name)
+    # executor type is only a stub named by the command unique name. command data is in the dispatch table
+    create_type(module_builder, CMD_DISPATCH_TYPE, cmd_component.unique_name, create_ext_command_attrs())
 
     logger.debug('Successfully created executor type for: {}'.format(cmd_component))
     cmd_component.class_name = cmd_component.unique_name
@@ -61,6 +58,8 @@ def _make_python_types(module_builder, cmd_component):
 
 
 def create_python_types(cmd_component, module_builder=None):
+    # command data is updated even if the types are already emitted. see loader.dispatcher
+    register_commands([cmd_component])
     if module_builder:
         _make_python_types(module_builder, cmd_component)
     else:
@@ -5,7 +5,7 @@ from pyrevit.extensions import PYTHON_LANG, CSHARP_LANG
 
 from pyrevit.loader.basetypes import CMD_AVAIL_TYPE, CMD_AVAIL_TYPE_NAME
 from pyrevit.loader.basetypes.pythontypemaker import create_python_types
-from pyrevit.loader.basetypes.csharptypemaker import create_csharp_types
+from pyrevit.loader.basetypes.csharptypemaker import create_csharp_types, compile_csharp_batch
 
 
 logger = get_logger(__name__)
@@ -41,5 +41,19 @@ def make_cmd_types(cmd_component, module_builder=None):
         logger.error('Can not determine script language for: {}'.format(cmd_component))
 
 
+def prepare_cmd_types(batch_name, cmd_components):
+    """Compiles the c# scripts of the given commands in one batch before their types are created.
+
+    Args:
+        batch_name (str): name of the batch e.g. extension name
+        cmd_components (list): list of pyrevit.extensions.genericcomps.GenericUICommand
+    """
+    try:
+        compile_csharp_batch(batch_name, cmd_components)
+    except Exception as batch_err:
+        # commands are compiled on their own when their types are created
+        logger.error('Error compiling c# commands in batch: {} | {}'.format(batch_name, batch_err))
+
+
 def make_shared_types(module_builder=None):
     create_type(module_builder, CMD_AVAIL_TYPE, CMD_AVAIL_TYPE_NAME, [])
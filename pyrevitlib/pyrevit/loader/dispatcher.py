@@ -0,0 +1,73 @@
+"""
+Dispatch table of the python commands.
+Python commands are emitted as stub types that are derived from the PyRevitDispatchCommand base type (see
+pyrevit.loader.basetypes.pythontypemaker). Stubs do not include any command data and are only named by the command
+unique name, since each ribbon button needs its own command type. When a button is clicked, its stub type looks up
+the command data (script, config script, search paths, and command name) from the dispatch table by its type name.
+
+Dispatch table is kept in AppDomain data so it's shared between script engines, and it's updated on every session
+load. Changing the command data of a bundle does not need a new assembly anymore.
+
+Example:
+    >>> from pyrevit.loader import dispatcher
+    >>> dispatcher.register_commands(extension.get_all_commands())
+"""
+
+from pyrevit.coreutils import join_strings
+from pyrevit.coreutils.logger import get_logger
+
+# noinspection PyUnresolvedReferences
+from System import AppDomain, Array
+# noinspection PyUnresolvedReferences
+from System.Collections.Generic import Dictionary
+
+
+logger = get_logger(__name__)
+
+
+# name of the dispatch table in AppDomain data. must match PyRevitDispatchCommand.DispatchTableName in baseclasses.cs
+DISPATCH_TABLE_NAME = 'pyRevit_dispatchtable'
+
+
+def make_dispatch_data(cmd_component):
+    """Returns the data the dispatcher base type needs to run the given command.
+
+    Args:
+        cmd_component (pyrevit.extensions.genericcomps.GenericUICommand): command component
+
+    Returns:
+        list: [script file, config script file, search paths, command name] in the order of
+              PyRevitCommand constructor arguments
+    """
+    return [cmd_component.get_full_script_address(),
+            cmd_component.get_full_config_script_address(),
+            join_strings(cmd_component.get_search_paths()),
+            cmd_component.name]
+
+
+def get_dispatch_table():
+    """Returns the dispatch table of the current AppDomain. Table is created on first call.
+
+    Returns:
+        System.Collections.Generic.Dictionary[str, Array[str]]: {command unique name: dispatch data}
+    """
+    dispatch_table = AppDomain.CurrentDomain.GetData(DISPATCH_TABLE_NAME)
+    if dispatch_table is None:
+        dispatch_table = Dictionary[str, Array[str]]()
+        AppDomain.CurrentDomain.SetData(DISPATCH_TABLE_NAME, dispatch_table)
+    return dispatch_table
+
+
+def register_commands(cmd_components, dispatch_table=None):
+    """Adds or updates the dispatch data of the given commands.
+
+    Args:
+        cmd_components (list): list of pyrevit.extensions.genericcomps.GenericUICommand
+        dispatch_table (dict): dispatch table. defaults to the table of the current AppDomain (see get_dispatch_table)
+    """
+    if dispatch_table is None:
+        dispatch_table = get_dispatch_table()
+
+    for cmd_component in cmd_components:
+        logger.debug('Registering command for dispatch: {}'.format(cmd_component))
+        dispatch_table[cmd_component.unique_name] = Array[str](make_dispatch_data(cmd_component))
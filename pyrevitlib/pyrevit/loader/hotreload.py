@@ -0,0 +1,165 @@
+"""
+Hot reloads the changed bundles of the installed ui extensions during a session.
+When enabled (user_config.core.hotreload) the extension root directories are watched for changes by .net file
+system watchers, or polled if these are not available (see pyrevit.extensions.watcher). Once the changes to an
+extension settle, only its changed bundles are re-parsed, their cache entries are updated and their ribbon items are
+updated. Ribbon can only be changed on Revit's main thread so the changes are queued by the watcher thread and
+applied when Revit is idle.
+
+Removing bundles or extensions is not hot reloaded since their ribbon items can not be cleaned up partially.
+A full reload (see pyrevit.loader.sessionmgr.load_session) is still needed for these.
+"""
+
+import os.path as op
+import threading
+
+from pyrevit import HOST_APP, PYREVIT_ADDON_NAME
+from pyrevit.coreutils.logger import get_logger
+from pyrevit.coreutils.envvars import get_pyrevit_env_var, set_pyrevit_env_var
+from pyrevit.userconfig import user_config
+
+from pyrevit.extensions.extensionmgr import get_updated_ui_extension
+from pyrevit.extensions.watcher import ExtensionWatcher
+from pyrevit.extensions.cmpregistry import get_registry
+
+from pyrevit.loader.asmmaker import create_assembly
+from pyrevit.loader.uimaker import update_pyrevit_ui
+
+
+logger = get_logger(__name__)
+
+
+# hot reloader of the current session is shared between script engines so the next session can stop it
+HOT_RELOADER_ISC_NAME = PYREVIT_ADDON_NAME + '_hotreloaderISC'
+
+
+class _HotReloader(object):
+    def __init__(self, root_dirs):
+        self._pending_changes = {}
+        self._pending_lock = threading.Lock()
+        self._watcher = ExtensionWatcher(root_dirs, self._queue_changes)
+        self._fs_watchers = []
+
+    def _queue_changes(self, changes):
+        # called on the watcher thread
+        with self._pending_lock:
+            for ext_dir, changed_dirs in changes.items():
+                ext_changed_dirs = self._pending_changes.setdefault(ext_dir, [])
+                ext_changed_dirs.extend(x for x in changed_dirs if x not in ext_changed_dirs)
+
+    def _apply_changes(self, sender, args):
+        # called on Revit's main thread when Revit is idle
+        with self._pending_lock:
+            if not self._pending_changes:
+                return
+            changes = self._pending_changes
+            self._pending_changes = {}
+
+        for ext_dir, changed_dirs in sorted(changes.items()):
+            try:
+                _reload_extension(ext_dir, changed_dirs)
+            except Exception as reload_err:
+                logger.error('Error hot reloading extension: {} | {}'.format(ext_dir, reload_err))
+
+    def _notify_watcher(self, sender, args):
+        # called on file system watcher threads
+        self._watcher.notify(args.FullPath)
+
+    def _notify_watcher_renamed(self, sender, args):
+        self._watcher.notify(args.OldFullPath)
+        self._watcher.notify(args.FullPath)
+
+    def _notify_watcher_error(self, sender, args):
+        # file system watcher might have missed changes (e.g. its buffer has overflowed). checking all extensions.
+        logger.debug('File system watcher error. Checking all extensions. | {}'.format(args.GetException()))
+        self._watcher.notify()
+
+    def _start_fs_watchers(self):
+        """Starts .net file system watchers that report the changed paths to the watcher.
+
+        Returns:
+            bool: True if all existing root directories are watched so the watcher does not need to poll
+        """
+        try:
+            # noinspection PyUnresolvedReferences
+            from System.IO import FileSystemWatcher
+            for root_dir in self._watcher.root_dirs:
+                if op.isdir(root_dir):
+                    fs_watcher = FileSystemWatcher(root_dir)
+                    fs_watcher.IncludeSubdirectories = True
+                    fs_watcher.Changed += self._notify_watcher
+                    fs_watcher.Created += self._notify_watcher
+                    fs_watcher.Deleted += self._notify_watcher
+                    fs_watcher.Renamed += self._notify_watcher_renamed
+                    fs_watcher.Error += self._notify_watcher_error
+                    fs_watcher.EnableRaisingEvents = True
+                    self._fs_watchers.append(fs_watcher)
+            return True
+        except Exception as fs_watcher_err:
+            logger.debug('File system watchers are not available. Polling for changes. | {}'.format(fs_watcher_err))
+            return False
+
+    def start(self):
+        HOST_APP.uiapp.Idling += self._apply_changes
+        # directories are only polled if file system watchers can not report the changes
+        self._watcher.polling = not self._start_fs_watchers()
+        self._watcher.start()
+
+    def stop(self):
+        self._watcher.stop()
+        for fs_watcher in self._fs_watchers:
+            fs_watcher.EnableRaisingEvents = False
+            fs_watcher.Dispose()
+        self._fs_watchers = []
+        HOST_APP.uiapp.Idling -= self._apply_changes
+
+
+def _reload_extension(ext_dir, changed_dirs):
+    removed_dirs = [x for x in changed_dirs if not op.exists(x)]
+    if removed_dirs:
+        logger.warning('Bundles have been removed. Reload pyRevit to update the ui: {}'.format(removed_dirs))
+        return
+
+    ui_ext = get_updated_ui_extension(ext_dir)
+    if not ui_ext:
+        return
+
+    ext_asm_infos = create_assembly(ui_ext)
+    if ext_asm_infos is None:
+        logger.error('Failed to create assembly for: {}'.format(ui_ext))
+        return
+
+    update_pyrevit_ui(ui_ext, ext_asm_infos, changed_dirs=changed_dirs)
+
+    cmp_registry = get_registry()
+    if cmp_registry:
+        cmp_registry.register_extension(ui_ext)
+    logger.info('Hot reloaded changed bundles of: {}'.format(ui_ext.name))
+
+
+def is_hot_reload_enabled():
+    try:
+        return user_config.core.hotreload
+    except AttributeError:
+        user_config.core.hotreload = False
+        user_config.save_changes()
+        return False
+
+
+def stop_hot_reload():
+    """Stops the hot reloader of the current session (possibly started by another script engine)."""
+    hot_reloader = get_pyrevit_env_var(HOT_RELOADER_ISC_NAME)
+    if hot_reloader:
+        logger.debug('Stopping hot reloader.')
+        hot_reloader.stop()
+        set_pyrevit_env_var(HOT_RELOADER_ISC_NAME, False)
+
+
+def start_hot_reload():
+    """Starts watching the installed extensions for changes if hot reload is enabled by user configuration."""
+    stop_hot_reload()
+    if is_hot_reload_enabled():
+        logger.debug('Starting hot reloader.')
+        hot_reloader = _HotReloader(user_config.get_ext_root_dirs())
+        hot_reloader.start()
+        set_pyrevit_env_var(HOT_RELOADER_ISC_NAME, hot_reloader)
@@ -10,16 +10,19 @@ import clr
 from pyrevit import HOME_DIR, EXEC_PARAMS, FIRST_LOAD, HOST_APP
 from pyrevit.coreutils import Timer
 from pyrevit.coreutils.logger import get_logger, stdout_hndlr
-from pyrevit.coreutils.appdata import cleanup_appdata_folder
+from pyrevit.coreutils.appdatagc import start_collector
 
 from pyrevit.versionmgr import PYREVIT_VERSION
 from pyrevit.userconfig import user_config
 
 from pyrevit.extensions.extensionmgr import get_installed_ui_extensions
+from pyrevit.extensions.cachestats import get_session_stats, save_session_stats
+from pyrevit.extensions.cmpregistry import ComponentRegistry, set_registry
 
 from pyrevit.loader.basetypes import BASE_TYPES_ASM, LOADER_BASE_NAMESPACE, BASE_TYPES_ASM_NAME
-from pyrevit.loader.asmmaker import create_assembly, cleanup_assembly_files
+from pyrevit.loader.asmmaker import create_assembly
 from pyrevit.loader.uimaker import update_pyrevit_ui, cleanup_pyrevit_ui
+from pyrevit.loader.hotreload import start_hot_reload, stop_hot_reload
 
 # noinspection PyUnresolvedReferences
 from System.Diagnostics import Process
@@ -64,37 +67,55 @@ def _perform_onsessionload_ops():
     if FIRST_LOAD:
         _setup_output_window()
 
+    # stop watching extensions for changes while the session is reloading
+    stop_hot_reload()
+
     # once pre-load is complete, report environment conditions
     _report_env()
 
 
 def _perform_onsessionloadcomplete_ops():
-    # cleanup old assembly files. asmmaker.cleanup_assembly_files() will take care of that
-    cleanup_assembly_files()
+    # keep statistics of cache decisions made while loading this session
+    logger.debug('Cache statistics: {}'.format(get_session_stats().counters))
+    try:
+        save_session_stats()
+    except Exception as stats_err:
+        logger.debug(stats_err)
+
+    # cleanup old assembly files and temporary files of previous sessions on a background thread.
+    # see coreutils.appdatagc
+    start_collector()
 
-    # appdata might include temporary files that need to be cleaned up between sessions.
-    cleanup_appdata_folder()
+    # watch extensions for changes and hot reload the changed bundles (if enabled)
+    start_hot_reload()
 
 
 def _new_session():
+    # components of the loaded extensions are registered so scripts can find them without parsing. see cmpregistry
+    cmp_registry = ComponentRegistry()
+
     # get all installed extensions (UI extension only)
     # for every extension of installed extensions, create an assembly, and create a ui
     for ui_ext in get_installed_ui_extensions():
         # create a dll assembly and get assembly info
-        ext_asm_info = create_assembly(ui_ext)
-        if not ext_asm_info:
+        ext_asm_infos = create_assembly(ui_ext)
+        if ext_asm_infos is None:
             logger.critical('Failed to create assembly for: {}'.format(ui_ext))
             continue
 
         logger.info('Extension assembly created: {}'.format(ui_ext.name))
+        # assembly maker sets the class names of the commands
+        cmp_registry.register_extension(ui_ext)
 
         # update/create ui (needs the assembly to link button actions to commands saved in the dll)
-        update_pyrevit_ui(ui_ext, ext_asm_info)
+        update_pyrevit_ui(ui_ext, ext_asm_infos)
         logger.info('UI created for extension: {}'.format(ui_ext.name))
 
     # cleanup existing UI. This is primarily for cleanups after reloading
     cleanup_pyrevit_ui()
 
+    set_registry(cmp_registry)
+
 
 def load_session():
     """Handles loading/reloading of the pyRevit addin and extensions.
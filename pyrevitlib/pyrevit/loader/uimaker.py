@@ -1,4 +1,5 @@
 import imp
+import os.path as op
 
 from pyrevit import HOST_APP, EXEC_PARAMS, PyRevitException
 from pyrevit.coreutils import find_loaded_asm
@@ -77,7 +78,8 @@ def _produce_ui_separator(ui_maker_params):
     parent_ui_item = ui_maker_params.parent_ui
     ext_asm_info = ui_maker_params.asm_info
 
-    if not ext_asm_info.reloading:
+    # containers without commands do not have an assembly shard
+    if not (ext_asm_info and ext_asm_info.reloading):
         logger.debug('Adding separator to: {}'.format(parent_ui_item))
         try:
             parent_ui_item.add_separator()
@@ -96,7 +98,8 @@ def _produce_ui_slideout(ui_maker_params):
     parent_ui_item = ui_maker_params.parent_ui
     ext_asm_info = ui_maker_params.asm_info
 
-    if not ext_asm_info.reloading:
+    # containers without commands do not have an assembly shard
+    if not (ext_asm_info and ext_asm_info.reloading):
         logger.debug('Adding slide out to: {}'.format(parent_ui_item))
         try:
             parent_ui_item.add_slideout()
@@ -372,28 +375,51 @@ _component_creation_dict = {TAB_POSTFIX: _produce_ui_tab,
                             }
 
 
-def _recursively_produce_ui_items(parent_ui_item, component, ext_asm_info):
+def _is_changed_component(component, changed_dirs):
+    # separators and slide-outs do not have a directory and are not updated when reloading
+    cmp_dir = getattr(component, 'directory', None)
+    if not cmp_dir:
+        return False
+    for changed_dir in changed_dirs:
+        # component has changed or includes a changed component
+        if changed_dir == cmp_dir or changed_dir.startswith(cmp_dir + op.sep):
+            return True
+    return False
+
+
+def _recursively_produce_ui_items(parent_ui_item, component, ext_asm_info, changed_dirs=None, shard_asm_infos=None):
     for sub_cmp in component:
+        if changed_dirs is not None and not _is_changed_component(sub_cmp, changed_dirs):
+            logger.debug('Skipping unchanged component: {}'.format(sub_cmp))
+            continue
+
+        # commands of each tab (or panel) are in their own assembly shard. see asmmaker.create_assembly()
+        sub_asm_info = ext_asm_info
+        if shard_asm_infos:
+            sub_asm_info = shard_asm_infos.get(getattr(sub_cmp, 'unique_name', None), ext_asm_info)
+
         try:
             logger.debug('Calling create func {} for: {}'.format(_component_creation_dict[sub_cmp.type_id], sub_cmp))
-            ui_item = _component_creation_dict[sub_cmp.type_id](UIMakerParams(parent_ui_item, sub_cmp, ext_asm_info))
+            ui_item = _component_creation_dict[sub_cmp.type_id](UIMakerParams(parent_ui_item, sub_cmp, sub_asm_info))
         except KeyError:
             logger.debug('Can not find create function for: {}'.format(sub_cmp))
 
         logger.debug('UI item created by create func is: {}'.format(ui_item))
 
         if ui_item and sub_cmp.is_container:
-                _recursively_produce_ui_items(ui_item, sub_cmp, ext_asm_info)
+                _recursively_produce_ui_items(ui_item, sub_cmp, sub_asm_info, changed_dirs, shard_asm_infos)
 
 
 current_ui = get_current_ui()
 
 
-def update_pyrevit_ui(parsed_ext, ext_asm_info):
-    """Updates/Creates pyRevit ui for the given extension and provided assembly dll address.
+def update_pyrevit_ui(parsed_ext, ext_asm_infos, changed_dirs=None):
+    """Updates/Creates pyRevit ui for the given extension and provided assembly dll addresses.
+    ext_asm_infos is the dictionary of assembly shards returned by asmmaker.create_assembly().
+    If changed_dirs is provided, only the ui items of the changed components (and their parents) are updated.
     """
     logger.debug('Creating/Updating ui for extension: {}'.format(parsed_ext))
-    _recursively_produce_ui_items(current_ui, parsed_ext, ext_asm_info)
+    _recursively_produce_ui_items(current_ui, parsed_ext, None, changed_dirs, ext_asm_infos)
 
 
 def cleanup_pyrevit_ui():
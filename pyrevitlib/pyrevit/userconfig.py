@@ -84,6 +84,18 @@ class PyRevitConfig(PyRevitConfigParser):
         except AttributeError:
             return None
 
+    def get_aliases(self):
+        """
+        Returns all aliases set in user config.
+
+        Returns:
+            dict: {original command name: alias name}
+        """
+
+        if not self._parser.has_section(COMMAND_ALIAS_SECTION):
+            return {}
+        return dict((x, self.get_alias(x)) for x in self._parser.options(COMMAND_ALIAS_SECTION))
+
     def save_changes(self):
         """Saves user config into associated config file (.config_file)"""
 
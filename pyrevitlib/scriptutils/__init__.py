@@ -26,6 +26,12 @@ class PyRevitScriptUtils:
 
     @property
     def info(self):
+        # components of the loaded extensions are registered by the session loader
+        from pyrevit.extensions.cmpregistry import find_by_directory
+        registered_cmp = find_by_directory(COMMAND_PATH)
+        if registered_cmp:
+            return registered_cmp
+
         from pyrevit.extensions.extensionmgr import get_command_from_path
         return get_command_from_path(COMMAND_PATH)
 